@@ -4,24 +4,51 @@
 поиска упоминаний фильмов, построения эмбеддингов и тематического
 кластерирования. Интерфейсы спроектированы так, чтобы их можно было
 использовать как по отдельности, так и в составе единого конвейера.
+
+Подмодули загружаются лениво: `from ml import FilmAliasResolver` не тянет
+torch, spaCy и UMAP — они импортируются только при первом использовании
+моделей.
 """
 
-from .aliases import FilmAliasResolver
-from .embeddings import EmbeddingGenerator
-from .entity_extraction import EntityExtractor
-from .film_detection import FilmMention, FilmMentionDetector
-from .pipeline import AnalysisPipeline, AnalysisResult, PostAnalysis
-from .topic_detection import TopicClusterer, TopicClusteringResult
-
-__all__ = [
-    "FilmAliasResolver",
-    "EmbeddingGenerator",
-    "EntityExtractor",
-    "FilmMention",
-    "FilmMentionDetector",
-    "AnalysisPipeline",
-    "AnalysisResult",
-    "PostAnalysis",
-    "TopicClusterer",
-    "TopicClusteringResult",
-]
+from typing import TYPE_CHECKING
+
+from .lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from .aliases import FilmAliasResolver
+    from .database import AnalysisWriter
+    from .dedup import MinHashDeduplicator
+    from .embedding_store import EmbeddingStore
+    from .embeddings import EmbeddingGenerator
+    from .entity_extraction import EntityExtractor
+    from .film_detection import FilmMention, FilmMentionDetector
+    from .pipeline import AnalysisPipeline, AnalysisResult, AnalysisStream, PostAnalysis
+    from .topic_detection import TopicAssignment, TopicClusterer, TopicClusteringResult
+    from .vector_index import VectorIndex
+
+_EXPORTS = {
+    "FilmAliasResolver": ".aliases",
+    "AnalysisWriter": ".database",
+    "MinHashDeduplicator": ".dedup",
+    "EmbeddingStore": ".embedding_store",
+    "EmbeddingGenerator": ".embeddings",
+    "EntityExtractor": ".entity_extraction",
+    "FilmMention": ".film_detection",
+    "FilmMentionDetector": ".film_detection",
+    "AnalysisPipeline": ".pipeline",
+    "AnalysisResult": ".pipeline",
+    "AnalysisStream": ".pipeline",
+    "PostAnalysis": ".pipeline",
+    "TopicAssignment": ".topic_detection",
+    "TopicClusterer": ".topic_detection",
+    "TopicClusteringResult": ".topic_detection",
+    "VectorIndex": ".vector_index",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__ = lazy_getattr(__name__, {name: f"{module}:{name}" for name, module in _EXPORTS.items()})
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,243 @@
+"""Индекс кандидатов для быстрого сопоставления фраз с алиасами фильмов.
+
+`fuzz.WRatio` — максимум из нескольких метрик на основе LCS (обычной,
+частичной и токенных). Каждая из них ограничена сверху пересечением
+мультимножеств символов двух строк, поэтому по матрице частот символов
+можно за один векторный проход отбросить алиасы, которые гарантированно не
+наберут порог. Алиасы с общим токеном добавляются в кандидаты всегда:
+для них токенные метрики могут дать высокий балл независимо от длин.
+"""
+
+from __future__ import annotations
+
+import pickle
+from collections import Counter
+from pathlib import Path
+from typing import Mapping, Sequence
+
+import numpy as np
+
+# WRatio понижает вес частичных метрик при сильно различающихся длинах строк.
+_PARTIAL_SCALE = 0.9
+_LONG_PARTIAL_SCALE = 0.6
+_EPSILON = 1e-6
+
+
+def _dedup_length(phrase: str) -> int:
+    """Длина строки из уникальных токенов фразы, как в токенных метриках."""
+
+    tokens = set(phrase.split())
+    return sum(len(token) for token in tokens) + max(len(tokens) - 1, 0)
+
+
+class AliasCandidateIndex:
+    """Точный и приближённый префильтр по нормализованным ключам алиасов.
+
+    Порядок ключей сохраняется: кандидаты возвращаются по возрастанию позиции,
+    чтобы при равных баллах выбирался тот же алиас, что и при полном переборе.
+    """
+
+    # Версия формата `save`; снимки другой версии не загружаются.
+    FORMAT = 2
+
+    def __init__(
+        self,
+        alias_keys: Sequence[str],
+        *,
+        threshold: float,
+        positions: Mapping[str, int] | None = None,
+    ) -> None:
+        self.alias_keys: tuple[str, ...] = tuple(alias_keys)
+        self.threshold = float(threshold)
+        # Резолвер уже держит отображение ключ → позиция, его можно не дублировать.
+        self._positions: Mapping[str, int] = (
+            positions
+            if positions is not None
+            else {key: idx for idx, key in enumerate(self.alias_keys)}
+        )
+
+        self._assemble(None, np.full(len(self.alias_keys), -1, dtype=np.int64))
+
+    def updated(
+        self,
+        alias_keys: Sequence[str],
+        source: np.ndarray,
+        *,
+        positions: Mapping[str, int] | None = None,
+    ) -> AliasCandidateIndex:
+        """Новый индекс для изменённого набора ключей; текущий не меняется.
+
+        `source[i]` — позиция ключа `alias_keys[i]` в текущем индексе или -1 для
+        нового ключа. Python-код выполняется только для новых ключей, строки
+        остальных переносятся векторными перестановками массивов.
+        """
+
+        index = type(self).__new__(type(self))
+        index.alias_keys = tuple(alias_keys)
+        index.threshold = self.threshold
+        index._positions = (
+            positions
+            if positions is not None
+            else {key: idx for idx, key in enumerate(index.alias_keys)}
+        )
+        index._assemble(self, np.asarray(source, dtype=np.int64))
+        return index
+
+    def _assemble(self, previous: AliasCandidateIndex | None, source: np.ndarray) -> None:
+        count = len(self.alias_keys)
+        added = np.flatnonzero(source < 0)
+        kept = np.flatnonzero(source >= 0) if previous is not None else np.empty(0, dtype=np.int64)
+        vocabulary = dict(previous._vocabulary) if previous is not None else {}
+        alphabet = dict(previous._alphabet) if previous is not None else {}
+
+        posting_tokens: list[int] = []
+        posting_aliases: list[int] = []
+        added_counts: list[Counter[str]] = []
+        for position in added.tolist():
+            key = self.alias_keys[position]
+            for token in set(key.split()):
+                posting_tokens.append(vocabulary.setdefault(token, len(vocabulary)))
+                posting_aliases.append(position)
+            key_counts = Counter(key)
+            for char in key_counts:
+                alphabet.setdefault(char, len(alphabet))
+            added_counts.append(key_counts)
+        self._vocabulary = vocabulary
+        self._alphabet = alphabet
+
+        # Инвертированный индекс токен → позиции алиасов в формате CSR; внутри
+        # токена позиции идут по возрастанию.
+        tokens = np.asarray(posting_tokens, dtype=np.int64)
+        aliases = np.asarray(posting_aliases, dtype=np.int64)
+        if kept.size:
+            old_to_new = np.full(len(previous), -1, dtype=np.int64)
+            old_to_new[source[kept]] = kept
+            old_tokens = np.repeat(
+                np.arange(len(previous._posting_offsets) - 1), np.diff(previous._posting_offsets)
+            )
+            old_aliases = old_to_new[previous._posting_positions]
+            alive = old_aliases >= 0
+            tokens = np.concatenate([old_tokens[alive], tokens])
+            aliases = np.concatenate([old_aliases[alive], aliases])
+        order = np.lexsort((aliases, tokens))
+        self._posting_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tokens, minlength=len(vocabulary)), out=self._posting_offsets[1:])
+        self._posting_positions = aliases[order].astype(np.int32)
+
+        max_count = max((max(key_counts.values()) for key_counts in added_counts), default=0)
+        narrow = max_count <= np.iinfo(np.uint8).max and (
+            previous is None or previous._char_counts.dtype == np.uint8
+        )
+        # Столбцовое хранение ускоряет выборку нескольких символов фразы.
+        counts = np.zeros((count, len(alphabet)), dtype=np.uint8 if narrow else np.uint16, order="F")
+        self._lengths = np.zeros(count, dtype=np.int32)
+        self._dedup_lengths = np.zeros(count, dtype=np.int32)
+        if kept.size:
+            counts[kept, : previous._char_counts.shape[1]] = previous._char_counts[source[kept]]
+            self._lengths[kept] = previous._lengths[source[kept]]
+            self._dedup_lengths[kept] = previous._dedup_lengths[source[kept]]
+        for position, key_counts in zip(added.tolist(), added_counts):
+            for char, char_count in key_counts.items():
+                counts[position, alphabet[char]] = char_count
+            key = self.alias_keys[position]
+            self._lengths[position] = len(key)
+            self._dedup_lengths[position] = _dedup_length(key)
+        self._char_counts = counts
+
+    def __len__(self) -> int:
+        return len(self.alias_keys)
+
+    def save(self, directory: Path) -> None:
+        """Сохраняет индекс: массивы — в `.npy` (для mmap), словари — в pickle."""
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "char_counts.npy", self._char_counts)
+        np.save(directory / "lengths.npy", self._lengths)
+        np.save(directory / "dedup_lengths.npy", self._dedup_lengths)
+        np.save(directory / "posting_offsets.npy", self._posting_offsets)
+        np.save(directory / "posting_positions.npy", self._posting_positions)
+        meta = {
+            "format": self.FORMAT,
+            "alias_keys": self.alias_keys,
+            "threshold": self.threshold,
+            "alphabet": self._alphabet,
+            "vocabulary": self._vocabulary,
+        }
+        with (directory / "meta.pkl").open("wb") as fp:
+            pickle.dump(meta, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory: Path, *, mmap: bool = True) -> AliasCandidateIndex:
+        """Загружает индекс без пересчёта; крупные массивы отображаются в память."""
+
+        directory = Path(directory)
+        with (directory / "meta.pkl").open("rb") as fp:
+            meta = pickle.load(fp)
+        if meta.get("format") != cls.FORMAT:
+            raise ValueError(f"Снимок индекса кандидатов в устаревшем формате: {directory}")
+        mmap_mode = "r" if mmap else None
+        index = cls.__new__(cls)
+        index.alias_keys = meta["alias_keys"]
+        index.threshold = meta["threshold"]
+        index._positions = {key: idx for idx, key in enumerate(index.alias_keys)}
+        index._alphabet = meta["alphabet"]
+        index._vocabulary = meta["vocabulary"]
+        index._char_counts = np.load(directory / "char_counts.npy", mmap_mode=mmap_mode)
+        index._lengths = np.load(directory / "lengths.npy", mmap_mode=mmap_mode)
+        index._dedup_lengths = np.load(directory / "dedup_lengths.npy", mmap_mode=mmap_mode)
+        index._posting_offsets = np.load(directory / "posting_offsets.npy", mmap_mode=mmap_mode)
+        index._posting_positions = np.load(
+            directory / "posting_positions.npy", mmap_mode=mmap_mode
+        )
+        return index
+
+    def exact(self, phrase: str) -> int | None:
+        """Позиция алиаса, совпадающего с фразой дословно."""
+
+        return self._positions.get(phrase)
+
+    def candidates(self, phrase: str) -> np.ndarray:
+        """Позиции алиасов, способных набрать `threshold` по WRatio."""
+
+        if not self.alias_keys or not phrase:
+            return np.empty(0, dtype=np.int64)
+
+        overlap = np.zeros(len(self.alias_keys), dtype=np.int32)
+        # Частоты алиасов не превышают максимум своего dtype, поэтому срезка
+        # частоты фразы до него не меняет минимум.
+        max_count = np.iinfo(self._char_counts.dtype).max
+        for char, count in Counter(phrase).items():
+            column = self._alphabet.get(char)
+            if column is None:
+                continue
+            overlap += np.minimum(self._char_counts[:, column], min(count, max_count))
+
+        phrase_length = float(len(phrase))
+        # Верхняя граница для ratio/token_ratio/partial_ratio: 200·m / (l + m),
+        # где l — минимальная длина сравниваемых строк, m = min(overlap, l).
+        shortest = np.minimum(self._dedup_lengths, _dedup_length(phrase))
+        shortest = np.maximum(shortest, 1.0)
+        common = np.minimum(overlap, shortest)
+        lcs_bound = 200.0 * common / (shortest + common)
+
+        longer = np.maximum(self._lengths, phrase_length)
+        shorter = np.minimum(self._lengths, phrase_length)
+        length_ratio = longer / shorter
+        plain_ratio_bound = 200.0 * np.minimum(overlap, shorter) / (longer + shorter)
+        bound = np.where(
+            length_ratio < 1.5,
+            lcs_bound,
+            np.maximum(
+                plain_ratio_bound,
+                lcs_bound * np.where(length_ratio <= 8, _PARTIAL_SCALE, _LONG_PARTIAL_SCALE),
+            ),
+        )
+        mask = bound >= self.threshold - _EPSILON
+
+        for token in set(phrase.split()):
+            token_id = self._vocabulary.get(token)
+            if token_id is not None:
+                start, end = self._posting_offsets[token_id : token_id + 2]
+                mask[self._posting_positions[start:end]] = True
+        return np.flatnonzero(mask)
@@ -2,16 +2,27 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
-from dataclasses import dataclass
+import pickle
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from typing import Iterable, Mapping, Sequence
 
+import numpy as np
 from rapidfuzz import fuzz, process
 
+from .alias_index import AliasCandidateIndex
+from .caching import CacheStats, LRUCache
 from .config import FilmAliasConfig
 from .preprocessing import normalize_text
 
+# Предел числа ячеек матрицы оценок (float64) в одном вызове cdist, ~32 МБ.
+_CDIST_MAX_CELLS = 1 << 22
+
 
 @dataclass(slots=True, frozen=True)
 class FilmRecord:
@@ -33,105 +44,575 @@ class FilmAliasMatch:
     score: float
 
 
+def _film_from_entry(entry: Mapping[str, object]) -> FilmRecord:
+    return FilmRecord(
+        id=str(entry.get("id")),
+        title=str(entry.get("title")),
+        original_title=str(entry.get("originalTitle")) if entry.get("originalTitle") else None,
+        year=int(entry.get("year")) if entry.get("year") else None,
+        countries=str(entry.get("countries")) if entry.get("countries") else None,
+    )
+
+
+def _entry_digest(entry: Mapping[str, object]) -> str:
+    """Отпечаток записи каталога: по нему `reload_if_changed` находит изменённые фильмы."""
+
+    payload = json.dumps(entry, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True, frozen=True)
+class AliasCatalogue:
+    """Неизменяемый снимок каталога алиасов и производных от него структур.
+
+    Нормализованные ключи алиасов хранятся один раз в кортеже, который без
+    копирования разделяют детектор и индекс кандидатов; соответствие
+    алиас → фильм — массив целочисленных идентификаторов фильмов. Позиция
+    ключа в кортеже служит сквозным идентификатором алиаса. Резолвер не
+    меняет снимок, а подменяет его целиком, поэтому читатель, один раз
+    взявший `FilmAliasResolver.catalogue`, видит согласованное состояние.
+    """
+
+    version: int = 0
+    # Удалённые фильмы остаются пустыми слотами до полной перезагрузки.
+    films: tuple[FilmRecord | None, ...] = ()
+    film_index: Mapping[str, int] = field(default_factory=dict)
+    entry_digests: Mapping[str, str] = field(default_factory=dict)
+    # Порядок записей в файле: при общем ключе алиас достаётся последнему фильму.
+    film_ranks: Mapping[str, int] = field(default_factory=dict)
+    alias_keys: tuple[str, ...] = ()
+    alias_display: tuple[str, ...] = ()
+    alias_films: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    alias_token_lengths: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    # Гистограмма длин ключей в токенах: максимум пересчитывается за O(изменений).
+    token_length_counts: Mapping[int, int] = field(default_factory=dict)
+    positions: Mapping[str, int] = field(default_factory=dict)
+    # Ключи, на которые претендуют несколько фильмов: film_idx → отображаемый алиас.
+    alias_claims: Mapping[str, Mapping[int, str]] = field(default_factory=dict)
+    source_path: Path | None = None
+    # (mtime_ns, size) файла на момент загрузки.
+    source_stamp: tuple[int, int] | None = None
+    index: AliasCandidateIndex | None = None
+
+    @property
+    def max_alias_tokens(self) -> int:
+        return max(self.token_length_counts, default=1)
+
+    def film_at(self, position: int) -> FilmRecord:
+        return self.films[self.alias_films[position]]
+
+    def film_for_alias(self, alias_key: str) -> FilmRecord | None:
+        position = self.positions.get(alias_key)
+        return None if position is None else self.film_at(position)
+
+
 class FilmAliasResolver:
-    """Индексация и размытое сопоставление алиасов фильмов."""
+    """Индексация и размытое сопоставление алиасов фильмов.
+
+    Каталог можно менять на ходу: `add_film`/`remove_film` и
+    `reload_if_changed` строят новый `AliasCatalogue` из текущего, выполняя
+    Python-код только для изменившихся алиасов, и атомарно подменяют его.
+    С `FilmAliasConfig.reload_interval` резолвер сам проверяет mtime файла
+    алиасов не чаще раза в интервал.
+    """
+
+    # Версия формата `save_index`; снимки другой версии считаются устаревшими.
+    INDEX_FORMAT = 4
 
     def __init__(self, config: FilmAliasConfig | None = None) -> None:
         self.config = config or FilmAliasConfig()
-        self._alias_to_film: dict[str, FilmRecord] = {}
-        self._alias_display: dict[str, str] = {}
-        self._max_alias_tokens: int = 1
+        self._catalogue = AliasCatalogue()
+        self._write_lock = threading.RLock()
+        self._next_reload_check = 0.0
+        self._resolve_cache: LRUCache[tuple[int, str, int], tuple[FilmAliasMatch, ...]] = LRUCache(
+            self.config.resolve_cache_size, ttl=self.config.resolve_cache_ttl
+        )
 
-    def load(self, aliases_path: Path | None = None) -> None:
-        """Загружает алиасы из JSON-файла и строит индекс."""
+    def __getstate__(self) -> dict[str, object]:
+        state = self.__dict__.copy()
+        del state["_write_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._write_lock = threading.RLock()
 
-        path = aliases_path or self.config.aliases_path
+    @property
+    def catalogue(self) -> AliasCatalogue:
+        """Текущий снимок каталога; при первом обращении каталог загружается."""
+
+        catalogue = self._catalogue
+        if catalogue.version == 0:
+            self.load()
+            return self._catalogue
+        interval = self.config.reload_interval
+        if interval is not None and time.monotonic() >= self._next_reload_check:
+            self._next_reload_check = time.monotonic() + interval
+            self.reload_if_changed()
+            catalogue = self._catalogue
+        return catalogue
+
+    def _swap(self, catalogue: AliasCatalogue) -> None:
+        with self._write_lock:
+            self._catalogue = replace(catalogue, version=self._catalogue.version + 1)
+        self._resolve_cache.clear()
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_entries(self, path: Path) -> tuple[list[Mapping[str, object]], tuple[int, int]]:
+        stamp = self._stamp(path)
         with path.open("r", encoding="utf-8") as fp:
             raw_data: Sequence[Mapping[str, object]] = json.load(fp)
+        return list(raw_data), stamp
 
-        for entry in raw_data:
-            film = FilmRecord(
-                id=str(entry.get("id")),
-                title=str(entry.get("title")),
-                original_title=str(entry.get("originalTitle"))
-                if entry.get("originalTitle")
-                else None,
-                year=int(entry.get("year")) if entry.get("year") else None,
-                countries=str(entry.get("countries")) if entry.get("countries") else None,
-            )
-            aliases: set[str] = set()
-            for value in (
-                film.title,
-                film.original_title,
-                *(entry.get("aliases") or []),
-            ):
-                if not value:
-                    continue
-                aliases.add(value)
+    def _entry_aliases(self, entry: Mapping[str, object], film: FilmRecord) -> list[str]:
+        aliases: dict[str, None] = {}
+        for value in (
+            film.title,
+            film.original_title,
+            *(entry.get("aliases") or []),
+        ):
+            if value:
+                aliases[value] = None
+
+        for locale in self.config.locale_priority:
+            localized_key = f"title_{locale}"
+            value = entry.get(localized_key)
+            if isinstance(value, str):
+                aliases[value] = None
+        return list(aliases)
 
-            for locale in self.config.locale_priority:
-                localized_key = f"title_{locale}"
-                value = entry.get(localized_key)
-                if isinstance(value, str):
-                    aliases.add(value)
+    def _apply(
+        self,
+        base: AliasCatalogue,
+        *,
+        remove_ids: Iterable[str] = (),
+        entries: Iterable[Mapping[str, object]] = (),
+        ranks: Mapping[str, int] | None = None,
+        **changes: object,
+    ) -> AliasCatalogue:
+        """Новый снимок: `base` без фильмов `remove_ids` и с добавленными `entries`.
 
-            for alias in aliases:
+        Записи с уже известным id заменяют прежние. Освободившиеся позиции
+        алиасов занимают ключи с конца кортежа, так что позиции остальных
+        алиасов не меняются; массивы и индекс кандидатов переносятся
+        векторными перестановками.
+
+        `ranks` — порядок фильмов в файле (id → номер записи); без него
+        фильм сохраняет прежний номер, а новый встаёт в конец. Ключ, на
+        который претендуют несколько фильмов, принадлежит фильму с большим
+        номером, как при полной загрузке; претенденты таких ключей хранятся в
+        `alias_claims`, поэтому удаление владельца возвращает ключ предыдущему.
+        """
+
+        # Повторный id внутри пачки: действует последняя запись.
+        by_id = {str(entry.get("id")): entry for entry in entries}
+        remove_ids = set(remove_ids)
+        films = list(base.films)
+        film_index = dict(base.film_index)
+        digests = dict(base.entry_digests)
+        keys = list(base.alias_keys)
+        display = list(base.alias_display)
+        positions = dict(base.positions)
+        token_length_counts = Counter(base.token_length_counts)
+        if ranks is None:
+            film_ranks = dict(base.film_ranks)
+            for film_id in remove_ids:
+                film_ranks.pop(film_id, None)
+            next_rank = max(film_ranks.values(), default=-1) + 1
+            for film_id in by_id:
+                if film_id not in film_ranks:
+                    film_ranks[film_id] = next_rank
+                    next_rank += 1
+        else:
+            film_ranks = dict(ranks)
+
+        dropped: list[int] = []
+        for film_id in {*remove_ids, *by_id}:
+            film_idx = film_index.pop(film_id, None)
+            if film_idx is not None:
+                films[film_idx] = None
+                digests.pop(film_id, None)
+                dropped.append(film_idx)
+        dropped_set = set(dropped)
+        claims = {
+            key: {film_idx: alias for film_idx, alias in claimants.items() if film_idx not in dropped_set}
+            for key, claimants in base.alias_claims.items()
+        }
+
+        count = len(keys)
+        # Позиции удалённых фильмов освобождаются, если у ключа не осталось других претендентов.
+        holes = (
+            np.asarray(
+                [
+                    position
+                    for position in np.flatnonzero(np.isin(base.alias_films, dropped)).tolist()
+                    if not claims.get(keys[position])
+                ],
+                dtype=np.int64,
+            )
+            if dropped
+            else np.empty(0, dtype=np.int64)
+        )
+        kept_count = count - len(holes)
+        for hole in holes.tolist():
+            del positions[keys[hole]]
+            claims.pop(keys[hole], None)
+            token_length_counts[int(base.alias_token_lengths[hole])] -= 1
+        source = np.arange(kept_count, dtype=np.int64)
+        movers = np.setdiff1d(np.arange(kept_count, count), holes, assume_unique=True)
+        for hole, mover in zip(holes[holes < kept_count].tolist(), movers.tolist()):
+            keys[hole] = keys[mover]
+            display[hole] = display[mover]
+            positions[keys[hole]] = hole
+            source[hole] = mover
+        del keys[kept_count:], display[kept_count:]
+        alias_films = base.alias_films[source]
+        alias_token_lengths = base.alias_token_lengths[source]
+
+        new_films: list[int] = []
+        new_token_lengths: list[int] = []
+        for film_id, entry in by_id.items():
+            film = _film_from_entry(entry)
+            film_idx = len(films)
+            films.append(film)
+            film_index[film_id] = film_idx
+            digests[film_id] = _entry_digest(entry)
+            for alias in self._entry_aliases(entry, film):
                 normalized = normalize_text(alias)
                 if not normalized:
                     continue
-                self._alias_to_film[normalized] = film
-                self._alias_display[normalized] = alias
-                token_length = len(normalized.split())
-                if token_length > self._max_alias_tokens:
-                    self._max_alias_tokens = token_length
+                position = positions.get(normalized)
+                if position is None:
+                    positions[normalized] = len(keys)
+                    keys.append(normalized)
+                    display.append(alias)
+                    new_films.append(film_idx)
+                    token_length = len(normalized.split())
+                    new_token_lengths.append(token_length)
+                    token_length_counts[token_length] += 1
+                    continue
+                claimants = claims.get(normalized)
+                if claimants is None:
+                    owner = (
+                        int(alias_films[position]) if position < kept_count else new_films[position - kept_count]
+                    )
+                    claimants = claims[normalized] = {owner: display[position]}
+                claimants[film_idx] = alias
+
+        # Владелец общего ключа — претендент, последний в порядке файла.
+        for key, claimants in claims.items():
+            position = positions[key]
+            owner = max(claimants, key=lambda film_idx: film_ranks[films[film_idx].id])
+            display[position] = claimants[owner]
+            if position < kept_count:
+                alias_films[position] = owner
+            else:
+                new_films[position - kept_count] = owner
+
+        alias_keys = tuple(keys)
+        index = base.index
+        if index is not None:
+            index = index.updated(
+                alias_keys,
+                np.concatenate([source, np.full(len(new_films), -1, dtype=np.int64)]),
+                positions=positions,
+            )
+        return replace(
+            base,
+            films=tuple(films),
+            film_index=film_index,
+            entry_digests=digests,
+            film_ranks=film_ranks,
+            alias_keys=alias_keys,
+            alias_display=tuple(display),
+            alias_films=np.concatenate([alias_films, np.asarray(new_films, dtype=np.int32)]),
+            alias_token_lengths=np.concatenate(
+                [alias_token_lengths, np.asarray(new_token_lengths, dtype=np.int32)]
+            ),
+            token_length_counts={length: n for length, n in token_length_counts.items() if n > 0},
+            positions=positions,
+            alias_claims={key: claimants for key, claimants in claims.items() if len(claimants) > 1},
+            index=index,
+            **changes,
+        )
+
+    def load(self, aliases_path: Path | None = None) -> None:
+        """Загружает алиасы из JSON-файла и заново строит каталог."""
+
+        path = Path(aliases_path or self.config.aliases_path)
+        entries, stamp = self._read_entries(path)
+        with self._write_lock:
+            self._swap(
+                self._apply(AliasCatalogue(), entries=entries, source_path=path, source_stamp=stamp)
+            )
+
+    def reload_if_changed(self) -> bool:
+        """Перечитывает файл алиасов, если изменились его mtime или размер.
+
+        Пересчитываются только фильмы, чьи записи изменились, появились или
+        исчезли. Возвращает True, если каталог был обновлён.
+        """
+
+        catalogue = self._catalogue
+        path = Path(catalogue.source_path or self.config.aliases_path)
+        if catalogue.version and self._stamp(path) == catalogue.source_stamp:
+            return False
+        with self._write_lock:
+            catalogue = self._catalogue
+            if catalogue.version == 0:
+                self.load(path)
+                return True
+            entries, stamp = self._read_entries(path)
+            if stamp == catalogue.source_stamp:
+                return False
+            current = {str(entry.get("id")): entry for entry in entries}
+            changed = [
+                entry
+                for film_id, entry in current.items()
+                if catalogue.entry_digests.get(film_id) != _entry_digest(entry)
+            ]
+            removed = [film_id for film_id in catalogue.film_index if film_id not in current]
+            self._swap(
+                self._apply(
+                    catalogue,
+                    remove_ids=removed,
+                    entries=changed,
+                    ranks={film_id: rank for rank, film_id in enumerate(current)},
+                    source_path=path,
+                    source_stamp=stamp,
+                )
+            )
+        return True
+
+    def add_film(self, entry: Mapping[str, object]) -> FilmRecord:
+        """Добавляет фильм (запись в формате файла алиасов) или заменяет фильм с тем же id."""
+
+        with self._write_lock:
+            catalogue = self.catalogue
+            self._swap(self._apply(catalogue, entries=[entry]))
+            return self._catalogue.films[self._catalogue.film_index[str(entry.get("id"))]]
+
+    def remove_film(self, film_id: str) -> bool:
+        """Удаляет фильм и все его алиасы; False, если фильма нет в каталоге."""
+
+        with self._write_lock:
+            catalogue = self.catalogue
+            if film_id not in catalogue.film_index:
+                return False
+            self._swap(self._apply(catalogue, remove_ids=[film_id]))
+            return True
+
+    def candidate_index(self, catalogue: AliasCatalogue | None = None) -> AliasCandidateIndex:
+        """Индекс кандидатов для снимка; строится один раз и далее обновляется инкрементально."""
+
+        catalogue = catalogue or self.catalogue
+        if catalogue.index is not None:
+            return catalogue.index
+        index = AliasCandidateIndex(
+            catalogue.alias_keys, threshold=self.config.match_threshold, positions=catalogue.positions
+        )
+        self._attach(catalogue, index)
+        return index
+
+    def attach_index(self, index: AliasCandidateIndex) -> bool:
+        """Подключает готовый индекс (например, из снимка), если он построен для текущих ключей."""
+
+        catalogue = self.catalogue
+        if index.threshold != self.config.match_threshold or index.alias_keys != catalogue.alias_keys:
+            return False
+        self._attach(catalogue, index)
+        return True
+
+    def _attach(self, catalogue: AliasCatalogue, index: AliasCandidateIndex) -> None:
+        with self._write_lock:
+            if self._catalogue.version == catalogue.version:
+                self._catalogue = replace(self._catalogue, index=index)
+
+    def save_index(self, path: Path) -> None:
+        """Сохраняет построенный каталог, чтобы не разбирать и не нормализовать JSON заново."""
+
+        catalogue = self.catalogue
+        state = {
+            "format": self.INDEX_FORMAT,
+            "films": catalogue.films,
+            "film_index": catalogue.film_index,
+            "entry_digests": catalogue.entry_digests,
+            "film_ranks": catalogue.film_ranks,
+            "alias_keys": catalogue.alias_keys,
+            "alias_display": catalogue.alias_display,
+            "alias_films": catalogue.alias_films,
+            "alias_token_lengths": catalogue.alias_token_lengths,
+            "alias_claims": catalogue.alias_claims,
+            "source_path": catalogue.source_path,
+            "source_stamp": catalogue.source_stamp,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as fp:
+            pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_index(self, path: Path) -> None:
+        """Подменяет каталог сохранённым через `save_index`."""
+
+        with path.open("rb") as fp:
+            state = pickle.load(fp)
+        if state.get("format") != self.INDEX_FORMAT:
+            raise ValueError(f"Снимок индекса алиасов в устаревшем формате: {path}")
+        lengths, counts = np.unique(state["alias_token_lengths"], return_counts=True)
+        self._swap(
+            AliasCatalogue(
+                films=state["films"],
+                film_index=state["film_index"],
+                entry_digests=state["entry_digests"],
+                film_ranks=state["film_ranks"],
+                alias_keys=state["alias_keys"],
+                alias_display=state["alias_display"],
+                alias_films=state["alias_films"],
+                alias_token_lengths=state["alias_token_lengths"],
+                token_length_counts=dict(zip(lengths.tolist(), counts.tolist())),
+                positions={key: idx for idx, key in enumerate(state["alias_keys"])},
+                alias_claims=state["alias_claims"],
+                source_path=state["source_path"],
+                source_stamp=state["source_stamp"],
+            )
+        )
+
+    @property
+    def aliases(self) -> tuple[str, ...]:
+        """Нормализованные ключи алиасов текущего снимка (без автозагрузки)."""
+
+        return self._catalogue.alias_keys
 
     @property
-    def aliases(self) -> Iterable[str]:
-        return self._alias_to_film.keys()
+    def alias_positions(self) -> Mapping[str, int]:
+        return self._catalogue.positions
 
     @property
     def max_alias_tokens(self) -> int:
-        if not self._alias_to_film:
-            self.load()
-        return self._max_alias_tokens
+        return self.catalogue.max_alias_tokens
+
+    def film_at(self, position: int) -> FilmRecord:
+        return self.catalogue.film_at(position)
 
     def film_for_alias(self, alias_key: str) -> FilmRecord:
-        return self._alias_to_film[alias_key]
+        film = self.catalogue.film_for_alias(alias_key)
+        if film is None:
+            raise KeyError(alias_key)
+        return film
 
     def display_alias(self, alias_key: str) -> str:
-        return self._alias_display[alias_key]
+        catalogue = self.catalogue
+        return catalogue.alias_display[catalogue.positions[alias_key]]
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        """Счётчики кэша `resolve`/`resolve_many` для подбора его размера."""
+
+        return self._resolve_cache.stats
+
+    def _to_matches(
+        self, catalogue: AliasCatalogue, scored: Iterable[tuple[int, float]]
+    ) -> tuple[FilmAliasMatch, ...]:
+        threshold = self.config.match_threshold
+        return tuple(
+            FilmAliasMatch(
+                film=catalogue.film_at(position),
+                matched_alias=catalogue.alias_display[position],
+                score=float(score),
+            )
+            for position, score in scored
+            if score >= threshold
+        )
 
     def resolve(self, query: str, *, limit: int = 5) -> list[FilmAliasMatch]:
         """Возвращает список кандидатов, отсортированных по убыванию сходства."""
 
-        if not self._alias_to_film:
-            self.load()
-
+        catalogue = self.catalogue
         normalized_query = normalize_text(query)
         if not normalized_query:
             return []
 
+        cache_key = (catalogue.version, normalized_query, limit)
+        cached = self._resolve_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        results = self._extract(catalogue, normalized_query, limit)
+        self._resolve_cache.put(cache_key, results)
+        return list(results)
+
+    def _extract(
+        self, catalogue: AliasCatalogue, normalized_query: str, limit: int
+    ) -> tuple[FilmAliasMatch, ...]:
         matches = process.extract(
             normalized_query,
-            self._alias_to_film.keys(),
+            catalogue.alias_keys,
             scorer=fuzz.WRatio,
             limit=limit,
         )
+        return self._to_matches(catalogue, ((position, score) for _, score, position in matches))
 
-        results: list[FilmAliasMatch] = []
-        threshold = self.config.match_threshold
-        for candidate, score, _ in matches:
-            if score < threshold:
+    def resolve_many(self, queries: Sequence[str], *, limit: int = 5) -> list[list[FilmAliasMatch]]:
+        """`resolve` для пачки запросов: промахи кэша оцениваются одним `process.cdist`.
+
+        Результат совпадает с поэлементным `resolve`: кандидаты упорядочены по
+        убыванию балла, при равных баллах — по позиции алиаса, как в
+        `process.extract`.
+
+        Пачка выигрывает только при `limit > 1`: `cdist` считает полную
+        матрицу оценок, зато во всех ядрах (`workers=-1`); на одном ядре
+        запрос стоит столько же, сколько `resolve`. При `limit=1` поэлементный
+        `extractOne` быстрее (~2.7× на одном ядре): он поднимает порог по
+        лучшему найденному баллу и отсекает остальные алиасы досрочно. Поэтому
+        с `limit=1` промахи кэша оцениваются по одному.
+        """
+
+        catalogue = self.catalogue
+        normalized_queries = [normalize_text(query) for query in queries]
+        resolved: dict[str, tuple[FilmAliasMatch, ...]] = {}
+        missing: list[str] = []
+        for normalized_query in dict.fromkeys(normalized_queries):
+            if not normalized_query:
+                resolved[normalized_query] = ()
                 continue
-            film = self._alias_to_film[candidate]
-            results.append(
-                FilmAliasMatch(
-                    film=film,
-                    matched_alias=self._alias_display[candidate],
-                    score=float(score),
-                )
+            cached = self._resolve_cache.get((catalogue.version, normalized_query, limit))
+            if cached is None:
+                missing.append(normalized_query)
+            else:
+                resolved[normalized_query] = cached
+
+        if limit == 1:
+            for normalized_query in missing:
+                results = self._extract(catalogue, normalized_query, limit)
+                self._resolve_cache.put((catalogue.version, normalized_query, limit), results)
+                resolved[normalized_query] = results
+            missing = []
+
+        threshold = self.config.match_threshold
+        rows_per_block = max(1, _CDIST_MAX_CELLS // max(len(catalogue.alias_keys), 1))
+        for offset in range(0, len(missing), rows_per_block):
+            block = missing[offset : offset + rows_per_block]
+            scores = process.cdist(
+                block,
+                catalogue.alias_keys,
+                scorer=fuzz.WRatio,
+                score_cutoff=threshold,
+                dtype=np.float64,
+                workers=-1,
             )
-        return results
+            for normalized_query, row in zip(block, scores):
+                positions = np.flatnonzero(row >= threshold)
+                order = np.lexsort((positions, -row[positions]))[:limit]
+                results = self._to_matches(
+                    catalogue, ((int(position), row[position]) for position in positions[order])
+                )
+                self._resolve_cache.put((catalogue.version, normalized_query, limit), results)
+                resolved[normalized_query] = results
+
+        return [list(resolved[normalized_query]) for normalized_query in normalized_queries]
 
     def has_match(self, query: str) -> bool:
         """Проверяет, есть ли среди кандидатов уверенное совпадение."""
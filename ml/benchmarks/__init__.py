@@ -0,0 +1,5 @@
+"""Бенчмарки компонентов ML-конвейера.
+
+Каждый модуль запускается как скрипт (`python -m ml.benchmarks.<name>`) и
+печатает замеры в stdout.
+"""
@@ -0,0 +1,69 @@
+"""Память индекса алиасов и задержка детекции на пост.
+
+Пример запуска (≈50 тыс. алиасов)::
+
+    python -m ml.benchmarks.alias_memory --films 16700 --posts 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from ..aliases import FilmAliasResolver
+from ..config import FilmAliasConfig
+from ..film_detection import FilmMentionDetector
+from .corpus import synthetic_catalogue, synthetic_posts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=16700)
+    parser.add_argument("--posts", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    posts = [post.text for post in synthetic_posts(catalogue, args.posts, seed=args.seed)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "aliases.json"
+        path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding="utf-8")
+        del catalogue
+        gc.collect()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        resolver = FilmAliasResolver(FilmAliasConfig(aliases_path=path))
+        resolver.load()
+        resolver_bytes = tracemalloc.get_traced_memory()[0]
+        detector = FilmMentionDetector(resolver)
+        build_seconds = time.perf_counter() - started
+        gc.collect()
+        total_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # Первый проход прогревает кэши нормализации, как у долгоживущего воркера.
+    detector.detect_batch(posts[: len(posts) // 4], workers=1)
+    started = time.perf_counter()
+    for post in posts:
+        detector.detect(post)
+    detect_seconds = time.perf_counter() - started
+
+    mib = 1024 * 1024
+    print(f"aliases: {len(tuple(resolver.aliases))}")
+    print(f"build: {build_seconds:.2f} s")
+    print(
+        f"memory: resolver {resolver_bytes / mib:.1f} MiB, resolver+index {total_bytes / mib:.1f} MiB, "
+        f"peak {peak_bytes / mib:.1f} MiB"
+    )
+    print(f"detect: {detect_seconds / len(posts) * 1000:.2f} ms/post")
+
+
+if __name__ == "__main__":
+    main()
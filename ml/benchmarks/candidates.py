@@ -0,0 +1,99 @@
+"""Отбор окон-кандидатов (`ml.candidates`) против полного сканирования.
+
+На синтетическом корпусе (названия в «ёлочках», с заглавной буквы и часть —
+строчными) детекция прогоняется с `candidate_mode="all"` — все окна, как
+раньше, — и с режимами отбора. Для каждого режима печатается время, ускорение
+относительно `"all"`, доля оценённых окон, доля постов с откатом к полному
+сканированию, полнота и точность по разметке корпуса (пары пост — фильм) и
+доля верных находок полного сканирования, которые режим потерял::
+
+    python -m ml.benchmarks.candidates --films 2000 --posts 500 --strategy indexed
+
+С `--spacy-model` сущности настоящей модели передаются детектору как
+подсказка `"entities"`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from ..config import EntityExtractionConfig
+from ..entity_extraction import EntityExtractor
+from ..film_detection import FilmMention, FilmMentionDetector
+from ..metrics import PipelineMetrics
+from .corpus import synthetic_catalogue, synthetic_posts
+from .suite import _best_seconds, _resolver
+
+# (имя, изменения FilmAliasConfig)
+_VARIANTS = (
+    ("all", {"candidate_mode": "all"}),
+    ("stopwords", {"candidate_mode": "stopwords"}),
+    ("cues", {"candidate_mode": "cues"}),
+    ("cues-no-fallback", {"candidate_mode": "cues", "candidate_fallback": False}),
+)
+
+
+def _found(detected: list[list[FilmMention]], expected: list[set[str]]) -> set[tuple[int, str]]:
+    """Верно найденные пары `(пост, фильм)`."""
+
+    return {
+        (post, mention.film.id)
+        for post, mentions in enumerate(detected)
+        for mention in mentions
+        if mention.film.id in expected[post]
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--strategy", choices=("indexed", "exhaustive", "cdist"), default="indexed")
+    parser.add_argument("--spacy-model", default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    posts = synthetic_posts(catalogue, args.posts, seed=args.seed)
+    texts = [post.text for post in posts]
+    expected = [set(post.film_ids) for post in posts]
+    entities = None
+    if args.spacy_model:
+        extractor = EntityExtractor(EntityExtractionConfig(spacy_model=args.spacy_model))
+        entities = extractor.extract_batch(texts)
+
+    baseline: tuple[float, set[tuple[int, str]]] | None = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, changes in _VARIANTS:
+            resolver = _resolver(catalogue, Path(tmp), detection_strategy=args.strategy, **changes)
+
+            def run() -> tuple[list[list[FilmMention]], PipelineMetrics]:
+                # Новый детектор на каждый прогон — холодный кэш фраз.
+                detector = FilmMentionDetector(resolver)
+                detector.metrics = PipelineMetrics()
+                return detector.detect_batch(texts, entities=entities, workers=1), detector.metrics
+
+            seconds, (detected, metrics) = _best_seconds(args.repeat, run)
+            found = _found(detected, expected)
+            if baseline is None:
+                baseline = (seconds, found)
+            counters = metrics.counters
+            windows = counters.get("film_windows", 0)
+            total_windows = windows + counters.get("film_candidate_windows_pruned", 0)
+            pairs = {(post, mention.film.id) for post, mentions in enumerate(detected) for mention in mentions}
+            lost = len(baseline[1] - found) / max(1, len(baseline[1]))
+            print(
+                f"{name:>16}: {seconds:7.3f} s, x{baseline[0] / seconds:5.2f}, "
+                f"windows {windows / max(1, total_windows):6.1%}, "
+                f"fallback {counters.get('film_candidate_fallbacks', 0) / len(texts):6.1%}, "
+                f"recall {len(found) / max(1, sum(map(len, expected))):.3f}, "
+                f"precision {len(found) / max(1, len(pairs)):.3f}, "
+                f"lost vs all {lost:6.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Детерминированный синтетический корпус для бенчмарков.
+
+Каталог повторяет формат `data/film-aliases.json`: русское название, его
+падежные формы (родительный, предложный, творительный) и оригинальное
+английское название. Посты похожи на телеграм-каналы о кино: русские и
+английские, с упоминаниями фильмов в нужном падеже, именами режиссёров,
+хэштегами, ссылками и эмодзи. Всё определяется `seed`, поэтому два запуска
+на разных машинах получают один и тот же корпус::
+
+    python -m ml.benchmarks.corpus --films 1000 --posts 5 --seed 13
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from dataclasses import dataclass
+
+# Главное слово названия: именительный, родительный, предложный, творительный.
+_RU_HEADS = (
+    ("ночь", "ночи", "ночи", "ночью"),
+    ("город", "города", "городе", "городом"),
+    ("дорога", "дороги", "дороге", "дорогой"),
+    ("тень", "тени", "тени", "тенью"),
+    ("зима", "зимы", "зиме", "зимой"),
+    ("море", "моря", "море", "морем"),
+    ("сон", "сна", "сне", "сном"),
+    ("дом", "дома", "доме", "домом"),
+    ("звезда", "звезды", "звезде", "звездой"),
+    ("война", "войны", "войне", "войной"),
+    ("песня", "песни", "песне", "песней"),
+    ("охота", "охоты", "охоте", "охотой"),
+    ("остров", "острова", "острове", "островом"),
+    ("край", "края", "крае", "краем"),
+    ("ветер", "ветра", "ветре", "ветром"),
+    ("сад", "сада", "саде", "садом"),
+    ("берег", "берега", "береге", "берегом"),
+    ("зеркало", "зеркала", "зеркале", "зеркалом"),
+    ("поезд", "поезда", "поезде", "поездом"),
+    ("лес", "леса", "лесе", "лесом"),
+    ("брат", "брата", "брате", "братом"),
+    ("сталкер", "сталкера", "сталкере", "сталкером"),
+    ("река", "реки", "реке", "рекой"),
+    ("маяк", "маяка", "маяке", "маяком"),
+)
+# Несогласуемое дополнение в родительном падеже — не склоняется вместе с названием.
+_RU_COMPLEMENTS = (
+    "севера", "времени", "судьбы", "дождя", "света", "огня", "молчания", "прошлого",
+    "луны", "надежды", "весны", "памяти", "снов", "отца", "солнца", "тишины",
+)
+_EN_HEADS = (
+    "Night", "City", "Road", "Shadow", "Winter", "Sea", "Dream", "House", "Star", "War",
+    "Song", "Hunt", "Island", "Edge", "Wind", "Garden", "Shore", "Mirror", "Train",
+    "Forest", "Brother", "Stalker", "River", "Lighthouse",
+)
+_EN_COMPLEMENTS = (
+    "of the North", "of Time", "of Fate", "of Rain", "of Light", "of Fire", "of Silence",
+    "of the Past", "of the Moon", "of Hope", "of Spring", "of Memory", "of Dreams",
+    "of the Father", "of the Sun", "of Stillness",
+)
+_HEAD_FORMS = {forms[0]: forms for forms in _RU_HEADS}
+_COUNTRIES = ("Россия", "СССР", "США", "Франция", "Япония", "Италия", "Великобритания")
+
+_RU_PERSONS = (
+    "Андрей Тарковский", "Алексей Балабанов", "Андрей Звягинцев", "Кира Муратова",
+    "Никита Михалков", "Лариса Шепитько", "Элем Климов", "Георгий Данелия",
+    "Сергей Бодров", "Глеб Панфилов", "Рената Литвинова", "Кантемир Балагов",
+)
+_EN_PERSONS = (
+    "David Lynch", "Stanley Kubrick", "Agnes Varda", "Wong Kar-wai", "Jane Campion",
+    "Akira Kurosawa", "Chantal Akerman", "Martin Scorsese", "Denis Villeneuve",
+)
+# Шаблоны упоминания по падежу формы алиаса: 0 — им., 1 — род., 2 — предл., 3 — твор.
+_RU_MENTIONS = (
+    ("{} — лучший фильм года.", "{} снова в прокате.", "Пересмотрели {} вчера вечером."),
+    ("Кадры из {}.", "Не ожидал такого финала от {}.", "Саундтрек {} не отпускает."),
+    ("Много думаю о {}.", "В {} потрясающая операторская работа.", "Спор о {} в комментариях."),
+    ("Вдохновлены {}.", "Сравнили с {} — небо и земля.", "Восхищаюсь {} уже десять лет."),
+)
+_EN_MENTIONS = (
+    "Rewatched {} last night.", "{} is still the best film of the decade.",
+    "The soundtrack of {} is amazing.", "Thread about {} below.",
+)
+_RU_SENTENCES = (
+    "Режиссёр {person} снова удивил.", "Интервью с {person} выйдет завтра.",
+    "Это очень красивая история о взрослении.", "Финал оставляет больше вопросов, чем ответов.",
+    "Подборка на выходные уже в канале.", "Смотрели в кинотеатре, зал был полный.",
+    "Операторская работа заслуживает отдельного поста.", "{person} говорит, что это личный фильм.",
+)
+_EN_SENTENCES = (
+    "Director {person} did it again.", "Interview with {person} drops tomorrow.",
+    "The ending leaves more questions than answers.", "Our weekend watchlist is up.",
+    "{person} calls it a deeply personal film.", "The cinematography deserves its own post.",
+)
+# Все имена людей в постах — словарь для заглушки NER в бенчмарках.
+PERSONS = _RU_PERSONS + _EN_PERSONS
+_HASHTAGS = ("#кино", "#cinema", "#рецензия", "#review", "#фестиваль", "#classic")
+_EMOJI = ("🎬", "🍿", "🔥", "✨", "🎞")
+
+
+@dataclass(slots=True, frozen=True)
+class SyntheticPost:
+    text: str
+    language: str
+    film_ids: tuple[str, ...]
+    persons: tuple[str, ...]
+
+
+def synthetic_catalogue(size: int, *, seed: int = 13) -> list[dict[str, object]]:
+    """Каталог фильмов с падежными формами русских названий.
+
+    Повторяющиеся сочетания получают номер, как сиквелы («Дорога ветра 2»),
+    поэтому алиасы разных фильмов не совпадают при любом размере каталога.
+    """
+
+    rng = random.Random(seed)
+    catalogue: list[dict[str, object]] = []
+    used: dict[str, int] = {}
+    for idx in range(size):
+        head = rng.randrange(len(_RU_HEADS))
+        complement = rng.randrange(len(_RU_COMPLEMENTS)) if rng.random() < 0.8 else None
+        key = f"{head}:{complement}"
+        sequel = used.get(key, 0) + 1
+        used[key] = sequel
+        suffix = f" {sequel}" if sequel > 1 else ""
+        ru_tail = f" {_RU_COMPLEMENTS[complement]}" if complement is not None else ""
+        en_tail = f" {_EN_COMPLEMENTS[complement]}" if complement is not None else ""
+        forms = [f"{form.capitalize()}{ru_tail}{suffix}" for form in _RU_HEADS[head]]
+        original = f"The {_EN_HEADS[head]}{en_tail}{suffix}"
+        catalogue.append(
+            {
+                "id": f"film-{idx}",
+                "title": forms[0],
+                "originalTitle": original,
+                "year": 1950 + rng.randrange(75),
+                "countries": rng.choice(_COUNTRIES),
+                "aliases": list(dict.fromkeys([*forms, original])),
+            }
+        )
+    return catalogue
+
+
+def _mention(entry: dict[str, object], language: str, rng: random.Random) -> str:
+    if language == "en":
+        title = str(entry["originalTitle"])
+        return rng.choice(_EN_MENTIONS).format(title)
+    # Формы восстанавливаются по названию: в `aliases` совпадающие формы схлопнуты.
+    head, _, rest = str(entry["title"]).partition(" ")
+    case = rng.randrange(4)
+    title = " ".join(filter(None, (_HEAD_FORMS[head.lower()][case].capitalize(), rest)))
+    if rng.random() < 0.5:
+        title = f"«{title}»"
+    elif rng.random() < 0.3:
+        title = title.lower()
+    return rng.choice(_RU_MENTIONS[case]).format(title)
+
+
+def synthetic_posts(
+    catalogue: list[dict[str, object]],
+    count: int,
+    *,
+    seed: int = 13,
+    sentences: tuple[int, int] = (2, 6),
+    mentions: tuple[int, int] = (0, 3),
+    en_share: float = 0.2,
+) -> list[SyntheticPost]:
+    """Посты с известными упоминаниями фильмов и людей (для полноты)."""
+
+    rng = random.Random(seed)
+    posts: list[SyntheticPost] = []
+    for _ in range(count):
+        language = "en" if rng.random() < en_share else "ru"
+        persons_pool, templates = (
+            (_EN_PERSONS, _EN_SENTENCES) if language == "en" else (_RU_PERSONS, _RU_SENTENCES)
+        )
+        parts: list[str] = []
+        persons: list[str] = []
+        for _ in range(rng.randint(*sentences)):
+            template = rng.choice(templates)
+            if "{person}" in template:
+                person = rng.choice(persons_pool)
+                persons.append(person)
+                template = template.format(person=person)
+            parts.append(template)
+        films = rng.sample(catalogue, rng.randint(*mentions)) if catalogue else []
+        for entry in films:
+            parts.insert(rng.randrange(len(parts) + 1), _mention(entry, language, rng))
+        if rng.random() < 0.5:
+            parts.append(" ".join(rng.sample(_HASHTAGS, 2)))
+        if rng.random() < 0.3:
+            parts.append(f"https://t.me/kino/{rng.randrange(100000)}")
+        if rng.random() < 0.4:
+            parts.insert(0, rng.choice(_EMOJI))
+        posts.append(
+            SyntheticPost(
+                text=" ".join(parts),
+                language=language,
+                film_ids=tuple(str(entry["id"]) for entry in films),
+                persons=tuple(dict.fromkeys(persons)),
+            )
+        )
+    return posts
+
+
+def _typo(text: str, rng: random.Random) -> str:
+    position = rng.randrange(len(text))
+    operation = rng.randrange(3)
+    if operation == 0:
+        return text[:position] + text[position + 1 :]
+    if operation == 1 and position + 1 < len(text):
+        return text[:position] + text[position + 1] + text[position] + text[position + 2 :]
+    return text[:position] + text[position] + text[position:]
+
+
+def alias_queries(
+    catalogue: list[dict[str, object]], count: int, *, seed: int = 13, typo_share: float = 0.3
+) -> list[tuple[str, str]]:
+    """Запросы к резолверу `(query, film_id)`: формы алиасов, часть — с опечаткой."""
+
+    rng = random.Random(seed)
+    queries: list[tuple[str, str]] = []
+    for _ in range(count):
+        entry = rng.choice(catalogue)
+        query = str(rng.choice(entry["aliases"]))
+        if rng.random() < typo_share:
+            query = _typo(query, rng)
+        queries.append((query, str(entry["id"])))
+    return queries
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--catalogue", action="store_true", help="Напечатать каталог в формате JSON")
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    if args.catalogue:
+        print(json.dumps(catalogue, ensure_ascii=False, indent=2))
+        return
+    for post in synthetic_posts(catalogue, args.posts, seed=args.seed):
+        print(f"[{post.language}] films={list(post.film_ids)} persons={list(post.persons)}")
+        print(post.text, end="\n\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Скорость записи результатов анализа в SQLite-базу сайта.
+
+База создаётся во временном каталоге миграциями из `prisma/migrations`,
+посты — синтетические `PostAnalysis` с эмбеддингами, сущностями и
+упоминаниями фильмов. Второй проход пишет те же посты повторно (upsert)::
+
+    python -m ml.benchmarks.db_writer --posts 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from ..aliases import FilmRecord
+from ..config import DatabaseWriterConfig
+from ..database import AnalysisWriter, PostMetadata, PostRow
+from ..entity_extraction import Entity
+from ..film_detection import FilmMention
+from ..pipeline import PostAnalysis
+from .corpus import synthetic_catalogue, synthetic_posts
+
+MIGRATIONS = Path(__file__).resolve().parents[2] / "prisma" / "migrations"
+
+
+def create_database(path: Path) -> None:
+    """Применяет SQL-миграции Prisma по порядку."""
+
+    with sqlite3.connect(path) as conn:
+        for migration in sorted(MIGRATIONS.glob("*/migration.sql")):
+            conn.executescript(migration.read_text(encoding="utf-8"))
+
+
+def build_rows(count: int, dimension: int, films: int, seed: int) -> list[PostRow]:
+    catalogue = synthetic_catalogue(films, seed=seed)
+    records = {
+        entry["id"]: FilmRecord(
+            id=entry["id"],
+            title=entry["title"],
+            original_title=entry["originalTitle"],
+            year=entry["year"],
+            countries=entry["countries"],
+        )
+        for entry in catalogue
+    }
+    posts = synthetic_posts(catalogue, count, seed=seed)
+    embeddings = np.random.default_rng(seed).standard_normal((count, dimension), dtype=np.float32)
+    rows = []
+    for idx, post in enumerate(posts):
+        films = [records[film_id] for film_id in post.film_ids]
+        mentions = [
+            FilmMention(film=film, text=film.title, score=100.0, start=0, end=len(film.title))
+            for film in films
+        ]
+        entities = [Entity(text=f"Имя {idx % 500}", label="PER", start=0, end=8)]
+        rows.append(
+            PostRow(
+                PostMetadata(slug=f"post-{idx}", source_id=f"telegram:{idx}"),
+                PostAnalysis(text=post.text, entities=entities, film_mentions=mentions, embedding=embeddings[idx]),
+                topic=idx % 40,
+                topic_keywords=["тема", str(idx % 40)],
+            )
+        )
+    return rows
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--films", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=DatabaseWriterConfig().batch_size)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    rows = build_rows(args.posts, args.dimension, args.films, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "dev.db"
+        create_database(path)
+        config = DatabaseWriterConfig(path=path, batch_size=args.batch_size)
+        with AnalysisWriter(config) as writer:
+            for name in ("insert", "upsert"):
+                stats = writer.write(rows)
+                print(
+                    f"{name:>6}: {stats.posts} posts in {stats.seconds:.1f} s "
+                    f"({stats.posts_per_second:.0f} posts/s), links {stats.film_links}, "
+                    f"films created {stats.films_created}"
+                )
+        with sqlite3.connect(path) as conn:
+            counts = {
+                table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                for table in ("Post", "PostFilm", "PostAnalysis", "Film")
+            }
+        print(f"rows: {counts}, database {path.stat().st_size / 1024 / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
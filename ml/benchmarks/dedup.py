@@ -0,0 +1,122 @@
+"""Поиск почти-дубликатов (`ml.dedup`) перед стадиями конвейера.
+
+В синтетический корпус подмешиваются репосты с известным оригиналом: точные
+копии, копии с шапкой «Репост из …», с подписью-источником и с эмодзи в
+начале. Конвейер (NER — пустая модель spaCy со словарём имён, эмбеддинги —
+`TinyEncoder`) прогоняется без дедупликации и с ней; печатаются время, доля
+сэкономленных постов, полнота склейки репостов с оригиналами и совпадение
+сущностей и упоминаний с полным прогоном::
+
+    python -m ml.benchmarks.dedup --films 500 --posts 500 --repost-share 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from ..config import DedupConfig, EmbeddingConfig, EntityExtractionConfig, PipelineConfig
+from ..dedup import MinHashDeduplicator
+from ..embeddings import EmbeddingGenerator
+from ..metrics import PipelineMetrics
+from ..pipeline import AnalysisPipeline, PostAnalysis
+from .corpus import synthetic_catalogue, synthetic_posts
+from .suite import TinyEncoder, _resolver, _ruler_model
+
+_CHANNELS = ("kino_daily", "cinemaholic", "arthouse_ru", "festival_news")
+_EMOJI = ("🎬", "🍿", "🔥")
+
+
+def _repost(text: str, rng: random.Random) -> str:
+    channel = rng.choice(_CHANNELS)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return text
+    if kind == 1:
+        return f"Репост из @{channel}:\n{text}"
+    if kind == 2:
+        return f"{text}\n\nИсточник: @{channel}"
+    return f"{rng.choice(_EMOJI)} {text}"
+
+
+def build_corpus(posts: list[str], share: float, rng: random.Random) -> tuple[list[str], dict[int, int]]:
+    """Перемешанные посты с репостами и словарь `индекс репоста → индекс оригинала`."""
+
+    reposts = int(len(posts) * share)
+    sources = list(range(len(posts))) + [rng.randrange(len(posts)) for _ in range(reposts)]
+    texts = posts + [_repost(posts[src], rng) for src in sources[len(posts) :]]
+    order = list(range(len(texts)))
+    rng.shuffle(order)
+    position = {old: new for new, old in enumerate(order)}
+    origins = {position[old]: position[sources[old]] for old in range(len(posts), len(texts))}
+    return [texts[old] for old in order], origins
+
+
+def _agreement(full: PostAnalysis, deduplicated: PostAnalysis) -> tuple[bool, bool]:
+    entities = {(entity.label, entity.start, entity.end) for entity in full.entities} == {
+        (entity.label, entity.start, entity.end) for entity in deduplicated.entities
+    }
+    mentions = {(mention.film.id, mention.start, mention.end) for mention in full.film_mentions} == {
+        (mention.film.id, mention.start, mention.end) for mention in deduplicated.film_mentions
+    }
+    return entities, mentions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--repost-share", type=float, default=0.3)
+    parser.add_argument("--threshold", type=float, default=DedupConfig().threshold)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    originals = [post.text for post in synthetic_posts(catalogue, args.posts, seed=args.seed)]
+    texts, origins = build_corpus(originals, args.repost_share, rng)
+    dedup = DedupConfig(enabled=True, threshold=args.threshold)
+
+    started = time.perf_counter()
+    groups = MinHashDeduplicator(dedup).group(texts)
+    grouping = time.perf_counter() - started
+    merged = sum(groups.representatives[idx] == groups.representatives[src] for idx, src in origins.items())
+    print(f"grouping: {grouping:.3f} s, {len(texts) / grouping:.0f} posts/s, {groups.summary()}")
+    print(f"reposts joined with their original: {merged}/{len(origins)}")
+
+    results: dict[str, list[PostAnalysis]] = {}
+    with tempfile.TemporaryDirectory() as tmp_name:
+        tmp = Path(tmp_name)
+        entities = EntityExtractionConfig(
+            model_path=_ruler_model(tmp / "ner-ruler"), enabled_components=("entity_ruler",)
+        )
+        resolver = _resolver(catalogue, tmp)
+        for name, config in (("full", DedupConfig()), ("dedup", dedup)):
+            metrics = PipelineMetrics()
+            pipeline = AnalysisPipeline(
+                PipelineConfig(entities=entities, dedup=config), alias_resolver=resolver, metrics=metrics
+            )
+            pipeline.embedder = EmbeddingGenerator(EmbeddingConfig(), backend=TinyEncoder())
+            pipeline.entity_extractor.nlp  # загрузка модели не входит в замер
+            started = time.perf_counter()
+            results[name] = pipeline.analyze(texts, cluster=False).posts
+            seconds = time.perf_counter() - started
+            stages = ", ".join(
+                f"{stage} {data['items']} items {data['wall_seconds']:.2f} s"
+                for stage, data in metrics.snapshot()["stages"].items()
+            )
+            print(f"{name:>6}: {seconds:7.3f} s, {len(texts) / seconds:7.0f} posts/s ({stages})")
+
+    duplicates = [idx for idx in range(len(texts)) if groups.representatives[idx] != idx]
+    agreement = [_agreement(results["full"][idx], results["dedup"][idx]) for idx in duplicates]
+    print(
+        f"duplicates matching the full run: entities {sum(entities for entities, _ in agreement)}"
+        f"/{len(duplicates)}, film mentions {sum(mentions for _, mentions in agreement)}/{len(duplicates)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
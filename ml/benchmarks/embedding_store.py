@@ -0,0 +1,81 @@
+"""Память, скорость и потеря качества квантованного `EmbeddingStore`.
+
+Для каждого типа (`float32`, `float16`, `int8`) печатаются байты на вектор,
+время квантования, запросы в секунду top-k поиска по кодам, recall@k и
+совпадение первого соседа относительно точного float32-поиска, а также
+средняя и максимальная ошибка косинуса. По умолчанию векторы синтетические
+(нормированные точки вокруг `--clusters` центров); `--vectors` подставляет
+настоящие эмбеддинги из `.npy` (например, `EmbeddingGenerator.embed_to_memmap`)::
+
+    python -m ml.benchmarks.embedding_store --size 100000 --dimension 768 --queries 500
+    python -m ml.benchmarks.embedding_store --vectors embeddings.npy --queries 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ..embedding_store import STORE_DTYPES, EmbeddingStore
+
+
+def _synthetic(size: int, dimension: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, size)]
+    vectors += rng.standard_normal((size, dimension), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--vectors", type=Path, default=None, help="Эмбеддинги в .npy вместо синтетики")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    if args.vectors is not None:
+        vectors = np.load(args.vectors, mmap_mode="r")
+    else:
+        vectors = _synthetic(args.size, args.dimension, args.clusters, rng)
+    # Запросы — зашумлённые векторы корпуса, как «похожие посты».
+    picked = np.asarray(
+        vectors[np.sort(rng.choice(len(vectors), args.queries, replace=False))], dtype=np.float32
+    )
+    queries = picked + 0.3 * rng.standard_normal(picked.shape, dtype=np.float32) / np.sqrt(picked.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    stores: dict[str, tuple[EmbeddingStore, float]] = {}
+    for dtype in STORE_DTYPES:
+        started = time.perf_counter()
+        store = EmbeddingStore.build(vectors, dtype=dtype)
+        stores[dtype] = (store, time.perf_counter() - started)
+    exact_store = stores["float32"][0]
+    exact_rows, _ = exact_store.search_batch(queries, args.k)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]}, {args.queries} queries, k={args.k}")
+    for dtype, (store, build_seconds) in stores.items():
+        started = time.perf_counter()
+        rows, scores = store.search_batch(queries, args.k)
+        search_seconds = time.perf_counter() - started
+        recall = np.mean([len(set(got) & set(want)) / args.k for got, want in zip(rows, exact_rows)])
+        # Ошибка косинуса — на найденных строках против точного float32-значения.
+        found = exact_store.vectors(rows.ravel()).reshape(*rows.shape, -1)
+        true_scores = np.einsum("qd,qkd->qk", queries, found) / np.linalg.norm(found, axis=2)
+        error = np.abs(scores - true_scores)
+        print(
+            f"{dtype:>8}: {store.nbytes / len(store):7.1f} B/vector, build {build_seconds:6.3f} s, "
+            f"{len(queries) / search_seconds:8.1f} queries/s, recall@{args.k} {recall:.4f}, "
+            f"top-1 {np.mean(rows[:, 0] == exact_rows[:, 0]):.4f}, "
+            f"cosine error mean {error.mean():.2e} max {error.max():.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
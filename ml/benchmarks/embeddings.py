@@ -0,0 +1,115 @@
+"""Скорость и память движков эмбеддингов (текстов в секунду, RSS).
+
+Каждый движок запускается в отдельном интерпретаторе, чтобы пиковый RSS
+не смешивался; векторы сравниваются с torch по косинусу::
+
+    python -m ml.embeddings export-onnx --output models/onnx
+    python -m ml.benchmarks.embeddings --onnx-path models/onnx --texts 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from ..config import EmbeddingConfig
+from ..embeddings import cosine_agreement
+from .corpus import synthetic_catalogue, synthetic_posts
+
+# (метка, backend, onnx_precision)
+VARIANTS = (("torch", "torch", "int8"), ("onnx-fp32", "onnx", "fp32"), ("onnx-int8", "onnx", "int8"))
+
+_PROBE = """
+import json, resource, sys, time
+from pathlib import Path
+import numpy as np
+from ml.config import EmbeddingConfig
+from ml.embeddings import EmbeddingGenerator
+
+args = json.loads(sys.argv[1])
+texts = json.loads(Path(args["texts"]).read_text(encoding="utf-8"))
+config = EmbeddingConfig(
+    batch_size=args["batch_size"],
+    backend=args["backend"],
+    onnx_path=args["onnx_path"],
+    onnx_precision=args["precision"],
+    onnx_threads=args["threads"],
+    max_batch_tokens=args["max_batch_tokens"],
+)
+generator = EmbeddingGenerator(config)
+generator.embed(texts[: args["batch_size"]])  # загрузка модели не входит в замер
+started = time.perf_counter()
+embeddings = generator.embed(texts)
+seconds = time.perf_counter() - started
+np.save(args["output"], embeddings)
+peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": seconds, "peak_rss_mib": peak_kib / 1024}))
+"""
+
+
+def _run(variant: tuple[str, str, str], args: argparse.Namespace, texts: Path, output: Path) -> dict:
+    _, backend, precision = variant
+    payload = {
+        "texts": str(texts),
+        "output": str(output),
+        "batch_size": args.batch_size,
+        "backend": backend,
+        "onnx_path": str(args.onnx_path) if args.onnx_path else None,
+        "precision": precision,
+        "threads": args.threads,
+        "max_batch_tokens": args.max_batch_tokens or None,
+    }
+    stdout = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(payload)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--onnx-path", type=Path, help="Каталог export-onnx; без него — только torch")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, help="onnx_threads")
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=EmbeddingConfig().max_batch_tokens,
+        help="0 — фиксированные батчи по --batch-size",
+    )
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(1000, seed=args.seed)
+    posts = [post.text for post in synthetic_posts(catalogue, args.texts, seed=args.seed)]
+    variants = [variant for variant in VARIANTS if args.onnx_path or variant[1] == "torch"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        texts = Path(tmp) / "texts.json"
+        texts.write_text(json.dumps(posts, ensure_ascii=False), encoding="utf-8")
+        reference = None
+        for variant in variants:
+            output = Path(tmp) / f"{variant[0]}.npy"
+            result = _run(variant, args, texts, output)
+            embeddings = np.load(output)
+            if reference is None:
+                reference = embeddings
+            agreement = cosine_agreement(reference, embeddings)
+            print(
+                f"{variant[0]:>10}: {len(posts) / result['seconds']:8.1f} texts/s, "
+                f"peak RSS {result['peak_rss_mib']:7.1f} MiB, "
+                f"cos vs torch min {agreement.min():.4f} mean {agreement.mean():.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
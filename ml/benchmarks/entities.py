@@ -0,0 +1,71 @@
+"""Пропускная способность извлечения сущностей (постов в секунду).
+
+Сравнивает полный конвейер spaCy с размером пачки по умолчанию и конвейер,
+в котором включён только NER, при разных `batch_size`/`n_process`::
+
+    python -m ml.benchmarks.entities --posts 2000 --batch-sizes 64 256 --processes 1 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import replace
+
+from ..config import EntityExtractionConfig
+from ..entity_extraction import Entity, EntityExtractor
+from .corpus import synthetic_catalogue, synthetic_posts
+
+# Размер пачки nlp.pipe по умолчанию в spaCy 3.
+_SPACY_DEFAULT_BATCH = 1000
+
+
+def _run(
+    config: EntityExtractionConfig, posts: list[str]
+) -> tuple[float, list[list[Entity]]]:
+    extractor = EntityExtractor(config)
+    extractor.nlp  # загрузка модели не входит в замер
+    started = time.perf_counter()
+    entities = extractor.extract_batch(posts)
+    return time.perf_counter() - started, entities
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=EntityExtractionConfig().spacy_model)
+    parser.add_argument(
+        "--components",
+        nargs="+",
+        default=list(EntityExtractionConfig().enabled_components or ()),
+        help="Компоненты, которые остаются включены",
+    )
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1])
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(1000, seed=args.seed)
+    posts = [post.text for post in synthetic_posts(catalogue, args.posts, seed=args.seed)]
+    base = EntityExtractionConfig(spacy_model=args.model, enabled_components=tuple(args.components))
+
+    baseline_seconds, baseline = _run(
+        replace(base, enabled_components=None, batch_size=_SPACY_DEFAULT_BATCH, n_process=1), posts
+    )
+    print(f"{'full pipeline':>24}: {len(posts) / baseline_seconds:8.1f} posts/s")
+    identical = True
+    for batch_size in args.batch_sizes:
+        for n_process in args.processes:
+            config = replace(base, batch_size=batch_size, n_process=n_process)
+            seconds, entities = _run(config, posts)
+            identical = identical and entities == baseline
+            name = f"trimmed batch={batch_size} p={n_process}"
+            print(
+                f"{name:>24}: {len(posts) / seconds:8.1f} posts/s, "
+                f"x{baseline_seconds / seconds:.1f}"
+            )
+    print(f"identical entities: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Сравнение стратегий детекции упоминаний фильмов.
+
+Пример запуска::
+
+    python -m ml.benchmarks.film_detection --films 20000 --posts 50 --workers 1 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from ..aliases import FilmAliasResolver
+from ..config import FilmAliasConfig
+from ..film_detection import FilmMentionDetector
+from .corpus import synthetic_catalogue, synthetic_posts
+
+
+def _run(
+    detector: FilmMentionDetector, posts: list[str], *, workers: int = 1, chunk_size: int = 4
+) -> tuple[float, list[list[tuple]]]:
+    started = time.perf_counter()
+    results = [
+        [(m.film.id, m.start, m.end, m.score) for m in mentions]
+        for mentions in detector.iter_detect(posts, workers=workers, chunk_size=chunk_size)
+    ]
+    return time.perf_counter() - started, results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=5000)
+    parser.add_argument("--posts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument(
+        "--chunk-size", type=int, default=4, help="Постов в одном вызове cdist / задаче пула"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Размеры пула процессов для замера iter_detect (стратегия indexed)",
+    )
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    posts = [post.text for post in synthetic_posts(catalogue, args.posts, seed=args.seed)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "aliases.json"
+        path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding="utf-8")
+        timings: dict[str, float] = {}
+        outputs: dict[str, list[list[tuple]]] = {}
+        detectors: dict[str, FilmMentionDetector] = {}
+        for strategy in ("exhaustive", "indexed", "cdist"):
+            config = FilmAliasConfig(aliases_path=path, detection_strategy=strategy)
+            resolver = FilmAliasResolver(config)
+            resolver.load()
+            detectors[strategy] = FilmMentionDetector(resolver)
+            timings[strategy], outputs[strategy] = _run(
+                detectors[strategy], posts, chunk_size=args.chunk_size
+            )
+        for workers in args.workers:
+            name = f"indexed/{workers}p"
+            timings[name], outputs[name] = _run(
+                detectors["indexed"], posts, workers=workers, chunk_size=args.chunk_size
+            )
+
+    baseline = timings["exhaustive"]
+    for strategy, elapsed in timings.items():
+        print(
+            f"{strategy:>10}: {elapsed:8.3f} s, {elapsed / len(posts) * 1000:8.2f} ms/post, "
+            f"x{baseline / elapsed:.1f}"
+        )
+    identical = all(result == outputs["exhaustive"] for result in outputs.values())
+    print(f"identical mentions: {identical}")
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
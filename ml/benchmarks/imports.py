@@ -0,0 +1,70 @@
+"""Проверка лёгких путей импорта пакета `ml`.
+
+Каждый сценарий выполняется в отдельном интерпретаторе; скрипт печатает
+время импорта и завершается с кодом 1, если лёгкий путь подтянул тяжёлые
+зависимости (torch, UMAP и т. п.). Подходит для CI::
+
+    python -m ml.benchmarks.imports
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "spacy", "umap", "numba", "hdbscan", "sklearn")
+
+LIGHT_PATHS = (
+    "import ml",
+    "from ml import FilmAliasResolver",
+    "from ml import FilmMentionDetector",
+    "from ml.config import PipelineConfig",
+    "from ml.aliases import FilmAliasResolver",
+    "from ml.registry import ArtifactRegistry",
+    "from ml import AnalysisPipeline, EmbeddingGenerator, EntityExtractor, TopicClusterer",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def probe(statement: str) -> dict[str, object]:
+    """Выполняет `statement` в чистом интерпретаторе и возвращает замер."""
+
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "statements", nargs="*", default=list(LIGHT_PATHS), help="Проверяемые инструкции импорта"
+    )
+    args = parser.parse_args(argv)
+
+    failed = False
+    for statement in args.statements:
+        result = probe(statement)
+        heavy = result["heavy"]
+        status = "ok" if not heavy else "FAIL: " + ", ".join(heavy)
+        print(f"{result['seconds']:7.3f} s  {statement}  [{status}]")
+        failed = failed or bool(heavy)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
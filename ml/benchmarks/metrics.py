@@ -0,0 +1,86 @@
+"""Накладные расходы метрик стадий на детекции фильмов.
+
+Одни и те же посты детектируются с выключенными метриками (`NULL_METRICS`),
+с включёнными и с захватом cProfile/tracemalloc; печатается время каждого
+варианта и собранные метрики в формате JSON или Prometheus::
+
+    python -m ml.benchmarks.metrics --posts 100 --format prometheus
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from ..aliases import FilmAliasResolver
+from ..config import FilmAliasConfig
+from ..film_detection import FilmMentionDetector
+from ..metrics import NULL_METRICS, NullMetrics, PipelineMetrics
+from .corpus import synthetic_catalogue, synthetic_posts
+
+
+def _run(
+    resolver: FilmAliasResolver,
+    metrics: PipelineMetrics | NullMetrics,
+    posts: list[str],
+    chunk_size: int,
+) -> float:
+    # Новый детектор — пустой кэш фраз: каждый проход делает одинаковую работу.
+    detector = FilmMentionDetector(resolver)
+    detector.metrics = metrics
+    started = time.perf_counter()
+    for offset in range(0, len(posts), chunk_size):
+        chunk = posts[offset : offset + chunk_size]
+        with metrics.stage("films/detect", len(chunk)):
+            detector.detect_batch(chunk, workers=1)
+    return time.perf_counter() - started
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--format", choices=("json", "prometheus"), default="json")
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    posts = [post.text for post in synthetic_posts(catalogue, args.posts, seed=args.seed)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "aliases.json"
+        path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding="utf-8")
+        resolver = FilmAliasResolver(FilmAliasConfig(aliases_path=path))
+        resolver.load()
+    _run(resolver, NULL_METRICS, posts[: args.chunk_size], args.chunk_size)
+
+    variants = {
+        "disabled": lambda: NULL_METRICS,
+        "enabled": PipelineMetrics,
+        "cprofile": lambda: PipelineMetrics(capture="cprofile"),
+        "tracemalloc": lambda: PipelineMetrics(capture="tracemalloc"),
+    }
+    best: dict[str, float] = {}
+    collected: PipelineMetrics | None = None
+    for _ in range(args.repeats):
+        for name, factory in variants.items():
+            metrics = factory()
+            seconds = _run(resolver, metrics, posts, args.chunk_size)
+            best[name] = min(best.get(name, seconds), seconds)
+            if name == "enabled":
+                collected = metrics
+    for name, seconds in best.items():
+        print(
+            f"{name:>11}: {seconds:7.3f} s, {len(posts) / seconds:8.0f} posts/s, "
+            f"{(seconds / best['disabled'] - 1) * 100:+6.1f}% vs disabled"
+        )
+    assert collected is not None
+    print(collected.to_json() if args.format == "json" else collected.to_prometheus(), end="")
+
+
+if __name__ == "__main__":
+    main()
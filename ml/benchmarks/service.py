@@ -0,0 +1,133 @@
+"""Задержка и пропускная способность `ml.service` под конкурентной нагрузкой.
+
+Сервис поднимается в этом же процессе на синтетическом каталоге с
+заглушкой-кодировщиком `TinyEncoder`; `--concurrency` клиентов шлют запросы
+по keep-alive соединениям, каждый следующий — после ответа на предыдущий.
+Для каждого уровня конкурентности сравниваются микропачки и
+`max_batch_size=1` (без пачек)::
+
+    python -m ml.benchmarks.service --films 2000 --concurrency 1 50 200 --method resolve
+
+Выигрыш пачек зависит от числа ядер: `/resolve` ускоряется только за счёт
+параллельного `cdist`, поэтому сравнивайте на той машине, где будет сервис.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from ..aliases import FilmAliasResolver
+from ..config import EmbeddingConfig, FilmAliasConfig, ServiceConfig
+from ..embeddings import EmbeddingGenerator
+from ..service import InferenceService
+from .corpus import alias_queries, synthetic_catalogue, synthetic_posts
+from .suite import TinyEncoder
+
+
+def _request(method: str, text: str) -> bytes:
+    if method == "resolve":
+        return f"GET /resolve?q={quote(text)} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+    body = json.dumps({"text": text}, ensure_ascii=False).encode()
+    head = f"POST /embed HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n"
+    return head.encode() + body
+
+
+async def _client(port: int, requests: list[bytes], latencies: list[float], statuses: list[int]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for request in requests:
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+    finally:
+        writer.close()
+
+
+async def _measure(
+    service: InferenceService, method: str, texts: list[str], concurrency: int, per_client: int
+) -> dict[str, float]:
+    await service.start()
+    try:
+        rng = random.Random(concurrency)
+        latencies: list[float] = []
+        statuses: list[int] = []
+        workloads = [
+            [_request(method, rng.choice(texts)) for _ in range(per_client)] for _ in range(concurrency)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(_client(service.port, workload, latencies, statuses) for workload in workloads)
+        )
+        seconds = time.perf_counter() - started
+        health = service.health()
+    finally:
+        await service.close()
+    queue = health["queues"][method]
+    milliseconds = np.array(latencies) * 1000
+    return {
+        "rps": len(latencies) / seconds,
+        "p50": float(np.percentile(milliseconds, 50)),
+        "p99": float(np.percentile(milliseconds, 99)),
+        "batch": queue["meanBatchSize"],
+        "rejected": sum(status == 503 for status in statuses),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=2000)
+    parser.add_argument("--method", choices=("resolve", "embed"), default="resolve")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 200])
+    parser.add_argument("--requests", type=int, default=2000, help="Всего запросов на уровень")
+    parser.add_argument("--max-batch-size", type=int, default=ServiceConfig().max_batch_size)
+    parser.add_argument("--max-wait-ms", type=float, default=ServiceConfig().max_wait_ms)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    catalogue = synthetic_catalogue(args.films, seed=args.seed)
+    if args.method == "resolve":
+        texts = [query for query, _ in alias_queries(catalogue, 5000, seed=args.seed)]
+    else:
+        texts = [post.text for post in synthetic_posts(catalogue, 5000, seed=args.seed)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "aliases.json"
+        path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding="utf-8")
+        aliases = FilmAliasConfig(aliases_path=path, resolve_cache_size=0)
+        resolver = FilmAliasResolver(aliases)
+        resolver.load()
+
+    base = ServiceConfig(port=0, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    for concurrency in args.concurrency:
+        per_client = max(1, args.requests // concurrency)
+        for name, config in (("batched", base), ("unbatched", replace(base, max_batch_size=1))):
+            embedder = EmbeddingGenerator(EmbeddingConfig(), backend=TinyEncoder())
+            service = InferenceService(resolver, embedder, config)
+            result = asyncio.run(_measure(service, args.method, texts, concurrency, per_client))
+            print(
+                f"c={concurrency:>4} {name:>9}: {result['rps']:8.0f} req/s, "
+                f"p50 {result['p50']:7.2f} ms, p99 {result['p99']:7.2f} ms, "
+                f"batch {result['batch']:5.1f}, rejected {result['rejected']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Время холодного и тёплого старта конвейера.
+
+Каждый сценарий запускается в отдельном интерпретаторе, поэтому замер включает
+импорты — так же, как у короткоживущих заданий импорта::
+
+    python -m ml.benchmarks.startup --registry data/ml-artifacts --components aliases topics
+
+Первый запуск без снимков (`--snapshot`) создаёт их в каталоге реестра.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from ..registry import COMPONENTS
+
+
+def _child(mode: str, registry_root: Path, components: list[str]) -> None:
+    started = time.perf_counter()
+    from ..config import PipelineConfig
+    from ..pipeline import AnalysisPipeline
+    from ..registry import ArtifactRegistry
+
+    registry = ArtifactRegistry(registry_root)
+    if mode == "warm":
+        pipeline = registry.load_pipeline(PipelineConfig())
+    else:
+        pipeline = AnalysisPipeline(PipelineConfig())
+    # Принудительно поднимаем ленивые модели, чтобы сравнение было честным.
+    if "embeddings" in components:
+        pipeline.embedder.backend
+    if "entities" in components:
+        pipeline.entity_extractor.nlp
+    if mode == "snapshot":
+        registry.snapshot(pipeline, components=components)
+    print(json.dumps({"mode": mode, "seconds": time.perf_counter() - started}))
+
+
+def _run(mode: str, registry_root: Path, components: list[str]) -> tuple[float, float]:
+    """Возвращает `(полное время процесса, время сборки конвейера после импортов)`."""
+
+    started = time.perf_counter()
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "ml.benchmarks.startup",
+            "--child",
+            mode,
+            "--registry",
+            str(registry_root),
+            "--components",
+            *components,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    elapsed = time.perf_counter() - started
+    return elapsed, float(json.loads(output.strip().splitlines()[-1])["seconds"])
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registry", type=Path, required=True)
+    parser.add_argument("--components", nargs="+", choices=COMPONENTS, default=["aliases"])
+    parser.add_argument("--snapshot", action="store_true", help="Пересоздать снимки перед замером")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=("cold", "warm", "snapshot"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child, args.registry, args.components)
+        return
+
+    if args.snapshot or not (args.registry / "manifest.json").exists():
+        _run("snapshot", args.registry, args.components)
+    for mode in ("cold", "warm"):
+        runs = [_run(mode, args.registry, args.components) for _ in range(args.repeat)]
+        process = sorted(total for total, _ in runs)
+        ready = sorted(build for _, build in runs)
+        middle = len(runs) // 2
+        print(
+            f"{mode:>5}: process median {process[middle]:.3f} s (min {process[0]:.3f} s), "
+            f"pipeline build median {ready[middle]:.3f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""Воспроизводимый набор бенчмарков с машиночитаемыми результатами.
+
+Сценарии работают офлайн на синтетическом корпусе (`ml.benchmarks.corpus`):
+детекция фильмов в зависимости от размера каталога, QPS резолвера алиасов,
+пропускная способность эмбеддингов на заглушке-кодировщике `TinyEncoder`,
+NER на пустой модели spaCy со словарём имён (или на настоящей модели) и время
+кластеризации в зависимости от числа постов. `run` пишет JSON, `compare`
+сравнивает два запуска и завершается с кодом 1, если метрика ухудшилась
+больше порога::
+
+    python -m ml.benchmarks.suite run --quick --output base.json
+    python -m ml.benchmarks.suite run --quick --output new.json
+    python -m ml.benchmarks.suite compare base.json new.json --threshold 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+
+from ..aliases import FilmAliasResolver
+from ..config import EmbeddingConfig, EntityExtractionConfig, FilmAliasConfig, TopicClusteringConfig
+from ..embeddings import EmbeddingGenerator
+from ..entity_extraction import EntityExtractor
+from ..film_detection import FilmMentionDetector
+from ..topic_detection import TopicClusterer
+from .corpus import PERSONS, SyntheticPost, alias_queries, synthetic_catalogue, synthetic_posts
+from .vector_index import build_vectors
+
+FORMAT = 1
+# Метрики с такими суффиксами растут при улучшении, остальные (время) — падают.
+_HIGHER_IS_BETTER = ("_per_second", "qps", "recall", "precision", "accuracy", "ari")
+
+
+@dataclass(slots=True)
+class BenchmarkResult:
+    scenario: str
+    params: dict[str, object]
+    metrics: dict[str, float]
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.scenario, json.dumps(self.params, sort_keys=True)
+
+
+@dataclass(slots=True)
+class Comparison:
+    scenario: str
+    params: dict[str, object]
+    metric: str
+    baseline: float
+    candidate: float
+    change: float
+    regression: bool
+
+
+class TinyEncoder:
+    """Заглушка кодировщика для офлайн-замеров `EmbeddingGenerator`.
+
+    Токены хэшируются (crc32, не зависит от PYTHONHASHSEED) в `buckets`
+    корзин, вектор текста — сумма строк фиксированной случайной проекции.
+    Векторы детерминированы, а стоимость растёт с длиной текста, как у модели.
+    """
+
+    def __init__(self, dimension: int = 64, *, buckets: int = 4096, max_tokens: int = 128) -> None:
+        self.cache_name = f"tiny-hash-{dimension}"
+        self.max_tokens = max_tokens
+        self._buckets = buckets
+        rng = np.random.default_rng(0)
+        self._projection = rng.standard_normal((buckets, dimension), dtype=np.float32)
+
+    @property
+    def dimension(self) -> int:
+        return self._projection.shape[1]
+
+    def _token_ids(self, text: str) -> list[int]:
+        tokens = text.lower().split()[: self.max_tokens]
+        return [zlib.crc32(token.encode("utf-8")) % self._buckets for token in tokens]
+
+    def encode(self, texts: Sequence[str], *, batch_size: int, normalize: bool) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = self._token_ids(text)
+            if ids:
+                vectors[row] = self._projection[ids].sum(axis=0)
+        if normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.maximum(norms, 1e-12)
+        return vectors
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        return np.array([min(len(text.split()), self.max_tokens) for text in texts], dtype=np.int64)
+
+
+def _best_seconds(repeat: int, run: Callable[[], object]) -> tuple[float, object]:
+    """Минимальное время из `repeat` прогонов и результат последнего."""
+
+    best = math.inf
+    output = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        output = run()
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def _resolver(catalogue: list[dict[str, object]], tmp: Path, **changes: object) -> FilmAliasResolver:
+    path = tmp / f"aliases-{len(catalogue)}.json"
+    if not path.exists():
+        path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding="utf-8")
+    resolver = FilmAliasResolver(FilmAliasConfig(aliases_path=path, **changes))
+    resolver.load()
+    return resolver
+
+
+def scenario_detection(args: argparse.Namespace, tmp: Path) -> list[BenchmarkResult]:
+    results = []
+    for films in args.films:
+        catalogue = synthetic_catalogue(films, seed=args.seed)
+        posts = synthetic_posts(catalogue, args.posts, seed=args.seed)
+        texts = [post.text for post in posts]
+        for strategy in args.strategies:
+            resolver = _resolver(catalogue, tmp, detection_strategy=strategy)
+            # Новый детектор на каждый прогон — холодный кэш фраз.
+            seconds, detected = _best_seconds(
+                args.repeat,
+                lambda: FilmMentionDetector(resolver).detect_batch(texts, workers=1),
+            )
+            found = [{mention.film.id for mention in mentions} for mentions in detected]
+            expected = [set(post.film_ids) for post in posts]
+            hits = sum(len(got & want) for got, want in zip(found, expected))
+            results.append(
+                BenchmarkResult(
+                    "detection",
+                    {"films": films, "posts": len(texts), "strategy": strategy},
+                    {
+                        "seconds": seconds,
+                        "posts_per_second": len(texts) / seconds,
+                        "recall": hits / max(1, sum(map(len, expected))),
+                        "precision": hits / max(1, sum(map(len, found))),
+                    },
+                )
+            )
+    return results
+
+
+def scenario_resolve(args: argparse.Namespace, tmp: Path) -> list[BenchmarkResult]:
+    results = []
+    for films in args.films:
+        catalogue = synthetic_catalogue(films, seed=args.seed)
+        queries = alias_queries(catalogue, args.queries, seed=args.seed)
+        texts = [query for query, _ in queries]
+        resolver = _resolver(catalogue, tmp, resolve_cache_size=0)
+        seconds, matches = _best_seconds(
+            args.repeat, lambda: [resolver.resolve(text, limit=1) for text in texts]
+        )
+        batch_seconds, _ = _best_seconds(args.repeat, lambda: resolver.resolve_many(texts, limit=1))
+        # При limit > 1 resolve_many оценивает пачку через cdist, при limit=1 — поэлементно.
+        top5_seconds, _ = _best_seconds(
+            args.repeat, lambda: [resolver.resolve(text, limit=5) for text in texts]
+        )
+        top5_batch_seconds, _ = _best_seconds(args.repeat, lambda: resolver.resolve_many(texts, limit=5))
+        correct = sum(
+            bool(found) and found[0].film.id == film_id for found, (_, film_id) in zip(matches, queries)
+        )
+        results.append(
+            BenchmarkResult(
+                "resolve",
+                {"films": films, "queries": len(texts)},
+                {
+                    "qps": len(texts) / seconds,
+                    "batch_qps": len(texts) / batch_seconds,
+                    "top5_qps": len(texts) / top5_seconds,
+                    "top5_batch_qps": len(texts) / top5_batch_seconds,
+                    "top1_accuracy": correct / len(texts),
+                },
+            )
+        )
+    return results
+
+
+def scenario_embed(args: argparse.Namespace, tmp: Path) -> list[BenchmarkResult]:
+    catalogue = synthetic_catalogue(1000, seed=args.seed)
+    texts = [post.text for post in synthetic_posts(catalogue, args.texts, seed=args.seed)]
+    results = []
+    for max_batch_tokens in (None, EmbeddingConfig().max_batch_tokens):
+        config = EmbeddingConfig(max_batch_tokens=max_batch_tokens)
+        generator = EmbeddingGenerator(config, backend=TinyEncoder())
+        seconds, _ = _best_seconds(args.repeat, lambda: generator.embed(texts))
+        results.append(
+            BenchmarkResult(
+                "embed",
+                {"texts": len(texts), "max_batch_tokens": max_batch_tokens, "cache": False},
+                {"seconds": seconds, "texts_per_second": len(texts) / seconds},
+            )
+        )
+    # Повторный проход с тёплым кэшем: цена поиска в SQLite вместо кодирования.
+    config = EmbeddingConfig(cache_path=tmp / "embeddings.db")
+    generator = EmbeddingGenerator(config, backend=TinyEncoder())
+    generator.embed(texts)
+    seconds, _ = _best_seconds(args.repeat, lambda: generator.embed(texts))
+    results.append(
+        BenchmarkResult(
+            "embed",
+            {"texts": len(texts), "max_batch_tokens": config.max_batch_tokens, "cache": True},
+            {"seconds": seconds, "texts_per_second": len(texts) / seconds},
+        )
+    )
+    return results
+
+
+def _ruler_model(path: Path) -> Path:
+    """Пустая русская модель spaCy с `entity_ruler` по словарю имён корпуса."""
+
+    import spacy
+
+    nlp = spacy.blank("ru")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns([{"label": "PER", "pattern": person} for person in PERSONS])
+    nlp.to_disk(path)
+    return path
+
+
+def scenario_ner(args: argparse.Namespace, tmp: Path) -> list[BenchmarkResult]:
+    catalogue = synthetic_catalogue(1000, seed=args.seed)
+    posts: list[SyntheticPost] = synthetic_posts(catalogue, args.texts, seed=args.seed)
+    texts = [post.text for post in posts]
+    if args.spacy_model:
+        config = EntityExtractionConfig(spacy_model=args.spacy_model)
+        model = args.spacy_model
+    else:
+        config = EntityExtractionConfig(
+            model_path=_ruler_model(tmp / "ner-ruler"), enabled_components=("entity_ruler",)
+        )
+        model = "blank-ru+entity_ruler"
+    extractor = EntityExtractor(config)
+    extractor.nlp  # загрузка модели не входит в замер
+    seconds, entities = _best_seconds(args.repeat, lambda: extractor.extract_batch(texts))
+    expected = sum(len(post.persons) for post in posts)
+    found = sum(
+        len(set(post.persons) & {entity.text for entity in found})
+        for post, found in zip(posts, entities)
+    )
+    return [
+        BenchmarkResult(
+            "ner",
+            {"texts": len(texts), "model": model},
+            {
+                "seconds": seconds,
+                "posts_per_second": len(texts) / seconds,
+                "person_recall": found / max(1, expected),
+            },
+        )
+    ]
+
+
+def scenario_clustering(args: argparse.Namespace, tmp: Path) -> list[BenchmarkResult]:
+    from sklearn.metrics import adjusted_rand_score
+
+    config = TopicClusteringConfig(min_cluster_size=15)
+    # Прогрев: JIT-компиляция numba в UMAP не должна попадать в первый замер.
+    warmup, _ = build_vectors(500, 32, np.random.default_rng(0), topics=5)
+    TopicClusterer(config).fit([f"пост {row}" for row in range(len(warmup))], warmup)
+    catalogue = synthetic_catalogue(1000, seed=args.seed)
+    results = []
+    for size in args.sizes:
+        embeddings, truth = build_vectors(
+            size, 64, np.random.default_rng(args.seed), topics=args.topics, spread=1.5
+        )
+        texts = [post.text for post in synthetic_posts(catalogue, size, seed=args.seed)]
+        # Каждый прогон — новый кластеризатор: UMAP и HDBSCAN обучаются заново.
+        seconds, result = _best_seconds(
+            args.repeat, lambda: TopicClusterer(config).fit(texts, embeddings)
+        )
+        results.append(
+            BenchmarkResult(
+                "clustering",
+                {"posts": size, "dimension": 64, "topics": args.topics},
+                {
+                    "seconds": seconds,
+                    "posts_per_second": size / seconds,
+                    "ari": adjusted_rand_score(truth, result.labels),
+                },
+            )
+        )
+    return results
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace, Path], list[BenchmarkResult]]] = {
+    "detection": scenario_detection,
+    "resolve": scenario_resolve,
+    "embed": scenario_embed,
+    "ner": scenario_ner,
+    "clustering": scenario_clustering,
+}
+# Размеры по умолчанию и для быстрого прогона (`--quick`, например в CI).
+_DEFAULTS = {
+    "films": ([1000, 5000, 20000], [500, 2000]),
+    "posts": (100, 50),
+    "queries": (2000, 300),
+    "texts": (5000, 500),
+    "sizes": ([2000, 10000], [1000]),
+    "repeat": (2, 1),
+}
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metadata(args: argparse.Namespace) -> dict[str, object]:
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "seed": args.seed,
+        "quick": args.quick,
+        "repeat": args.repeat,
+    }
+
+
+def run(args: argparse.Namespace) -> dict[str, object]:
+    results: list[BenchmarkResult] = []
+    with tempfile.TemporaryDirectory(prefix="ml-bench-") as tmp:
+        for name in args.scenarios:
+            for result in SCENARIOS[name](args, Path(tmp)):
+                metrics = ", ".join(f"{key}={value:.4g}" for key, value in result.metrics.items())
+                print(f"{result.scenario:>10} {json.dumps(result.params)}: {metrics}", flush=True)
+                results.append(result)
+    return {"format": FORMAT, "meta": _metadata(args), "results": [asdict(result) for result in results]}
+
+
+def load_results(path: Path) -> list[BenchmarkResult]:
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    if payload.get("format") != FORMAT:
+        raise ValueError(f"{path}: формат {payload.get('format')}, ожидался {FORMAT}")
+    return [BenchmarkResult(**result) for result in payload["results"]]
+
+
+def compare(
+    baseline: Sequence[BenchmarkResult], candidate: Sequence[BenchmarkResult], *, threshold: float
+) -> list[Comparison]:
+    """Сравнивает общие сценарии и метрики двух запусков.
+
+    `change` — относительное изменение в сторону улучшения (для времени знак
+    обращён), регрессия — ухудшение больше `threshold`.
+    """
+
+    reference = {result.key: result for result in baseline}
+    comparisons = []
+    for result in candidate:
+        base = reference.get(result.key)
+        if base is None:
+            continue
+        for metric, value in result.metrics.items():
+            old = base.metrics.get(metric)
+            if old is None or old == 0:
+                continue
+            change = (value - old) / abs(old)
+            if not metric.endswith(_HIGHER_IS_BETTER):
+                change = -change
+            comparisons.append(
+                Comparison(
+                    scenario=result.scenario,
+                    params=result.params,
+                    metric=metric,
+                    baseline=old,
+                    candidate=value,
+                    change=change,
+                    regression=change < -threshold,
+                )
+            )
+    return comparisons
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Запустить сценарии")
+    run_parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    run_parser.add_argument("--quick", action="store_true", help="Малые размеры для быстрой проверки")
+    run_parser.add_argument("--output", type=Path, help="Куда записать JSON с результатами")
+    run_parser.add_argument("--seed", type=int, default=13)
+    run_parser.add_argument("--films", type=int, nargs="+", help="Размеры каталога")
+    run_parser.add_argument("--posts", type=int, help="Постов для детекции")
+    run_parser.add_argument("--queries", type=int, help="Запросов к резолверу")
+    run_parser.add_argument("--texts", type=int, help="Текстов для эмбеддингов и NER")
+    run_parser.add_argument("--sizes", type=int, nargs="+", help="Число постов для кластеризации")
+    run_parser.add_argument("--topics", type=int, default=20)
+    run_parser.add_argument("--repeat", type=int, help="Прогонов на замер, берётся лучший")
+    run_parser.add_argument(
+        "--strategies", nargs="+", choices=("indexed", "exhaustive", "cdist"), default=["indexed"]
+    )
+    run_parser.add_argument("--spacy-model", help="Настоящая модель spaCy вместо словарной")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить два запуска")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("candidate", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        for name, (full, quick) in _DEFAULTS.items():
+            if getattr(args, name) is None:
+                setattr(args, name, quick if args.quick else full)
+        payload = run(args)
+        if args.output:
+            args.output.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        return
+
+    comparisons = compare(
+        load_results(args.baseline), load_results(args.candidate), threshold=args.threshold
+    )
+    for item in comparisons:
+        flag = "REGRESSION" if item.regression else ""
+        print(
+            f"{item.scenario:>10} {json.dumps(item.params)} {item.metric}: "
+            f"{item.baseline:.4g} -> {item.candidate:.4g} ({item.change:+.1%}) {flag}".rstrip()
+        )
+    regressions = sum(item.regression for item in comparisons)
+    print(f"{len(comparisons)} metrics compared, {regressions} regressions (threshold {args.threshold:.0%})")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Время и качество тематического кластерирования при разных стратегиях понижения.
+
+Для каждого размера корпуса обучает `TopicClusterer` с полным UMAP и с
+масштабируемыми вариантами (выборка + transform, PCA/случайная проекция) и
+печатает время `fit` и ARI меток относительно полного обучения (и
+относительно исходных синтетических тем)::
+
+    python -m ml.benchmarks.topic_reduction --sizes 5000 20000 100000 --full-max 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from ..config import TopicClusteringConfig
+from ..topic_detection import TopicClusterer
+from .vector_index import build_vectors
+
+
+def strategies(sample_size: int) -> dict[str, dict[str, object]]:
+    return {
+        "sample": {"reduction_sample_size": sample_size},
+        "pca": {"pre_reduction": "pca"},
+        "pca+sample": {"pre_reduction": "pca", "reduction_sample_size": sample_size},
+        "rp+sample": {"pre_reduction": "random_projection", "reduction_sample_size": sample_size},
+        "sample+umap": {"reduction_sample_size": sample_size, "reduction_transform": "umap"},
+    }
+
+
+def _fit(config: TopicClusteringConfig, texts: list[str], embeddings: np.ndarray) -> tuple[float, np.ndarray]:
+    started = time.perf_counter()
+    labels = TopicClusterer(config).fit(texts, embeddings).labels
+    return time.perf_counter() - started, labels
+
+
+def main(argv: list[str] | None = None) -> None:
+    from sklearn.metrics import adjusted_rand_score
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--sample-size", type=int, default=5000)
+    parser.add_argument("--full-max", type=int, default=50_000, help="Крупнее — без полного UMAP")
+    parser.add_argument("--min-cluster-size", type=int, default=15)
+    parser.add_argument(
+        "--strategies",
+        nargs="+",
+        choices=list(strategies(0)),
+        default=["sample", "pca", "pca+sample", "rp+sample"],
+    )
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    base = TopicClusteringConfig(min_cluster_size=args.min_cluster_size)
+    # Прогрев: JIT-компиляция numba в UMAP не должна попадать в замер первой стратегии.
+    warmup, warmup_topics = build_vectors(1000, args.dimension, np.random.default_rng(0), topics=args.topics)
+    _fit(replace(base, reduction_sample_size=500), [f"тема{topic}" for topic in warmup_topics], warmup)
+    for size in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        embeddings, truth = build_vectors(size, args.dimension, rng, topics=args.topics, spread=1.5)
+        texts = [f"тема{topic} пост{row % 97}" for row, topic in enumerate(truth)]
+
+        reference = None
+        if size <= args.full_max:
+            seconds, reference = _fit(base, texts, embeddings)
+            print(
+                f"n={size:>7} {'full':>12}: {seconds:7.1f} s, "
+                f"ARI vs topics {adjusted_rand_score(truth, reference):.3f}"
+            )
+        for name in args.strategies:
+            changes = strategies(args.sample_size)[name]
+            seconds, labels = _fit(replace(base, **changes), texts, embeddings)
+            versus_full = (
+                f"ARI vs full {adjusted_rand_score(reference, labels):.3f}, " if reference is not None else ""
+            )
+            print(
+                f"n={size:>7} {name:>12}: {seconds:7.1f} s, {versus_full}"
+                f"ARI vs topics {adjusted_rand_score(truth, labels):.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
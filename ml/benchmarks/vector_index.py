@@ -0,0 +1,90 @@
+"""Полнота и задержка `VectorIndex` против точного перебора.
+
+Синтетические эмбеддинги — нормализованная смесь гауссиан (посты группируются
+по темам, как реальные векторы). Для каждого размера печатается время
+построения и для каждого `n_probe` — recall@k и задержка на запрос::
+
+    python -m ml.benchmarks.vector_index --sizes 100000 1000000 --n-probe 1 4 16 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from ..config import VectorIndexConfig
+from ..vector_index import VectorIndex
+
+
+def build_vectors(
+    count: int, dimension: int, rng: np.random.Generator, *, topics: int = 1000, spread: float = 1.2
+) -> tuple[np.ndarray, np.ndarray]:
+    """Нормализованные векторы и номера тем (центров смеси), из которых они взяты."""
+
+    centers = rng.standard_normal((topics, dimension), dtype=np.float32)
+    vectors = np.empty((count, dimension), dtype=np.float32)
+    labels = rng.integers(0, topics, count)
+    step = 65536
+    for start in range(0, count, step):
+        size = min(step, count - start)
+        chunk = centers[labels[start : start + size]]
+        chunk += spread * rng.standard_normal((size, dimension), dtype=np.float32)
+        chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+        vectors[start : start + size] = chunk
+    return vectors, labels
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(row, truth)) for row, truth in zip(found, expected))
+    return hits / expected.size
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--n-lists", type=int, help="По умолчанию — VectorIndexConfig")
+    parser.add_argument("--query-noise", type=float, default=0.05, help="Шум запросов относительно постов")
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    for size in args.sizes:
+        vectors, _ = build_vectors(size, args.dimension, rng)
+        queries = vectors[rng.integers(0, size, args.queries)]
+        queries = queries + args.query_noise * rng.standard_normal(queries.shape, dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        started = time.perf_counter()
+        index = VectorIndex.build(vectors, config=VectorIndexConfig(n_lists=args.n_lists))
+        build_seconds = time.perf_counter() - started
+        del vectors
+
+        started = time.perf_counter()
+        expected, _ = index.search_exact(queries, args.k)
+        exact_ms = (time.perf_counter() - started) / args.queries * 1000
+        print(f"n={size}: lists={index.n_lists}, build {build_seconds:.1f} s, exact {exact_ms:.3f} ms/query")
+
+        for n_probe in args.n_probe:
+            started = time.perf_counter()
+            found, _ = index.search_batch(queries, args.k, n_probe=n_probe)
+            batch_ms = (time.perf_counter() - started) / args.queries * 1000
+            single = queries[: min(100, args.queries)]
+            started = time.perf_counter()
+            for query in single:
+                index.search(query, args.k, n_probe=n_probe)
+            single_ms = (time.perf_counter() - started) / len(single) * 1000
+            print(
+                f"  n_probe={n_probe:>3}: recall@{args.k} {recall(found, expected):.3f}, "
+                f"batch {batch_ms:.3f} ms/query, single {single_ms:.3f} ms/query, "
+                f"x{exact_ms / batch_ms:.1f} vs exact"
+            )
+
+
+if __name__ == "__main__":
+    main()
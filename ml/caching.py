@@ -0,0 +1,87 @@
+"""Кэши в памяти и счётчики их эффективности."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """Ограниченный потокобезопасный LRU-кэш с необязательным TTL.
+
+    `max_entries=0` отключает кэш: `put` ничего не сохраняет, а `get` считает
+    промахи. Записи старше `ttl` секунд считаются отсутствующими и удаляются
+    при обращении (учитываются в `stats.evictions`). При сериализации кэш
+    передаётся пустым: его содержимое — производное состояние.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        *,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> dict[str, object]:
+        return {"max_entries": self.max_entries, "ttl": self.ttl, "clock": self._clock}
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.__init__(state["max_entries"], ttl=state["ttl"], clock=state["clock"])
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry[0] + self.ttl <= self._clock():
+                del self._entries[key]
+                self.stats.evictions += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def put(self, key: K, value: V) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        """Сбрасывает записи; счётчики сохраняются для оценки размера кэша."""
+
+        with self._lock:
+            self._entries.clear()
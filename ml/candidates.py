@@ -0,0 +1,167 @@
+"""Отбор окон-кандидатов для детекции фильмов.
+
+`FilmMentionDetector` по умолчанию сравнивает с алиасами каждое окно из 1..N
+токенов поста, хотя большинство окон — служебные сочетания вроде «и в».
+Фильтр отбрасывает окна до размытого сравнения:
+
+- `"stopwords"` — окна, которые начинаются или заканчиваются служебным словом,
+  если ни один алиас каталога не начинается (не заканчивается) этим словом;
+- `"cues"` — вдобавок оставляет только окна с подсказками: внутри кавычек
+  («…», "…", “…”), с заглавной буквы (или цифры) и пересекающие спаны NER с
+  метками `FilmAliasConfig.candidate_entity_labels`.
+
+Режим `"cues"` теряет упоминания без подсказок (название строчными буквами),
+поэтому при `candidate_fallback` пост, в котором есть слово из словаря алиасов,
+не покрытое окнами-кандидатами, сканируется целиком.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+from .config import FilmAliasConfig
+
+if TYPE_CHECKING:
+    from .entity_extraction import Entity
+
+CANDIDATE_MODES = ("all", "stopwords", "cues")
+CANDIDATE_CUES = ("quotes", "capitalized", "entities")
+
+# Служебные слова после `normalize_token`: предлоги, союзы, частицы, местоимения.
+STOPWORDS = frozenset(
+    """
+    а без бы был была были было в вам вас во вот все всё вы где да даже для до его ее её
+    если есть еще ещё же за и из или им их к как ко когда кто ли либо мне мы на над нас
+    не него нее неё нет ни них но о об обо он она они оно от по под при про с со так там
+    то тоже только у уже чем что чтобы эта эти это этот я
+    a an and are as at be but by for from has have he her his i in is it its my no not
+    of on or our she so than that the their them they this to was we were what when
+    which who will with you your
+    """.split()
+)
+_QUOTE_RE = re.compile(r"«[^«»]+»|\"[^\"]+\"|“[^“”]+”|„[^„“”]+[“”]")
+
+# (normalized_phrase, first_token, last_token) — окно в индексах токенов поста.
+TokenWindow = tuple[str, int, int]
+# (start, end, normalized) — токен поста.
+Token = tuple[int, int, str]
+
+
+class CandidateFilter:
+    """Отбирает окна-кандидаты поста для одной версии каталога алиасов."""
+
+    def __init__(self, alias_keys: Iterable[str], config: FilmAliasConfig) -> None:
+        mode = config.candidate_mode
+        if mode not in CANDIDATE_MODES:
+            raise ValueError(f"Неизвестный режим отбора кандидатов: {mode}")
+        unknown = set(config.candidate_cues) - set(CANDIDATE_CUES)
+        if unknown:
+            raise ValueError(f"Неизвестные подсказки кандидатов: {sorted(unknown)}")
+        self.mode = mode
+        self.cues = frozenset(config.candidate_cues)
+        self.entity_labels = frozenset(config.candidate_entity_labels)
+        self.fallback = config.candidate_fallback
+        vocabulary: set[str] = set()
+        first_words: set[str] = set()
+        last_words: set[str] = set()
+        for key in alias_keys:
+            words = key.split()
+            if not words:
+                continue
+            vocabulary.update(words)
+            first_words.add(words[0])
+            last_words.add(words[-1])
+        self.vocabulary = frozenset(vocabulary - STOPWORDS)
+        # Служебные слова, которыми алиасы всё же начинаются/заканчиваются («The Night»).
+        self._bad_first = STOPWORDS - first_words
+        self._bad_last = STOPWORDS - last_words
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "all"
+
+    @property
+    def uses_entities(self) -> bool:
+        """Нужны ли фильтру сущности NER поста (подсказка `"entities"`)."""
+
+        return self.mode == "cues" and "entities" in self.cues
+
+    def _cue_tokens(
+        self, text: str, tokens: Sequence[Token], entities: Sequence[Entity] | None
+    ) -> tuple[list[bool], list[int], list[int]]:
+        """Подсказки по токенам: заглавная буква, номер кавычек (-1 — вне кавычек)
+        и префиксные суммы попаданий в спаны NER."""
+
+        capitalized = [False] * len(tokens)
+        if "capitalized" in self.cues:
+            capitalized = [text[start].isupper() or text[start].isdigit() for start, _, _ in tokens]
+        quote = [-1] * len(tokens)
+        if "quotes" in self.cues:
+            spans = [match.span() for match in _QUOTE_RE.finditer(text)]
+            for position, (start, end, _) in enumerate(tokens):
+                for number, (quote_start, quote_end) in enumerate(spans):
+                    if quote_start <= start and end <= quote_end:
+                        quote[position] = number
+                        break
+        entity_prefix = [0] * (len(tokens) + 1)
+        if "entities" in self.cues and entities:
+            spans = [(entity.start, entity.end) for entity in entities if entity.label in self.entity_labels]
+            for position, (start, end, _) in enumerate(tokens):
+                inside = any(start < entity_end and end > entity_start for entity_start, entity_end in spans)
+                entity_prefix[position + 1] = entity_prefix[position] + inside
+        return capitalized, quote, entity_prefix
+
+    def select(
+        self,
+        text: str,
+        tokens: Sequence[Token],
+        windows: Sequence[TokenWindow],
+        entities: Sequence[Entity] | None = None,
+    ) -> tuple[list[TokenWindow], bool]:
+        """Окна для размытого сравнения и признак отката к полному сканированию."""
+
+        if not self.enabled or not windows:
+            return list(windows), False
+        bad_first, bad_last = self._bad_first, self._bad_last
+        kept = [
+            window
+            for window in windows
+            if tokens[window[1]][2].split(" ", 1)[0] not in bad_first
+            and tokens[window[2]][2].rsplit(" ", 1)[-1] not in bad_last
+        ]
+        if self.mode == "stopwords":
+            return kept, False
+
+        capitalized, quote, entity_prefix = self._cue_tokens(text, tokens, entities)
+        selected = [
+            window
+            for window in kept
+            if capitalized[window[1]]
+            or (quote[window[1]] >= 0 and quote[window[1]] == quote[window[2]])
+            or entity_prefix[window[2] + 1] > entity_prefix[window[1]]
+        ]
+        if self.fallback and self._uncovered(tokens, selected):
+            return list(windows), True
+        return selected, False
+
+    def _uncovered(self, tokens: Sequence[Token], selected: Sequence[TokenWindow]) -> bool:
+        """Есть ли слово из алиасов, с которого не начинается ни одно окно-кандидат.
+
+        Слово считается покрытым и тогда, когда оно продолжает цепочку слов из
+        алиасов, начатую кандидатом («Звезда огня»): так строчное продолжение
+        названия не вызывает откат, а «вдохновлены звездой огня» — вызывает.
+        """
+
+        starts = {first for _, first, _ in selected}
+        vocabulary = self.vocabulary
+        covered = False
+        for position, (_, _, normalized) in enumerate(tokens):
+            in_vocabulary = any(word in vocabulary for word in normalized.split())
+            if position in starts:
+                covered = in_vocabulary
+            elif in_vocabulary and not covered:
+                return True
+            else:
+                covered = covered and in_vocabulary
+        return False
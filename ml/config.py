@@ -12,9 +12,26 @@ class EmbeddingConfig:
     """Параметры генерации эмбеддингов."""
 
     model_name: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+    # Локальный снимок модели (см. ArtifactRegistry); ключи кэша остаются по model_name.
+    model_path: Optional[Path] = None
     device: Optional[str] = None
     batch_size: int = 32
+    # Бюджет батча в токенах с учётом паддинга (число текстов × самый длинный);
+    # тексты сортируются по длине, короткие идут большими батчами. None —
+    # фиксированные батчи по batch_size.
+    max_batch_tokens: Optional[int] = 8192
     normalize_embeddings: bool = True
+    # SQLite-файл постоянного кэша эмбеддингов; None — кэш отключён.
+    cache_path: Optional[Path] = None
+    cache_max_entries: Optional[int] = None
+    # "torch" — SentenceTransformer, "onnx" — ONNX Runtime на CPU (модель из export_onnx).
+    backend: str = "torch"
+    # Каталог, созданный `python -m ml.embeddings export-onnx`; нужен для backend="onnx".
+    onnx_path: Optional[Path] = None
+    # "int8" — динамически квантованные веса, "fp32" — экспорт без квантования.
+    onnx_precision: str = "int8"
+    # Потоки ONNX Runtime; None — по числу ядер.
+    onnx_threads: Optional[int] = None
 
 
 @dataclass(slots=True)
@@ -22,7 +39,16 @@ class EntityExtractionConfig:
     """Настройки извлечения сущностей."""
 
     spacy_model: str = "ru_core_news_lg"
+    model_path: Optional[Path] = None
     include_types: Optional[Iterable[str]] = None
+    # Компоненты, которые остаются включены после загрузки, плюс tok2vec/transformer,
+    # которые они слушают; остальные (parser, lemmatizer, morphologizer) отключаются.
+    # None — весь конвейер модели.
+    enabled_components: Optional[tuple[str, ...]] = ("ner",)
+    # Размер пачки nlp.pipe и число процессов spaCy; n_process > 1 используется только
+    # для пачек больше batch_size (и не внутри воркеров StageScheduler).
+    batch_size: int = 256
+    n_process: int = 1
 
 
 @dataclass(slots=True)
@@ -35,6 +61,30 @@ class TopicClusteringConfig:
     n_neighbors: int = 15
     random_state: int = 42
     top_terms: int = 10
+    # Веса ключевых слов темы: "tfidf" — средний TF-IDF постов кластера,
+    # "ctfidf" — class-based TF-IDF (кластер как один документ).
+    keyword_weighting: str = "tfidf"
+    # Параметры UMAP: low_memory снижает пик памяти при поиске соседей;
+    # n_jobs игнорируется UMAP при заданном random_state (детерминированный режим).
+    low_memory: bool = True
+    n_jobs: int = -1
+    # Предварительное понижение размерности перед UMAP: None, "pca" или "random_projection".
+    pre_reduction: Optional[str] = None
+    pre_reduction_components: int = 64
+    # UMAP обучается на стратифицированной выборке такого размера, остальное
+    # проецируется чанками по reduction_chunk_size; None — обучение на всём корпусе.
+    reduction_sample_size: Optional[int] = None
+    reduction_chunk_size: int = 50_000
+    # Проекция постов вне выборки: "knn" — взвешенное среднее координат ближайших
+    # постов выборки (начальное приближение UMAP.transform без эпох оптимизации),
+    # "umap" — полный UMAP.transform (на порядок медленнее).
+    reduction_transform: str = "knn"
+    # Число страт (кластеров MiniBatchKMeans) для стратифицированной выборки.
+    reduction_strata: int = 50
+    # Порог доли шума среди новых постов, после которого нужен полный refit.
+    refit_noise_ratio: float = 0.4
+    # Порог косинусного сдвига центроида новых постов относительно обучающего корпуса.
+    refit_centroid_drift: float = 0.1
 
 
 @dataclass(slots=True)
@@ -44,6 +94,136 @@ class FilmAliasConfig:
     aliases_path: Path = Path("data/film-aliases.json")
     match_threshold: float = 85.0
     locale_priority: tuple[str, ...] = ("ru", "en")
+    # "indexed" — префильтр кандидатов через AliasCandidateIndex,
+    # "exhaustive" — полный перебор всех алиасов для каждого окна,
+    # "cdist" — все окна поста (или пачки постов) в одном вызове process.cdist.
+    detection_strategy: str = "indexed"
+    # Число процессов для пакетной детекции: 1 — без пула, None/0 — по числу ядер.
+    detection_workers: Optional[int] = 1
+    detection_chunk_size: int = 64
+    # Способ запуска воркеров: None — forkserver/spawn, "fork" — наследование состояния.
+    detection_start_method: Optional[str] = None
+    # LRU-кэш «нормализованная фраза → лучший алиас» между постами; 0 — отключён.
+    detection_cache_size: int = 100_000
+    # Отбор окон перед размытым сравнением (`ml.candidates`): "all" — все окна,
+    # "stopwords" — без окон, начинающихся/кончающихся служебным словом, "cues" —
+    # вдобавок только окна с подсказками из candidate_cues.
+    candidate_mode: str = "all"
+    candidate_cues: tuple[str, ...] = ("quotes", "capitalized", "entities")
+    # Метки spaCy, спаны которых служат подсказкой "entities".
+    candidate_entity_labels: tuple[str, ...] = ("WORK_OF_ART", "MISC")
+    # В режиме "cues" пост со словом из алиасов вне окон-кандидатов сканируется целиком.
+    candidate_fallback: bool = True
+    # LRU-кэш `resolve` по (нормализованный запрос, limit); 0 — отключён.
+    resolve_cache_size: int = 10_000
+    # Время жизни записи кэша `resolve` в секундах; None — без ограничения.
+    resolve_cache_ttl: Optional[float] = None
+    # Период проверки mtime файла алиасов для горячей перезагрузки; None — без проверки.
+    reload_interval: Optional[float] = None
+
+
+@dataclass(slots=True)
+class VectorIndexConfig:
+    """IVF-индекс эмбеддингов постов для похожих постов и семантического поиска."""
+
+    # Число списков (центроидов k-means); None — около 2·sqrt(n).
+    n_lists: Optional[int] = None
+    # Сколько ближайших списков просматривать при запросе.
+    n_probe: int = 16
+    # До этого числа векторов индекс не обучается и ищет точно.
+    exact_threshold: int = 20_000
+    # Размер выборки и число итераций для обучения центроидов.
+    train_size: int = 100_000
+    kmeans_iterations: int = 10
+    # Новые векторы копятся в буфере с точным поиском, пока он меньше этой доли индекса.
+    merge_ratio: float = 0.1
+    # Во сколько раз должен вырасти индекс после обучения, чтобы переобучить центроиды.
+    retrain_growth: float = 4.0
+    random_state: int = 42
+
+
+@dataclass(slots=True)
+class DatabaseWriterConfig:
+    """Запись результатов анализа в SQLite-базу сайта (схема prisma/schema.prisma)."""
+
+    path: Path = Path("prisma/dev.db")
+    # Постов в одной транзакции.
+    batch_size: int = 1000
+    # Создавать записи Film для фильмов каталога алиасов, которых ещё нет в базе.
+    create_films: bool = True
+    # relationType связей PostFilm, которыми владеет ML; остальные связи не трогаются.
+    relation_type: str = "MENTION"
+    # Метки spaCy, которые попадают в `entities.names`.
+    person_labels: tuple[str, ...] = ("PER", "PERSON")
+    # Имя модели, записываемое рядом с эмбеддингом в PostAnalysis.
+    embedding_model: str = EmbeddingConfig().model_name
+
+
+@dataclass(slots=True)
+class SchedulerConfig:
+    """Параллельное выполнение стадий конвейера."""
+
+    enabled: bool = False
+    # Процессы для NER и детекции фильмов; None — число ядер минус поток кодировщика.
+    processes: Optional[int] = None
+    chunk_size: int = 64
+    max_pending_chunks: int = 4
+    start_method: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ServiceConfig:
+    """Долгоживущий сервис резолва алиасов и эмбеддингов запросов (`ml.service`)."""
+
+    host: str = "127.0.0.1"
+    port: int = 8765
+    # Путь Unix-сокета; если задан, TCP-порт не открывается.
+    unix_socket: Optional[Path] = None
+    # Запросы, пришедшие в пределах max_wait_ms, уходят в модель одной пачкой.
+    max_batch_size: int = 64
+    max_wait_ms: float = 2.0
+    # Запросов в очереди одного метода; сверх этого — 503 с Retry-After.
+    max_pending: int = 1024
+    max_body_bytes: int = 64 * 1024
+    resolve_limit: int = 5
+    # False — только резолв алиасов, без загрузки модели эмбеддингов.
+    embeddings: bool = True
+
+
+@dataclass(slots=True)
+class MetricsConfig:
+    """Замеры стадий конвейера (см. `ml.metrics`)."""
+
+    enabled: bool = False
+    # None, "cprofile" или "tracemalloc" — дополнительный захват по стадиям.
+    capture: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DedupConfig:
+    """Поиск почти-дубликатов постов перед тяжёлыми стадиями (`ml.dedup`)."""
+
+    enabled: bool = False
+    # Порог оценки коэффициента Жаккара по MinHash-сигнатурам.
+    threshold: float = 0.8
+    # Длина символьных шинглов по тексту после `normalize_text`.
+    shingle_size: int = 5
+    # num_perm должно делиться на bands; bands=16 при 128 перестановках ловит пары с
+    # Жаккаром от ~0.7, кандидаты потом проверяются порогом.
+    num_perm: int = 128
+    bands: int = 16
+    seed: int = 1
+
+
+@dataclass(slots=True)
+class EmbeddingStoreConfig:
+    """Квантованное хранение эмбеддингов `AnalysisResult` (`ml.embedding_store`)."""
+
+    enabled: bool = False
+    # "float16", "int8" (симметричное, масштаб на вектор) или "float32".
+    dtype: str = "int8"
+    # Каталог для memmap-файлов хранилища; None — в памяти.
+    path: Optional[Path] = None
 
 
 @dataclass(slots=True)
@@ -54,6 +234,10 @@ class PipelineConfig:
     entities: EntityExtractionConfig = field(default_factory=EntityExtractionConfig)
     topics: TopicClusteringConfig = field(default_factory=TopicClusteringConfig)
     aliases: FilmAliasConfig = field(default_factory=FilmAliasConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    dedup: DedupConfig = field(default_factory=DedupConfig)
+    store: EmbeddingStoreConfig = field(default_factory=EmbeddingStoreConfig)
 
 
 DEFAULT_PIPELINE_CONFIG = PipelineConfig()
@@ -0,0 +1,341 @@
+"""Пакетная запись результатов анализа в SQLite-базу сайта.
+
+Схема — `prisma/schema.prisma`: посты пишутся в `Post` (upsert по `sourceId`,
+иначе по `slug`), сущности — в `Post.entities` (JSON в формате
+`PostEntitiesPayload` сайта), упоминания фильмов — в `PostFilm`, эмбеддинг и
+тема — в `PostAnalysis` (float32 BLOB). Записи идут пачками `executemany` в
+одной транзакции на пачку, база работает в режиме WAL.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
+
+import numpy as np
+
+from .config import DatabaseWriterConfig
+from .preprocessing import iter_batched
+
+if TYPE_CHECKING:
+    from .aliases import FilmRecord
+    from .pipeline import AnalysisResult, PostAnalysis
+
+# Ограничение SQLite на число параметров запроса.
+_MAX_PARAMS = 900
+
+
+@dataclass(slots=True)
+class PostMetadata:
+    """Поля поста, которых нет в `PostAnalysis`.
+
+    Незаданные `title`/`published_at` при вставке выводятся из текста и
+    текущего времени, а при обновлении существующего поста не меняются.
+    """
+
+    slug: str
+    source_id: str | None = None
+    title: str | None = None
+    subtitle: str | None = None
+    excerpt: str | None = None
+    post_type: str | None = None
+    published_at: datetime | None = None
+
+
+@dataclass(slots=True)
+class PostRow:
+    metadata: PostMetadata
+    analysis: PostAnalysis
+    topic: int | None = None
+    topic_keywords: list[str] | None = None
+
+
+@dataclass(slots=True)
+class WriteStats:
+    posts: int = 0
+    film_links: int = 0
+    films_created: int = 0
+    seconds: float = 0.0
+
+    @property
+    def posts_per_second(self) -> float:
+        return self.posts / self.seconds if self.seconds else 0.0
+
+
+def _timestamp(value: datetime) -> int:
+    """DateTime в формате Prisma для SQLite — миллисекунды Unix-времени."""
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _derive_title(text: str, fallback: str) -> str:
+    """Первая непустая строка, как `deriveTitle` в скриптах импорта."""
+
+    for line in text.split("\n"):
+        line = line.strip()
+        if line:
+            return line[:120]
+    return fallback
+
+
+def _unique(values: Iterable[str]) -> list[str]:
+    return list(dict.fromkeys(values))
+
+
+class AnalysisWriter:
+    """Потоковая пакетная запись `PostAnalysis` в базу сайта.
+
+    Схему создают миграции Prisma; писатель её не меняет. Повторная запись
+    тех же постов обновляет их на месте: связи `PostFilm` с
+    `relation_type` пересоздаются, ручные связи и редакционные поля поста
+    (заголовок, дата публикации) сохраняются, если не переданы явно.
+    """
+
+    def __init__(self, config: DatabaseWriterConfig | None = None) -> None:
+        self.config = config or DatabaseWriterConfig()
+        self._conn = sqlite3.connect(self.config.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._film_ids: dict[str, int] = {}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> AnalysisWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def write(self, rows: Iterable[PostRow]) -> WriteStats:
+        """Пишет посты пачками по `batch_size`; каждая пачка — одна транзакция."""
+
+        stats = WriteStats()
+        started = time.perf_counter()
+        for batch in iter_batched(rows, self.config.batch_size):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_batch(batch, stats)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # Созданные в откатанной транзакции фильмы больше не существуют.
+                self._film_ids.clear()
+                raise
+            self._conn.execute("COMMIT")
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def write_result(self, result: AnalysisResult, metadata: Sequence[PostMetadata]) -> WriteStats:
+        """Пишет `AnalysisResult` вместе с метками и ключевыми словами тем."""
+
+        if len(metadata) != len(result.posts):
+            raise ValueError("Число метаданных не совпадает с числом постов")
+        return self.write(self.iter_rows(result, metadata))
+
+    @staticmethod
+    def iter_rows(result: AnalysisResult, metadata: Sequence[PostMetadata]) -> Iterator[PostRow]:
+        clustering = result.clustering
+        for idx, (meta, post) in enumerate(zip(metadata, result.posts)):
+            topic = None
+            if clustering is not None and clustering.labels[idx] != -1:
+                topic = int(clustering.labels[idx])
+            yield PostRow(
+                meta,
+                post,
+                topic=topic,
+                topic_keywords=clustering.topics.get(topic) if topic is not None else None,
+            )
+
+    def _write_batch(self, batch: list[PostRow], stats: WriteStats) -> None:
+        post_ids = self._upsert_posts(batch)
+        stats.films_created += self._ensure_films(
+            [mention.film for row in batch for mention in row.analysis.film_mentions]
+        )
+        stats.film_links += self._replace_film_links(batch, post_ids)
+        self._upsert_analysis(batch, post_ids)
+        stats.posts += len(batch)
+
+    def _entities_payload(self, post: PostAnalysis) -> str:
+        """Фрагмент `Post.entities`: ML обновляет только `films` и `names`."""
+
+        labels = self.config.person_labels
+        payload = {
+            "films": _unique(mention.film.title for mention in post.film_mentions),
+            "names": _unique(entity.text for entity in post.entities if entity.label in labels),
+        }
+        return json.dumps(payload, ensure_ascii=False)
+
+    def _select_ids(self, table: str, column: str, values: Sequence[str]) -> dict[str, int]:
+        found: dict[str, int] = {}
+        for chunk in iter_batched(values, _MAX_PARAMS):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                (key, row_id)
+                for row_id, key in self._conn.execute(
+                    f'SELECT "id", "{column}" FROM "{table}" WHERE "{column}" IN ({placeholders})', chunk
+                )
+            )
+        return found
+
+    # Общая часть UPDATE и upsert по slug: редакционные поля меняются, только если заданы.
+    _POST_UPDATE = (
+        '"title" = COALESCE(:title_given, "title"), '
+        '"subtitle" = COALESCE(:subtitle, "subtitle"), '
+        '"excerpt" = COALESCE(:excerpt, "excerpt"), '
+        '"type" = COALESCE(:type_given, "type"), '
+        '"publishedAt" = COALESCE(:published_given, "publishedAt"), '
+        '"body" = :body, '
+        '"sourceId" = COALESCE(:source_id, "sourceId"), '
+        '"entities" = json_patch(COALESCE("entities", \'{}\'), :entities), '
+        '"updatedAt" = :now'
+    )
+
+    def _upsert_posts(self, batch: list[PostRow]) -> list[int]:
+        now = _timestamp(datetime.now(timezone.utc))
+        by_source = self._select_ids(
+            "Post",
+            "sourceId", _unique(row.metadata.source_id for row in batch if row.metadata.source_id)
+        )
+        updates = []
+        inserts = []
+        for row in batch:
+            meta, post = row.metadata, row.analysis
+            params = {
+                "title_given": meta.title,
+                "subtitle": meta.subtitle,
+                "excerpt": meta.excerpt,
+                "type_given": meta.post_type,
+                "published_given": _timestamp(meta.published_at) if meta.published_at else None,
+                "body": post.text,
+                "source_id": meta.source_id,
+                "entities": self._entities_payload(post),
+                "now": now,
+            }
+            existing = by_source.get(meta.source_id) if meta.source_id else None
+            if existing is not None:
+                updates.append({**params, "id": existing})
+                continue
+            inserts.append(
+                {
+                    **params,
+                    "slug": meta.slug,
+                    "title": meta.title or _derive_title(post.text, meta.slug),
+                    "type": meta.post_type or "ARTICLE",
+                    "published": params["published_given"] or now,
+                }
+            )
+        if updates:
+            self._conn.executemany('UPDATE "Post" SET ' + self._POST_UPDATE + ' WHERE "id" = :id', updates)
+        if inserts:
+            self._conn.executemany(
+                'INSERT INTO "Post" ("slug", "title", "subtitle", "type", "body", "excerpt", '
+                '"publishedAt", "sourceId", "entities", "createdAt", "updatedAt") '
+                "VALUES (:slug, :title, :subtitle, :type, :body, :excerpt, :published, :source_id, "
+                ":entities, :now, :now) "
+                'ON CONFLICT ("slug") DO UPDATE SET ' + self._POST_UPDATE,
+                inserts,
+            )
+        by_slug = self._select_ids("Post", "slug", _unique(row["slug"] for row in inserts))
+        return [
+            by_source[row.metadata.source_id]
+            if row.metadata.source_id in by_source
+            else by_slug[row.metadata.slug]
+            for row in batch
+        ]
+
+    def _ensure_films(self, films: list[FilmRecord]) -> int:
+        """Находит id фильмов по slug (= id каталога алиасов), создавая недостающие."""
+
+        missing = _unique(film.id for film in films if film.id not in self._film_ids)
+        if not missing:
+            return 0
+        self._film_ids.update(self._select_ids("Film", "slug", missing))
+        absent = {film.id: film for film in films if film.id not in self._film_ids}
+        if not absent or not self.config.create_films:
+            return 0
+        now = _timestamp(datetime.now(timezone.utc))
+        self._conn.executemany(
+            'INSERT INTO "Film" ("slug", "title", "localizedTitle", "originalTitle", "year", '
+            '"countries", "createdAt", "updatedAt") VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT ("slug") DO NOTHING',
+            [
+                (film.id, film.title, film.title, film.original_title, film.year, film.countries, now, now)
+                for film in absent.values()
+            ],
+        )
+        self._film_ids.update(self._select_ids("Film", "slug", list(absent)))
+        return len(absent)
+
+    def _replace_film_links(self, batch: list[PostRow], post_ids: list[int]) -> int:
+        relation = self.config.relation_type
+        self._conn.executemany(
+            'DELETE FROM "PostFilm" WHERE "postId" = ? AND "relationType" = ?',
+            [(post_id, relation) for post_id in post_ids],
+        )
+        links = _unique(
+            (post_id, self._film_ids[mention.film.id])
+            for row, post_id in zip(batch, post_ids)
+            for mention in row.analysis.film_mentions
+            if mention.film.id in self._film_ids
+        )
+        # Существующие ручные связи с тем же фильмом остаются как есть.
+        self._conn.executemany(
+            'INSERT INTO "PostFilm" ("postId", "filmId", "relationType", "highlight") '
+            "VALUES (?, ?, ?, 0) ON CONFLICT DO NOTHING",
+            [(post_id, film_id, relation) for post_id, film_id in links],
+        )
+        return len(links)
+
+    def _upsert_analysis(self, batch: list[PostRow], post_ids: list[int]) -> None:
+        now = _timestamp(datetime.now(timezone.utc))
+        rows = []
+        for row, post_id in zip(batch, post_ids):
+            embedding = np.ascontiguousarray(row.analysis.vector, dtype=np.float32)
+            keywords = json.dumps(row.topic_keywords, ensure_ascii=False) if row.topic_keywords else None
+            rows.append(
+                (
+                    post_id,
+                    self.config.embedding_model,
+                    len(embedding),
+                    embedding.tobytes(),
+                    row.topic,
+                    keywords,
+                    now,
+                )
+            )
+        self._conn.executemany(
+            'INSERT INTO "PostAnalysis" ("postId", "model", "dimension", "embedding", "topic", '
+            '"topicKeywords", "updatedAt") VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT ("postId") DO UPDATE SET "model" = excluded."model", '
+            '"dimension" = excluded."dimension", "embedding" = excluded."embedding", '
+            '"topic" = excluded."topic", "topicKeywords" = excluded."topicKeywords", '
+            '"updatedAt" = excluded."updatedAt"',
+            rows,
+        )
+
+
+def load_embeddings(path: Path, post_ids: Sequence[int] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Читает `(post_ids, embeddings)` из `PostAnalysis`, например для `VectorIndex`."""
+
+    with sqlite3.connect(path) as conn:
+        query = 'SELECT "postId", "embedding" FROM "PostAnalysis"'
+        rows: list[tuple[int, bytes]] = []
+        if post_ids is None:
+            rows = conn.execute(query + ' ORDER BY "postId"').fetchall()
+        else:
+            for chunk in iter_batched(post_ids, _MAX_PARAMS):
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(conn.execute(query + f' WHERE "postId" IN ({placeholders})', chunk))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    ids = np.fromiter((post_id for post_id, _ in rows), dtype=np.int64, count=len(rows))
+    return ids, np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
@@ -0,0 +1,251 @@
+"""Поиск почти-дубликатов постов: шинглы, MinHash и LSH.
+
+Репосты, кросспосты и слегка отредактированные копии группируются до тяжёлых
+стадий конвейера, чтобы spaCy, rapidfuzz и модель эмбеддингов работали один
+раз на группу. Тексты сравниваются после `normalize_text`: сначала точно
+(совпадение нормализованных строк), затем по символьным шинглам — MinHash
+сигнатуры раскладываются по полосам LSH, кандидаты проверяются оценкой
+коэффициента Жаккара.
+
+Представитель группы — первый по порядку пост; остальные присоединяются к нему
+только при сходстве с ним самим, поэтому цепочки правок не сливают несхожие
+посты в одну группу.
+"""
+
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, replace
+from typing import Sequence, TypeVar
+
+import numpy as np
+
+from .config import DedupConfig
+from .preprocessing import normalize_text
+
+# Перестановки — multiply-shift: старшие 32 бита (a * x + b) mod 2^64 с нечётным a;
+# переполнение uint64 в numpy и даёт взятие по модулю, без дорогого деления.
+_SHIFT = np.uint64(32)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Множитель полиномиального хэша шингла по кодам символов (по модулю 2^64).
+_SHINGLE_BASE = np.uint64(1_000_003)
+# Шинглов на один матричный проход: num_perm x _SHINGLE_BLOCK значений uint64.
+_SHINGLE_BLOCK = 1 << 13
+
+# `Entity`, `FilmMention` и другие frozen-датаклассы с полями start/end.
+S = TypeVar("S")
+
+
+@dataclass(slots=True)
+class DuplicateGroups:
+    """Разбиение постов на группы почти-дубликатов.
+
+    `representatives[i]` — индекс представителя группы поста `i` (для
+    представителя — он сам), `exact[i]` — исходный текст совпадает с текстом
+    представителя посимвольно, и смещения его спанов верны без пересчёта.
+    """
+
+    representatives: np.ndarray
+    exact: np.ndarray
+
+    @property
+    def unique(self) -> np.ndarray:
+        """Индексы представителей по порядку — только их обрабатывают стадии."""
+
+        return np.flatnonzero(self.representatives == np.arange(len(self.representatives)))
+
+    @property
+    def clusters(self) -> dict[int, list[int]]:
+        """Группы из двух и более постов: представитель → все члены, включая его."""
+
+        groups: dict[int, list[int]] = {}
+        for idx, representative in enumerate(self.representatives.tolist()):
+            groups.setdefault(representative, []).append(idx)
+        return {rep: members for rep, members in groups.items() if len(members) > 1}
+
+    @property
+    def duplicates(self) -> int:
+        return len(self.representatives) - len(self.unique)
+
+    def summary(self) -> dict[str, float]:
+        """Сводка: сколько постов не прошло через тяжёлые стадии."""
+
+        posts = len(self.representatives)
+        is_duplicate = self.representatives != np.arange(posts)
+        exact = int(np.count_nonzero(is_duplicate & self.exact))
+        return {
+            "posts": posts,
+            "unique": posts - self.duplicates,
+            "clusters": len(self.clusters),
+            "exactDuplicates": exact,
+            "nearDuplicates": self.duplicates - exact,
+            "savedFraction": self.duplicates / posts if posts else 0.0,
+        }
+
+
+class MinHashDeduplicator:
+    """Группирует посты по MinHash-сигнатурам символьных шинглов."""
+
+    def __init__(self, config: DedupConfig | None = None) -> None:
+        self.config = config or DedupConfig()
+        if self.config.num_perm % self.config.bands:
+            raise ValueError("num_perm должно делиться на bands")
+        if self.config.shingle_size < 1:
+            raise ValueError("shingle_size должен быть положительным")
+        rng = np.random.default_rng(self.config.seed)
+        limit = np.iinfo(np.uint64).max
+        self._a = (rng.integers(0, limit, size=self.config.num_perm, dtype=np.uint64) | np.uint64(1))[:, None]
+        self._b = rng.integers(0, limit, size=self.config.num_perm, dtype=np.uint64)[:, None]
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Уникальные 32-битные хэши символьных шинглов нормализованного текста."""
+
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        if not len(codes):
+            return np.zeros(1, dtype=np.uint64)
+        size = min(self.config.shingle_size, len(codes))
+        count = len(codes) - size + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * _SHINGLE_BASE + codes[offset : offset + count]
+        return np.unique((hashes ^ (hashes >> _SHIFT)) & _MAX_HASH)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """MinHash-сигнатуры `(len(texts), num_perm)` uint32 уже нормализованных текстов."""
+
+        result = np.empty((len(texts), self.config.num_perm), dtype=np.uint32)
+        block: list[np.ndarray] = []
+        block_start = 0
+        block_size = 0
+        for idx, text in enumerate(texts):
+            shingles = self.shingles(text)
+            block.append(shingles)
+            block_size += len(shingles)
+            if block_size >= _SHINGLE_BLOCK or idx == len(texts) - 1:
+                result[block_start : idx + 1] = self._min_hash(block)
+                block, block_start, block_size = [], idx + 1, 0
+        return result
+
+    def _min_hash(self, block: list[np.ndarray]) -> np.ndarray:
+        offsets = np.cumsum([0] + [len(shingles) for shingles in block[:-1]])
+        values = self._a * np.concatenate(block)[None, :]
+        values += self._b
+        values >>= _SHIFT
+        return np.minimum.reduceat(values, offsets, axis=1).T
+
+    def group(self, texts: Sequence[str]) -> DuplicateGroups:
+        """Находит группы дубликатов среди исходных (ненормализованных) текстов."""
+
+        config = self.config
+        normalized = [normalize_text(text) for text in texts]
+        representatives = np.arange(len(texts))
+        first_seen: dict[str, int] = {}
+        pending: list[int] = []
+        for idx, text in enumerate(normalized):
+            representative = first_seen.setdefault(text, idx)
+            if representative != idx:
+                representatives[idx] = representative
+            else:
+                pending.append(idx)
+
+        if len(pending) > 1:
+            signatures = self.signatures([normalized[idx] for idx in pending])
+            rows = config.num_perm // config.bands
+            tables: list[dict[bytes, list[int]]] = [{} for _ in range(config.bands)]
+            for position, idx in enumerate(pending):
+                signature = signatures[position]
+                keys = [
+                    signature[band * rows : (band + 1) * rows].tobytes() for band in range(config.bands)
+                ]
+                candidates = {
+                    candidate for table, key in zip(tables, keys) for candidate in table.get(key, ())
+                }
+                if candidates:
+                    ordered = sorted(candidates)
+                    similarity = (signatures[ordered] == signature).mean(axis=1)
+                    best = int(np.argmax(similarity))
+                    if similarity[best] >= config.threshold:
+                        representatives[idx] = pending[ordered[best]]
+                        continue
+                # В полосы попадают только представители — см. докстринг модуля.
+                for table, key in zip(tables, keys):
+                    table.setdefault(key, []).append(position)
+
+        # Точные копии почти-дубликата ссылаются на представителя всей группы.
+        representatives = representatives[representatives]
+        exact = np.fromiter(
+            (text == texts[rep] for text, rep in zip(texts, representatives.tolist())),
+            dtype=bool,
+            count=len(texts),
+        )
+        return DuplicateGroups(representatives=representatives, exact=exact)
+
+
+def _nearest(fragment: str, start: int, target: str) -> int | None:
+    best: int | None = None
+    position = target.find(fragment)
+    while position != -1:
+        if best is None or abs(position - start) < abs(best - start):
+            best = position
+        position = target.find(fragment, position + 1)
+    return best
+
+
+def _fold(text: str) -> tuple[str, list[int]]:
+    """Текст, сведённый как в `normalize_text` (регистр, пунктуация, пробелы),
+    и позиция в исходном тексте для каждого его символа."""
+
+    chars: list[str] = []
+    offsets: list[int] = []
+    gap = False
+    for position, char in enumerate(text):
+        if not (char.isalnum() or char == "_"):
+            gap = True
+            continue
+        if gap and chars:
+            chars.append(" ")
+            offsets.append(position)
+        gap = False
+        for folded in char.lower():
+            chars.append(folded)
+            offsets.append(position)
+    return "".join(chars), offsets
+
+
+def relocate_spans(spans: Sequence[S], source: str, target: str) -> list[S]:
+    """Переносит спаны (`start`/`end`) из текста представителя в текст копии.
+
+    Фрагмент ищется в `target` посимвольно, берётся вхождение, ближайшее к
+    исходной позиции. Группы строятся по `normalize_text`, поэтому копия
+    может отличаться регистром, пунктуацией и пробелами: тогда фрагмент
+    ищется в свёрнутых так же текстах, а найденное место отображается обратно
+    в позиции `target`. Спаны, фрагмента которых в копии нет (правка задела
+    упоминание), отбрасываются. Поле `text` спана берётся из копии.
+    """
+
+    relocated: list[S] = []
+    folded: tuple[tuple[str, list[int]], tuple[str, list[int]]] | None = None
+    for span in spans:
+        fragment = source[span.start : span.end]
+        position = _nearest(fragment, span.start, target)
+        if position is not None:
+            start, end = position, position + len(fragment)
+        else:
+            if folded is None:
+                folded = _fold(source), _fold(target)
+            (folded_source, source_offsets), (folded_target, target_offsets) = folded
+            folded_fragment = _fold(fragment)[0]
+            if not folded_fragment:
+                continue
+            position = _nearest(
+                folded_fragment, bisect.bisect_left(source_offsets, span.start), folded_target
+            )
+            if position is None:
+                continue
+            start = target_offsets[position]
+            end = target_offsets[position + len(folded_fragment) - 1] + 1
+        if hasattr(span, "text"):
+            relocated.append(replace(span, start=start, end=end, text=target[start:end]))
+        else:
+            relocated.append(replace(span, start=start, end=end))
+    return relocated
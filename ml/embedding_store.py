@@ -0,0 +1,179 @@
+"""Компактное хранилище эмбеддингов с квантованием float16/int8.
+
+Векторы хранятся матрицей `(n, dimension)` в порядке по столбцам (Fortran):
+каждая координата всех постов лежит непрерывно, файл `codes.npy` открывается
+через memmap. Квантование скалярное:
+
+- `"float16"` — половинная точность, масштаб 1;
+- `"int8"` — симметричное, масштаб на вектор: `x ≈ scale * code`,
+  `scale = max|x| / 127`;
+- `"float32"` — без сжатия (для сравнения).
+
+Рядом с кодами хранятся масштабы и нормы восстановленных векторов, поэтому
+косинус считается прямо по кодам: блок строк переводится в float32,
+умножается на нормированные запросы и домножается на `scale / norm`.
+Параметры (версия формата, тип, размерность) — в `meta.pkl`, как у
+`VectorIndex` и `AliasCandidateIndex`.
+"""
+
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+from .vector_index import _SCORE_MAX_CELLS, _top_k
+
+STORE_DTYPES = ("float32", "float16", "int8")
+_INT8_MAX = 127
+
+
+class EmbeddingStore:
+    """Квантованные эмбеддинги: строка `row` — вектор поста с этим номером."""
+
+    # Версия формата `save`; снимки другой версии не загружаются.
+    FORMAT = 1
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, norms: np.ndarray) -> None:
+        if codes.dtype.name not in STORE_DTYPES:
+            raise ValueError(f"Неподдерживаемый тип кодов: {codes.dtype}")
+        if codes.ndim != 2 or scales.shape != (len(codes),) or norms.shape != (len(codes),):
+            raise ValueError("Коды, масштабы и нормы должны описывать одни и те же строки")
+        self.codes = codes
+        self.scales = scales
+        self.norms = norms
+        # Множитель косинуса: скалярное произведение кода с единичным запросом → косинус.
+        self._factors = (scales / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    @classmethod
+    def build(
+        cls, vectors: np.ndarray, *, dtype: str = "int8", path: Path | None = None
+    ) -> EmbeddingStore:
+        """Квантует `vectors` блоками строк (подходит и для memmap).
+
+        С `path` коды сразу пишутся в `path/codes.npy` и хранилище
+        возвращается открытым через memmap; иначе всё остаётся в памяти.
+        """
+
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Неизвестный тип хранилища: {dtype}; доступны {STORE_DTYPES}")
+        count, dimension = vectors.shape
+        if path is not None:
+            path = Path(path)
+            path.mkdir(parents=True, exist_ok=True)
+            codes = np.lib.format.open_memmap(
+                path / "codes.npy", mode="w+", dtype=dtype, shape=(count, dimension), fortran_order=True
+            )
+        else:
+            codes = np.empty((count, dimension), dtype=dtype, order="F")
+        scales = np.ones(count, dtype=np.float32)
+        norms = np.empty(count, dtype=np.float32)
+        step = max(1, _SCORE_MAX_CELLS // max(dimension, 1))
+        for start in range(0, count, step):
+            block = np.asarray(vectors[start : start + step], dtype=np.float32)
+            if dtype == "int8":
+                block_scales = np.abs(block).max(axis=1) / _INT8_MAX
+                block_scales[block_scales == 0] = 1.0
+                block_codes = np.clip(np.rint(block / block_scales[:, None]), -_INT8_MAX, _INT8_MAX)
+                scales[start : start + step] = block_scales
+            else:
+                block_codes = block
+            codes[start : start + step] = block_codes
+            restored = codes[start : start + step].astype(np.float32) * scales[start : start + step, None]
+            norms[start : start + step] = np.linalg.norm(restored, axis=1)
+        store = cls(codes, scales, norms)
+        if path is not None:
+            codes.flush()
+            store._save_meta(path)
+        return store
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def dimension(self) -> int:
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes + self.norms.nbytes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def vector(self, row: int) -> np.ndarray:
+        """Восстановленный float32-вектор строки `row`."""
+
+        return self.codes[row].astype(np.float32) * self.scales[row]
+
+    def vectors(self, rows: np.ndarray | None = None) -> np.ndarray:
+        """Восстановленные float32-векторы строк `rows` (по умолчанию — всех)."""
+
+        if rows is None:
+            return self.codes.astype(np.float32) * self.scales[:, None]
+        rows = np.asarray(rows)
+        return self.codes[rows].astype(np.float32) * self.scales[rows, None]
+
+    def search(self, query: np.ndarray, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """`(rows, scores)` `k` строк с наибольшим косинусом к запросу."""
+
+        rows, scores = self.search_batch(np.asarray(query)[None, :], k)
+        return rows[0], scores[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """`(rows, scores)` формы `(len(queries), min(k, len(store)))` по убыванию косинуса.
+
+        Коды перебираются блоками строк: блок переводится в float32 один раз
+        для всех запросов, лучшие `k` блока сливаются с текущими.
+        """
+
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dimension:
+            raise ValueError(f"Ожидались запросы формы (m, {self.dimension}), получено {queries.shape}")
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        k = min(k, len(self))
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        if k <= 0:
+            return best_rows, best_scores
+        # Блок кодов в float32 и матрица оценок вместе укладываются в _SCORE_MAX_CELLS.
+        step = max(1, _SCORE_MAX_CELLS // (self.dimension + len(queries)))
+        for start in range(0, len(self), step):
+            block = self.codes[start : start + step].astype(np.float32)
+            scores = (queries @ block.T) * self._factors[start : start + step]
+            top = _top_k(scores, min(k, scores.shape[1]))
+            rows = np.concatenate([best_rows, top + start], axis=1)
+            merged = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            keep = _top_k(merged, k)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores = np.take_along_axis(merged, keep, axis=1)
+        return best_rows, best_scores
+
+    def _save_meta(self, directory: Path) -> None:
+        np.save(directory / "scales.npy", self.scales)
+        np.save(directory / "norms.npy", self.norms)
+        meta = {"format": self.FORMAT, "dtype": self.dtype, "dimension": self.dimension, "count": len(self)}
+        with (directory / "meta.pkl").open("wb") as fp:
+            pickle.dump(meta, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def save(self, directory: Path) -> None:
+        """Сохраняет коды (`codes.npy`, порядок по столбцам), масштабы, нормы и `meta.pkl`."""
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "codes.npy", np.asfortranarray(self.codes))
+        self._save_meta(directory)
+
+    @classmethod
+    def load(cls, directory: Path, *, mmap: bool = True) -> EmbeddingStore:
+        directory = Path(directory)
+        with (directory / "meta.pkl").open("rb") as fp:
+            meta = pickle.load(fp)
+        if meta.get("format") != cls.FORMAT:
+            raise ValueError(f"Хранилище эмбеддингов в устаревшем формате: {directory}")
+        codes = np.load(directory / "codes.npy", mmap_mode="r" if mmap else None)
+        if codes.dtype.name != meta["dtype"] or codes.shape != (meta["count"], meta["dimension"]):
+            raise ValueError(f"Коды не соответствуют meta.pkl: {directory}")
+        return cls(codes, np.load(directory / "scales.npy"), np.load(directory / "norms.npy"))
@@ -2,54 +2,659 @@
 
 from __future__ import annotations
 
-from typing import Iterable, Sequence
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Protocol, Sequence
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from .caching import CacheStats
 from .config import EmbeddingConfig
-from .preprocessing import batched, normalize_text
+from .lazy import lazy_getattr
+from .metrics import NULL_METRICS, NullMetrics, PipelineMetrics
+from .preprocessing import iter_batched, normalize_text
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# sentence_transformers тянет torch, поэтому импортируется при загрузке модели.
+__getattr__ = lazy_getattr(__name__, {"SentenceTransformer": "sentence_transformers:SentenceTransformer"})
+
+
+def text_digest(normalized_text: str) -> str:
+    """SHA-1 нормализованного текста — ключ записи в кэше."""
+
+    return hashlib.sha1(normalized_text.encode("utf-8")).hexdigest()
+
+
+def backend_cache_name(config: EmbeddingConfig) -> str:
+    """Метка модели в ключах `EmbeddingCache` для движка из `config`.
+
+    Считается по конфигу, без загрузки модели: прогретый кэш отвечает, не
+    поднимая torch или ONNX Runtime.
+    """
+
+    if config.backend == "onnx":
+        return f"{config.model_name}#onnx-{config.onnx_precision}"
+    return config.model_name
+
+
+class EmbeddingCache:
+    """Постоянный кэш эмбеддингов в SQLite.
+
+    Записи ключуются `(model_name, normalize_embeddings, sha1(text))`, векторы
+    хранятся как float32 BLOB. При превышении `max_entries` вытесняются
+    записи, к которым дольше всего не обращались.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS embeddings (
+            model TEXT NOT NULL,
+            normalized INTEGER NOT NULL,
+            digest TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (model, normalized, digest)
+        );
+        CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed);
+    """
+
+    def __init__(self, path: Path, *, max_entries: int | None = None) -> None:
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return int(count)
+
+    def get_many(
+        self, model_name: str, normalized: bool, digests: Sequence[str]
+    ) -> dict[str, np.ndarray]:
+        """Возвращает найденные векторы и обновляет время обращения к ним."""
+
+        found: dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(digests))
+        # Ограничение SQLite на число параметров запроса.
+        step = 900
+        with self._lock:
+            for offset in range(0, len(unique), step):
+                chunk = unique[offset : offset + step]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT digest, vector FROM embeddings "
+                    f"WHERE model = ? AND normalized = ? AND digest IN ({placeholders})",
+                    (model_name, int(normalized), *chunk),
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed = ? "
+                    "WHERE model = ? AND normalized = ? AND digest = ?",
+                    [(now, model_name, int(normalized), digest) for digest in found],
+                )
+                self._conn.commit()
+        hits = sum(1 for digest in digests if digest in found)
+        self.stats.hits += hits
+        self.stats.misses += len(digests) - hits
+        return found
+
+    def put_many(
+        self, model_name: str, normalized: bool, items: Iterable[tuple[str, np.ndarray]]
+    ) -> None:
+        now = time.time()
+        rows = [
+            (model_name, int(normalized), digest, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for digest, vector in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, normalized, digest, vector, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        if self.max_entries is not None:
+            self.prune(self.max_entries)
+
+    def iter_vectors(
+        self, model_name: str, normalized: bool, *, batch_size: int = 10_000
+    ) -> Iterator[tuple[list[str], np.ndarray]]:
+        """Все векторы модели пачками `(digests, matrix)` в порядке добавления."""
+
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, digest, vector FROM embeddings "
+                    "WHERE model = ? AND normalized = ? AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (model_name, int(normalized), last_rowid, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield (
+                [digest for _, digest, _ in rows],
+                np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows]),
+            )
+
+    def prune(self, max_entries: int | None = None, *, model_name: str | None = None) -> int:
+        """Удаляет самые старые записи сверх лимита и/или записи чужих моделей."""
+
+        removed = 0
+        with self._lock:
+            if model_name is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM embeddings WHERE model != ?", (model_name,)
+                ).rowcount
+            limit = max_entries if max_entries is not None else self.max_entries
+            if limit is not None:
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                excess = count - limit
+                if excess > 0:
+                    removed += self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN ("
+                        "SELECT rowid FROM embeddings ORDER BY accessed LIMIT ?)",
+                        (excess,),
+                    ).rowcount
+            self._conn.commit()
+        self.stats.evictions += removed
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingBackend(Protocol):
+    """Движок, который превращает нормализованные тексты в векторы."""
+
+    # Метка модели в ключах `EmbeddingCache`: векторы разных движков не смешиваются.
+    cache_name: str
+
+    @property
+    def dimension(self) -> int: ...
+
+    def encode(self, texts: Sequence[str], *, batch_size: int, normalize: bool) -> np.ndarray: ...
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        """Число токенов каждого текста после усечения до длины модели."""
+        ...
+
+
+class SentenceTransformerBackend:
+    """Полноточная модель SentenceTransformer на torch."""
+
+    def __init__(self, config: EmbeddingConfig) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.cache_name = backend_cache_name(config)
+        self.model = SentenceTransformer(
+            str(config.model_path or config.model_name),
+            device=config.device,
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: Sequence[str], *, batch_size: int, normalize: bool) -> np.ndarray:
+        return self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+        )
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        return _token_lengths(self.model.tokenizer, texts, self.model.max_seq_length)
+
+
+class OnnxBackend:
+    """Экспортированная модель в ONNX Runtime на CPU, по умолчанию с int8-весами.
+
+    Каталог готовит `export_onnx`: в нём лежат `model.onnx` и/или
+    `model.int8.onnx`, токенизатор и `onnx.json` с пулингом и длиной
+    последовательности. torch для работы не нужен.
+    """
+
+    def __init__(self, config: EmbeddingConfig) -> None:
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        if config.onnx_path is None:
+            raise ValueError(
+                "Для backend='onnx' задайте EmbeddingConfig.onnx_path "
+                "(python -m ml.embeddings export-onnx --output <каталог>)"
+            )
+        directory = Path(config.onnx_path)
+        meta = json.loads((directory / _ONNX_META).read_text(encoding="utf-8"))
+        self.cache_name = backend_cache_name(config)
+        self._pooling = meta["pooling"]
+        self._max_seq_length = meta["max_seq_length"]
+        self._dimension = meta["dimension"]
+        self._tokenizer = AutoTokenizer.from_pretrained(directory)
+        options = onnxruntime.SessionOptions()
+        if config.onnx_threads:
+            options.intra_op_num_threads = config.onnx_threads
+        self._session = onnxruntime.InferenceSession(
+            str(directory / _ONNX_FILES[config.onnx_precision]),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, texts: Sequence[str], *, batch_size: int, normalize: bool) -> np.ndarray:
+        output = np.empty((len(texts), self._dimension), dtype=np.float32)
+        for offset in range(0, len(texts), batch_size):
+            batch = list(texts[offset : offset + batch_size])
+            tokens = self._tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self._max_seq_length,
+                return_tensors="np",
+            )
+            mask = tokens["attention_mask"].astype(np.int64)
+            (hidden,) = self._session.run(
+                ["last_hidden_state"],
+                {"input_ids": tokens["input_ids"].astype(np.int64), "attention_mask": mask},
+            )
+            if self._pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                weights = mask[..., None].astype(np.float32)
+                pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            if normalize:
+                pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            output[offset : offset + len(batch)] = pooled
+        return output
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        return _token_lengths(self._tokenizer, texts, self._max_seq_length)
+
+
+def _token_lengths(tokenizer, texts: Sequence[str], max_length: int) -> np.ndarray:
+    input_ids = tokenizer(
+        list(texts),
+        truncation=True,
+        max_length=max_length,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )["input_ids"]
+    return np.fromiter(map(len, input_ids), dtype=np.int64, count=len(texts))
+
+
+def plan_batches(lengths: np.ndarray, max_tokens: int) -> list[slice]:
+    """Режет отсортированные по убыванию длины тексты на батчи по бюджету.
+
+    Стоимость батча — `число текстов × длина первого (самого длинного)`,
+    как у батча с паддингом; в каждый батч попадает хотя бы один текст.
+    """
+
+    batches: list[slice] = []
+    start = 0
+    while start < len(lengths):
+        size = max(1, max_tokens // max(int(lengths[start]), 1))
+        batches.append(slice(start, min(start + size, len(lengths))))
+        start += size
+    return batches
+
+
+_BACKENDS: dict[str, type] = {"torch": SentenceTransformerBackend, "onnx": OnnxBackend}
+_ONNX_META = "onnx.json"
+_ONNX_FILES = {"fp32": "model.onnx", "int8": "model.int8.onnx"}
+# Тексты для проверки экспорта, если свои не переданы.
+_ONNX_CHECK_TEXTS = (
+    "Вчера посмотрели новый фильм Балабанова — очень сильный финал.",
+    "Лучшие кадры из «Сталкера» Тарковского",
+    "Short English post about a movie night",
+    "Премьера сериала перенесена на осень",
+)
+
+
+def create_backend(config: EmbeddingConfig) -> EmbeddingBackend:
+    backend = _BACKENDS.get(config.backend)
+    if backend is None:
+        raise ValueError(f"Неизвестный движок эмбеддингов: {config.backend}")
+    return backend(config)
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Построчное косинусное сходство векторов двух движков."""
+
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    return (reference * candidate).sum(axis=1) / np.maximum(norms, 1e-12)
+
+
+def export_onnx(
+    config: EmbeddingConfig,
+    output: Path,
+    *,
+    tolerance: float = 0.02,
+    check_texts: Sequence[str] = _ONNX_CHECK_TEXTS,
+) -> dict[str, float]:
+    """Экспортирует модель в ONNX (fp32 и int8) и сверяет её с torch.
+
+    Экспорт делается один раз на машине с torch; воркерам потом достаточно
+    onnxruntime. Для каждой точности считается минимальное косинусное
+    сходство с `SentenceTransformerBackend` на `check_texts`; если оно ниже
+    `1 - tolerance`, выбрасывается ValueError. Возвращает эти минимумы.
+    """
+
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    reference_backend = SentenceTransformerBackend(replace(config, device="cpu"))
+    model = reference_backend.model
+    transformer = model[0]
+    pooling = "mean"
+    for module in model:
+        if getattr(module, "pooling_mode_cls_token", False):
+            pooling = "cls"
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, encoder: torch.nn.Module) -> None:
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    sample = transformer.tokenizer(list(check_texts[:2]), padding=True, return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        _Encoder(transformer.auto_model).eval(),
+        (sample["input_ids"], sample["attention_mask"]),
+        str(output / _ONNX_FILES["fp32"]),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "last_hidden_state": axes},
+        opset_version=14,
+    )
+    quantize_dynamic(
+        str(output / _ONNX_FILES["fp32"]),
+        str(output / _ONNX_FILES["int8"]),
+        weight_type=QuantType.QInt8,
+    )
+    transformer.tokenizer.save_pretrained(output)
+    meta = {
+        "model_name": config.model_name,
+        "pooling": pooling,
+        "max_seq_length": model.max_seq_length,
+        "dimension": reference_backend.dimension,
+    }
+    (output / _ONNX_META).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    texts = [normalize_text(text, keep_case=True) for text in check_texts]
+    reference = reference_backend.encode(texts, batch_size=config.batch_size, normalize=True)
+    agreement: dict[str, float] = {}
+    for precision in _ONNX_FILES:
+        backend = OnnxBackend(replace(config, onnx_path=output, onnx_precision=precision))
+        candidate = backend.encode(texts, batch_size=config.batch_size, normalize=True)
+        agreement[precision] = float(cosine_agreement(reference, candidate).min())
+        if agreement[precision] < 1.0 - tolerance:
+            raise ValueError(
+                f"ONNX ({precision}) расходится с torch: косинус {agreement[precision]:.4f} "
+                f"< {1.0 - tolerance:.4f}"
+            )
+    return agreement
 
 
 class EmbeddingGenerator:
-    """Обёртка над SentenceTransformer с удобной конфигурацией."""
+    """Векторизация постов через выбранный движок (`EmbeddingConfig.backend`)."""
 
-    def __init__(self, config: EmbeddingConfig | None = None) -> None:
+    def __init__(
+        self, config: EmbeddingConfig | None = None, *, backend: EmbeddingBackend | None = None
+    ) -> None:
         self.config = config or EmbeddingConfig()
-        self._model: SentenceTransformer | None = None
+        # Готовый движок (например, заглушка в бенчмарках) вместо `create_backend`.
+        self._backend: EmbeddingBackend | None = backend
+        self.metrics: PipelineMetrics | NullMetrics = NULL_METRICS
+        self.cache: EmbeddingCache | None = (
+            EmbeddingCache(self.config.cache_path, max_entries=self.config.cache_max_entries)
+            if self.config.cache_path
+            else None
+        )
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        if self._backend is None:
+            self._backend = create_backend(self.config)
+        return self._backend
+
+    @property
+    def cache_name(self) -> str:
+        """Метка модели в кэше; движок ради неё не создаётся."""
+
+        if self._backend is not None:
+            return self._backend.cache_name
+        return backend_cache_name(self.config)
 
     @property
     def model(self) -> SentenceTransformer:
-        if self._model is None:
-            self._model = SentenceTransformer(
-                self.config.model_name,
-                device=self.config.device,
-            )
-        return self._model
+        """Модель SentenceTransformer движка `torch` (например, для сохранения снимка)."""
+
+        backend = self.backend
+        if not isinstance(backend, SentenceTransformerBackend):
+            raise RuntimeError(f"У движка {self.config.backend!r} нет модели SentenceTransformer")
+        return backend.model
+
+    def _encode(self, preprocessed: Sequence[str]) -> np.ndarray:
+        """Векторизует тексты без повторов, батчами по длине, в исходном порядке."""
+
+        backend = self.backend
+        normalize = self.config.normalize_embeddings
+        unique = list(dict.fromkeys(preprocessed))
+        self.metrics.increment("embedding_texts_encoded", len(unique))
+        if self.config.max_batch_tokens is None or len(unique) <= 1:
+            encoded = backend.encode(unique, batch_size=self.config.batch_size, normalize=normalize)
+        else:
+            lengths = backend.token_lengths(unique)
+            order = np.argsort(-lengths, kind="stable")
+            encoded = None
+            for batch in plan_batches(lengths[order], self.config.max_batch_tokens):
+                rows = order[batch]
+                vectors = backend.encode(
+                    [unique[row] for row in rows], batch_size=len(rows), normalize=normalize
+                )
+                if encoded is None:
+                    encoded = np.empty((len(unique), vectors.shape[1]), dtype=vectors.dtype)
+                encoded[rows] = vectors
+        if len(unique) == len(preprocessed):
+            return encoded
+        positions = {text: row for row, text in enumerate(unique)}
+        return encoded[[positions[text] for text in preprocessed]]
 
     def embed(self, texts: Sequence[str]) -> np.ndarray:
         """Векторизует коллекцию текстов."""
 
         preprocessed = [normalize_text(text, keep_case=True) for text in texts]
-        embeddings = self.model.encode(
-            preprocessed,
-            batch_size=self.config.batch_size,
-            show_progress_bar=False,
-            convert_to_numpy=True,
-            normalize_embeddings=self.config.normalize_embeddings,
-        )
+        if self.cache is None or not preprocessed:
+            return self._encode(preprocessed)
+
+        digests = [text_digest(text) for text in preprocessed]
+        cache_name = self.cache_name
+        cached = self.cache.get_many(cache_name, self.config.normalize_embeddings, digests)
+        missing: dict[str, str] = {}
+        hits = 0
+        for digest, text in zip(digests, preprocessed):
+            if digest in cached:
+                hits += 1
+            else:
+                missing.setdefault(digest, text)
+        self.metrics.increment("embedding_cache_hits", hits)
+        if missing:
+            encoded = self._encode(list(missing.values()))
+            fresh = dict(zip(missing, encoded))
+            self.cache.put_many(cache_name, self.config.normalize_embeddings, fresh.items())
+            cached.update(fresh)
+
+        dimension = len(next(iter(cached.values())))
+        embeddings = np.empty((len(digests), dimension), dtype=np.float32)
+        for row, digest in enumerate(digests):
+            embeddings[row] = cached[digest]
         return embeddings
 
+    def embed_stream(
+        self, texts: Iterable[str], *, batch_size: int | None = None
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """Лениво векторизует поток текстов.
+
+        Выдаёт пары `(batch_indices, embeddings)`, где индексы — позиции
+        текстов во входном потоке. В памяти одновременно держится только
+        текущий батч.
+        """
+
+        offset = 0
+        for batch in iter_batched(texts, batch_size or self.config.batch_size):
+            indices = np.arange(offset, offset + len(batch))
+            offset += len(batch)
+            yield indices, self.embed(batch)
+
+    def embed_to_memmap(
+        self,
+        texts: Iterable[str],
+        path: Path,
+        *,
+        count: int,
+        batch_size: int | None = None,
+    ) -> np.memmap:
+        """Пишет эмбеддинги `count` текстов напрямую в `.npy`-файл.
+
+        Файл открывается через `np.load(path, mmap_mode="r")`, поэтому выгрузка
+        любого объёма идёт при постоянном потреблении памяти.
+        """
+
+        output = np.lib.format.open_memmap(
+            path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(count, self.dimension),
+        )
+        written = 0
+        for indices, embeddings in self.embed_stream(texts, batch_size=batch_size):
+            if indices[-1] >= count:
+                raise ValueError(f"Во входном потоке больше {count} текстов")
+            output[indices[0] : indices[-1] + 1] = embeddings
+            written = int(indices[-1]) + 1
+        if written != count:
+            raise ValueError(f"Ожидалось {count} текстов, получено {written}")
+        output.flush()
+        return output
+
+    @property
+    def dimension(self) -> int:
+        return self.backend.dimension
+
     def embed_iter(self, texts: Iterable[str]) -> np.ndarray:
         """Векторизует тексты из произвольного итератора."""
 
-        batches = batched(list(texts), self.config.batch_size)
-        if not batches:
-            return np.empty((0, self.model.get_sentence_embedding_dimension()))
-        embedded_batches = [self.embed(batch) for batch in batches]
+        embedded_batches = [embeddings for _, embeddings in self.embed_stream(texts)]
+        if not embedded_batches:
+            return np.empty((0, self.dimension))
         return np.vstack(embedded_batches)
 
     def embed_single(self, text: str) -> np.ndarray:
         """Удобный хелпер для одиночного текста."""
 
         return self.embed([text])[0]
+
+
+def _read_texts(paths: Sequence[Path], field: str) -> Iterator[str]:
+    """Читает тексты: `.jsonl` — поле `field` каждой строки, иначе строка целиком."""
+
+    for path in paths:
+        with path.open("r", encoding="utf-8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                if path.suffix == ".jsonl":
+                    value = json.loads(line).get(field)
+                    if isinstance(value, str):
+                        yield value
+                else:
+                    yield line
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """CLI обслуживания: кэш (`warm`, `prune`, `stats`) и `export-onnx`."""
+
+    parser = argparse.ArgumentParser(prog="python -m ml.embeddings")
+    parser.add_argument("--cache", type=Path, help="Путь к SQLite-файлу кэша")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm = commands.add_parser("warm", help="Досчитать эмбеддинги для текстов из файлов")
+    warm.add_argument("inputs", type=Path, nargs="+")
+    warm.add_argument("--field", default="text", help="Поле с текстом в .jsonl")
+    warm.add_argument("--model", default=EmbeddingConfig().model_name)
+    warm.add_argument("--backend", choices=sorted(_BACKENDS), default=EmbeddingConfig().backend)
+    warm.add_argument("--onnx-path", type=Path)
+    warm.add_argument("--chunk-size", type=int, default=1024)
+
+    prune = commands.add_parser("prune", help="Вытеснить старые записи")
+    prune.add_argument("--max-entries", type=int)
+    prune.add_argument("--keep-model", help="Удалить записи всех остальных моделей")
+
+    commands.add_parser("stats", help="Показать число записей")
+
+    export = commands.add_parser("export-onnx", help="Экспортировать модель в ONNX (fp32 и int8)")
+    export.add_argument("--output", type=Path, required=True)
+    export.add_argument("--model", default=EmbeddingConfig().model_name)
+    export.add_argument("--model-path", type=Path)
+    export.add_argument("--tolerance", type=float, default=0.02, help="Допустимое 1 - cos с torch")
+
+    args = parser.parse_args(argv)
+    if args.command == "export-onnx":
+        config = EmbeddingConfig(model_name=args.model, model_path=args.model_path)
+        agreement = export_onnx(config, args.output, tolerance=args.tolerance)
+        print(" ".join(f"{precision}: min_cos={value:.4f}" for precision, value in agreement.items()))
+        return
+    if args.cache is None:
+        parser.error(f"для команды {args.command} нужен --cache")
+    if args.command == "warm":
+        generator = EmbeddingGenerator(
+            EmbeddingConfig(
+                model_name=args.model,
+                cache_path=args.cache,
+                backend=args.backend,
+                onnx_path=args.onnx_path,
+            )
+        )
+        for chunk in iter_batched(_read_texts(args.inputs, args.field), args.chunk_size):
+            generator.embed(chunk)
+        stats = generator.cache.stats
+        print(f"hits={stats.hits} misses={stats.misses} hit_rate={stats.hit_rate:.3f}")
+    elif args.command == "prune":
+        cache = EmbeddingCache(args.cache)
+        removed = cache.prune(args.max_entries, model_name=args.keep_model)
+        print(f"removed={removed} entries={len(cache)}")
+    else:
+        print(f"entries={len(EmbeddingCache(args.cache))}")
+
+
+if __name__ == "__main__":
+    main()
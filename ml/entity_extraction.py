@@ -3,12 +3,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, Sequence
-
-import spacy
-from spacy.language import Language
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
 
 from .config import EntityExtractionConfig
+from .lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+# spaCy загружается вместе с моделью при первом обращении к `nlp`.
+__getattr__ = lazy_getattr(__name__, {"spacy": "spacy", "Language": "spacy.language:Language"})
 
 
 @dataclass(slots=True, frozen=True)
@@ -20,45 +24,94 @@ class Entity:
 
 
 class EntityExtractor:
-    """Обёртка над spaCy для извлечения сущностей."""
+    """Обёртка над spaCy для извлечения сущностей.
+
+    После загрузки модели включёнными остаются только
+    `EntityExtractionConfig.enabled_components` и слои, которые они слушают.
+    Все методы идут через один потоковый `nlp.pipe` с настраиваемыми
+    `batch_size`/`n_process`.
+    """
 
     def __init__(self, config: EntityExtractionConfig | None = None) -> None:
         self.config = config or EntityExtractionConfig()
         self._nlp: Language | None = None
 
+    def __getstate__(self) -> dict[str, object]:
+        # Загруженную модель не сериализуем: воркер загрузит её сам при первом вызове.
+        state = self.__dict__.copy()
+        state["_nlp"] = None
+        return state
+
     @property
     def nlp(self) -> Language:
         if self._nlp is None:
-            self._nlp = spacy.load(self.config.spacy_model)
+            import spacy
+
+            nlp = spacy.load(self.config.model_path or self.config.spacy_model)
+            if self.config.enabled_components is not None:
+                self._disable_unused(nlp, self.config.enabled_components)
+            self._nlp = nlp
         return self._nlp
 
-    def extract(self, text: str) -> list[Entity]:
-        doc = self.nlp(text)
-        allowed = set(self.config.include_types) if self.config.include_types else None
-        entities: list[Entity] = []
-        for ent in doc.ents:
-            if allowed and ent.label_ not in allowed:
-                continue
-            entities.append(Entity(text=ent.text, label=ent.label_, start=ent.start_char, end=ent.end_char))
-        return entities
-
-    def extract_batch(self, texts: Sequence[str]) -> list[list[Entity]]:
-        allowed = set(self.config.include_types) if self.config.include_types else None
-        results: list[list[Entity]] = []
-        for doc in self.nlp.pipe(texts):
-            entities: list[Entity] = []
-            for ent in doc.ents:
-                if allowed and ent.label_ not in allowed:
-                    continue
-                entities.append(Entity(text=ent.text, label=ent.label_, start=ent.start_char, end=ent.end_char))
-            results.append(entities)
-        return results
-
-    def iter_extract(self, texts: Iterable[str]) -> Iterable[list[Entity]]:
+    @staticmethod
+    def _disable_unused(nlp: Language, enabled: Iterable[str]) -> None:
+        needed = set(enabled)
+        missing = needed - set(nlp.pipe_names)
+        if missing:
+            raise ValueError(
+                f"В модели нет компонентов {sorted(missing)}; доступны: {nlp.pipe_names}"
+            )
+        # Общий tok2vec/transformer нужен, если его слушает хотя бы один нужный компонент.
+        for name, pipe in nlp.pipeline:
+            if needed & set(getattr(pipe, "listening_components", None) or ()):
+                needed.add(name)
+        for name in nlp.pipe_names:
+            if name not in needed:
+                nlp.disable_pipe(name)
+
+    def _iter_entities(
+        self,
+        texts: Iterable[str],
+        *,
+        batch_size: int | None = None,
+        n_process: int | None = None,
+    ) -> Iterator[list[Entity]]:
+        """Общее ядро: поток документов `nlp.pipe` → отфильтрованные сущности."""
+
         allowed = set(self.config.include_types) if self.config.include_types else None
-        for doc in self.nlp.pipe(texts):
+        docs = self.nlp.pipe(
+            texts,
+            batch_size=batch_size or self.config.batch_size,
+            n_process=n_process or self.config.n_process,
+        )
+        for doc in docs:
             yield [
                 Entity(text=ent.text, label=ent.label_, start=ent.start_char, end=ent.end_char)
                 for ent in doc.ents
                 if not allowed or ent.label_ in allowed
             ]
+
+    def extract(self, text: str) -> list[Entity]:
+        return next(self._iter_entities([text], n_process=1))
+
+    def extract_batch(
+        self,
+        texts: Sequence[str],
+        *,
+        batch_size: int | None = None,
+        n_process: int | None = None,
+    ) -> list[list[Entity]]:
+        batch_size = batch_size or self.config.batch_size
+        # Запуск процессов spaCy окупается только на нескольких пачках.
+        if len(texts) <= batch_size:
+            n_process = 1
+        return list(self._iter_entities(texts, batch_size=batch_size, n_process=n_process))
+
+    def iter_extract(
+        self,
+        texts: Iterable[str],
+        *,
+        batch_size: int | None = None,
+        n_process: int | None = None,
+    ) -> Iterator[list[Entity]]:
+        return self._iter_entities(texts, batch_size=batch_size, n_process=n_process)
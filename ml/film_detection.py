@@ -2,17 +2,34 @@
 
 from __future__ import annotations
 
+import os
 import re
 from dataclasses import dataclass
-from typing import Sequence
+from itertools import repeat
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
 
+import numpy as np
 from rapidfuzz import fuzz, process
 
-from .aliases import FilmAliasResolver, FilmRecord
+from .alias_index import AliasCandidateIndex
+from .aliases import _CDIST_MAX_CELLS, AliasCatalogue, FilmAliasResolver, FilmRecord
+from .caching import LRUCache
+from .candidates import CandidateFilter, Token, TokenWindow
 from .config import FilmAliasConfig
-from .preprocessing import normalize_text
+from .metrics import NULL_METRICS, NullMetrics, PipelineMetrics
+from .parallel import pool_context
+from .preprocessing import iter_batched, normalize_token
+
+if TYPE_CHECKING:
+    from .entity_extraction import Entity
 
 _WORD_RE = re.compile(r"\b[\w'-]+\b", flags=re.UNICODE)
+_DETECTION_STRATEGIES = ("indexed", "exhaustive", "cdist")
+_MISSING = object()
+
+# (alias_key, score, start, end, text) — компактное представление упоминания,
+# которое дёшево передавать между процессами.
+_MentionSpan = tuple[str, float, int, int, str]
 
 
 @dataclass(slots=True, frozen=True)
@@ -26,6 +43,20 @@ class FilmMention:
     end: int
 
 
+@dataclass(slots=True, frozen=True)
+class _DetectorView:
+    """Согласованный набор структур детектора для одной версии каталога."""
+
+    catalogue: AliasCatalogue
+    index: AliasCandidateIndex | None
+    phrase_cache: LRUCache[str, tuple[str, float] | None]
+    candidates: CandidateFilter
+
+    @property
+    def alias_keys(self) -> tuple[str, ...]:
+        return self.catalogue.alias_keys
+
+
 class FilmMentionDetector:
     """Находит упоминания фильмов с использованием алиасов и размытого поиска."""
 
@@ -34,67 +65,360 @@ class FilmMentionDetector:
         resolver: FilmAliasResolver | None = None,
         *,
         config: FilmAliasConfig | None = None,
+        index: AliasCandidateIndex | None = None,
     ) -> None:
         self.resolver = resolver or FilmAliasResolver(config)
-        if not self.resolver.aliases:
-            self.resolver.load()
-        self._alias_keys: Sequence[str] = tuple(self.resolver.aliases)
         self._threshold = self.resolver.config.match_threshold
-        self._max_window = self.resolver.max_alias_tokens
+        strategy = self.resolver.config.detection_strategy
+        if strategy not in _DETECTION_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия детекции: {strategy}")
+        self._strategy = strategy
+        self._view: _DetectorView | None = None
+        self.metrics: PipelineMetrics | NullMetrics = NULL_METRICS
+        if strategy == "indexed" and index is not None:
+            # Готовый индекс (например, из ArtifactRegistry) подключается, только
+            # если он построен для тех же ключей и порога.
+            self.resolver.attach_index(index)
+        self._current_view()
+
+    def _current_view(self) -> _DetectorView:
+        """Структуры для текущего снимка каталога резолвера.
+
+        Каталог может смениться между вызовами (`add_film`, горячая
+        перезагрузка), поэтому каждый проход детекции берёт снимок один раз и
+        работает только с ним.
+        """
+
+        catalogue = self.resolver.catalogue
+        view = self._view
+        if view is not None and view.catalogue is catalogue:
+            return view
+        phrase_cache = (
+            view.phrase_cache
+            if view is not None and view.catalogue.version == catalogue.version
+            else LRUCache(self.resolver.config.detection_cache_size)
+        )
+        index = self.resolver.candidate_index(catalogue) if self._strategy == "indexed" else None
+        candidates = (
+            view.candidates
+            if view is not None and view.catalogue.version == catalogue.version
+            else CandidateFilter(catalogue.alias_keys, self.resolver.config)
+        )
+        view = _DetectorView(
+            catalogue=catalogue, index=index, phrase_cache=phrase_cache, candidates=candidates
+        )
+        self._view = view
+        return view
+
+    @property
+    def index(self) -> AliasCandidateIndex | None:
+        return self._current_view().index
+
+    def _best_alias(self, view: _DetectorView, phrase: str) -> tuple[str, float] | None:
+        """Лучший алиас для фразы или None, если порог не достигнут."""
+
+        alias_keys = view.alias_keys
+        if view.index is None:
+            best_match = process.extractOne(phrase, alias_keys, scorer=fuzz.WRatio)
+            if not best_match or best_match[1] < self._threshold:
+                return None
+            return best_match[0], best_match[1]
+
+        position = view.index.exact(phrase)
+        if position is not None:
+            # WRatio даёт 100 только для идентичных строк, ключи алиасов уникальны.
+            return alias_keys[position], 100.0
+        candidates = view.index.candidates(phrase)
+        self.metrics.increment("film_fuzzy_comparisons", candidates.size)
+        if candidates.size == 0:
+            return None
+        best_match = process.extractOne(
+            phrase,
+            [alias_keys[idx] for idx in candidates],
+            scorer=fuzz.WRatio,
+            score_cutoff=self._threshold,
+        )
+        if not best_match:
+            return None
+        return best_match[0], best_match[1]
+
+    def _best_aliases_cdist(
+        self, view: _DetectorView, phrases: Sequence[str]
+    ) -> dict[str, tuple[str, float] | None]:
+        """Оценивает все фразы одним матричным вызовом `process.cdist`.
 
-    def detect(self, text: str) -> list[FilmMention]:
-        """Извлекает упоминания фильмов из произвольного текста."""
+        Матрица считается блоками по строкам, чтобы её размер не зависел от
+        объёма корпуса. `argmax` выбирает первый максимум в строке — тот же
+        алиас, что вернул бы `extractOne` при полном переборе.
+        """
 
-        tokens: list[tuple[str, int, int, str]] = []
+        alias_keys = view.alias_keys
+        results: dict[str, tuple[str, float] | None] = {}
+        if not alias_keys:
+            return dict.fromkeys(phrases)
+        rows_per_block = max(1, _CDIST_MAX_CELLS // len(alias_keys))
+        for offset in range(0, len(phrases), rows_per_block):
+            block = phrases[offset : offset + rows_per_block]
+            scores = process.cdist(
+                block,
+                alias_keys,
+                scorer=fuzz.WRatio,
+                score_cutoff=self._threshold,
+                dtype=np.float64,
+                workers=-1,
+            )
+            best_positions = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(block)), best_positions]
+            for phrase, position, score in zip(block, best_positions, best_scores):
+                results[phrase] = (
+                    (alias_keys[position], float(score)) if score >= self._threshold else None
+                )
+        return results
+
+    def _score_phrases(
+        self, view: _DetectorView, phrases: Iterable[str]
+    ) -> dict[str, tuple[str, float] | None]:
+        # Короткие служебные фразы повторяются в постах — считаем каждую один раз,
+        # а частые фразы запоминаем между постами в ограниченном LRU-кэше.
+        scored: dict[str, tuple[str, float] | None] = {}
+        missing: list[str] = []
+        for phrase in dict.fromkeys(phrases):
+            cached = view.phrase_cache.get(phrase, _MISSING)
+            if cached is _MISSING:
+                missing.append(phrase)
+            else:
+                scored[phrase] = cached
+        metrics = self.metrics
+        metrics.increment("film_phrase_cache_hits", len(scored))
+        metrics.increment("film_phrases_scored", len(missing))
+        if self._strategy == "cdist":
+            computed = self._best_aliases_cdist(view, missing)
+        else:
+            computed = {phrase: self._best_alias(view, phrase) for phrase in missing}
+        if self._strategy != "indexed":
+            metrics.increment("film_fuzzy_comparisons", len(missing) * len(view.alias_keys))
+        for phrase, best_match in computed.items():
+            view.phrase_cache.put(phrase, best_match)
+        scored.update(computed)
+        return scored
+
+    @staticmethod
+    def _tokens(text: str) -> list[Token]:
+        """Токены поста как `(start, end, normalized)`; нормализация — через кэш `normalize_token`."""
+
+        tokens: list[Token] = []
         for match in _WORD_RE.finditer(text):
-            original = match.group(0)
-            normalized = normalize_text(original)
-            if not normalized:
-                continue
-            tokens.append((original, match.start(), match.end(), normalized))
+            normalized = normalize_token(match.group(0))
+            if normalized:
+                tokens.append((match.start(), match.end(), normalized))
+        return tokens
 
-        mentions: dict[tuple[int, int], FilmMention] = {}
-        total_tokens = len(tokens)
-        if total_tokens == 0:
-            return []
+    @staticmethod
+    def _token_windows(tokens: Sequence[Token], max_window: int) -> list[TokenWindow]:
+        """Все окна токенов как `(normalized_phrase, first, last)`.
+
+        Фраза каждого следующего окна получается дописыванием одного токена к
+        предыдущей.
+        """
 
-        for start_idx in range(total_tokens):
-            for window in range(1, self._max_window + 1):
-                end_idx = start_idx + window
-                if end_idx > total_tokens:
-                    break
-                normalized_phrase = " ".join(t[3] for t in tokens[start_idx:end_idx])
-                if len(normalized_phrase) < 2:
+        windows: list[TokenWindow] = []
+        total_tokens = len(tokens)
+        for start_idx, (_, _, phrase) in enumerate(tokens):
+            for end_idx in range(start_idx, min(start_idx + max_window, total_tokens)):
+                if end_idx > start_idx:
+                    phrase = f"{phrase} {tokens[end_idx][2]}"
+                if len(phrase) < 2:
                     continue
-                best_match = process.extractOne(
-                    normalized_phrase,
-                    self._alias_keys,
-                    scorer=fuzz.WRatio,
+                windows.append((phrase, start_idx, end_idx))
+        return windows
+
+    def _windows(
+        self,
+        view: _DetectorView,
+        text: str,
+        entities: Sequence[Entity] | None = None,
+    ) -> list[tuple[str, int, int]]:
+        """Окна-кандидаты поста как `(normalized_phrase, start, end)` в символах.
+
+        При `FilmAliasConfig.candidate_mode != "all"` окна проходят через
+        `CandidateFilter` (см. `ml.candidates`).
+        """
+
+        tokens = self._tokens(text)
+        windows = self._token_windows(tokens, view.catalogue.max_alias_tokens)
+        if view.candidates.enabled:
+            total = len(windows)
+            windows, fallback = view.candidates.select(text, tokens, windows, entities)
+            self.metrics.increment("film_candidate_windows_pruned", total - len(windows))
+            self.metrics.increment("film_candidate_fallbacks", int(fallback))
+        return [(phrase, tokens[first][0], tokens[last][1]) for phrase, first, last in windows]
+
+    @staticmethod
+    def _collect_spans(
+        text: str,
+        windows: Sequence[tuple[str, int, int]],
+        scored: dict[str, tuple[str, float] | None],
+    ) -> list[_MentionSpan]:
+        spans: dict[tuple[int, int], _MentionSpan] = {}
+        for normalized_phrase, original_start, original_end in windows:
+            best_match = scored[normalized_phrase]
+            if best_match is None:
+                continue
+            alias_key, score = best_match
+            span_key = (original_start, original_end)
+            prev_span = spans.get(span_key)
+            if prev_span is None or prev_span[1] < score:
+                spans[span_key] = (
+                    alias_key,
+                    float(score),
+                    original_start,
+                    original_end,
+                    text[original_start:original_end],
                 )
-                if not best_match:
-                    continue
-                alias_key, score, _ = best_match
-                if score < self._threshold:
-                    continue
-                film = self.resolver.film_for_alias(alias_key)
-                original_start = tokens[start_idx][1]
-                original_end = tokens[end_idx - 1][2]
-                mention_text = text[original_start:original_end]
-                new_mention = FilmMention(
-                    film=film,
-                    text=mention_text,
-                    score=float(score),
-                    start=original_start,
-                    end=original_end,
+
+        return sorted(spans.values(), key=lambda item: (item[2], -item[1]))
+
+    def _detect_spans(
+        self,
+        text: str,
+        view: _DetectorView | None = None,
+        entities: Sequence[Entity] | None = None,
+    ) -> list[_MentionSpan]:
+        """Находит упоминания в виде компактных спанов."""
+
+        view = view or self._current_view()
+        windows = self._windows(view, text, entities)
+        self.metrics.increment("film_posts")
+        self.metrics.increment("film_windows", len(windows))
+        if not windows:
+            return []
+        scored = self._score_phrases(view, (phrase for phrase, _, _ in windows))
+        return self._collect_spans(text, windows, scored)
+
+    def _detect_spans_batch(
+        self, texts: Sequence[str], entities: Sequence[Sequence[Entity] | None] | None = None
+    ) -> list[list[_MentionSpan]]:
+        """Собирает окна всех постов и оценивает их за один проход."""
+
+        view = self._current_view()
+        windows_per_text = [
+            self._windows(view, text, post_entities)
+            for text, post_entities in zip(texts, entities if entities is not None else repeat(None))
+        ]
+        self.metrics.increment("film_posts", len(texts))
+        self.metrics.increment("film_windows", sum(map(len, windows_per_text)))
+        scored = self._score_phrases(
+            view, (phrase for windows in windows_per_text for phrase, _, _ in windows)
+        )
+        return [
+            self._collect_spans(text, windows, scored)
+            for text, windows in zip(texts, windows_per_text)
+        ]
+
+    def _to_mentions(
+        self, spans: Sequence[_MentionSpan], catalogue: AliasCatalogue | None = None
+    ) -> list[FilmMention]:
+        # Спаны из воркера могли быть найдены по более старому каталогу:
+        # алиасы удалённых с тех пор фильмов пропускаются.
+        catalogue = catalogue or self.resolver.catalogue
+        mentions: list[FilmMention] = []
+        for alias_key, score, start, end, mention_text in spans:
+            film = catalogue.film_for_alias(alias_key)
+            if film is not None:
+                mentions.append(
+                    FilmMention(film=film, text=mention_text, score=score, start=start, end=end)
                 )
-                span_key = (original_start, original_end)
-                prev_mention = mentions.get(span_key)
-                if prev_mention is None or prev_mention.score < new_mention.score:
-                    mentions[span_key] = new_mention
+        return mentions
+
+    def detect(self, text: str, *, entities: Sequence[Entity] | None = None) -> list[FilmMention]:
+        """Извлекает упоминания фильмов из произвольного текста.
+
+        `entities` — сущности spaCy этого текста, подсказка для отбора
+        кандидатов (`FilmAliasConfig.candidate_cues`).
+        """
 
-        return sorted(mentions.values(), key=lambda item: (item.start, -item.score))
+        view = self._current_view()
+        return self._to_mentions(self._detect_spans(text, view, entities), view.catalogue)
+
+    def detect_batch(
+        self,
+        texts: Sequence[str],
+        *,
+        entities: Sequence[Sequence[Entity]] | None = None,
+        workers: int | None = None,
+        chunk_size: int | None = None,
+    ) -> list[list[FilmMention]]:
+        """Детектирует упоминания в корпусе, сохраняя порядок постов."""
+
+        return list(
+            self.iter_detect(texts, entities=entities, workers=workers, chunk_size=chunk_size)
+        )
+
+    def iter_detect(
+        self,
+        texts: Iterable[str],
+        *,
+        entities: Iterable[Sequence[Entity]] | None = None,
+        workers: int | None = None,
+        chunk_size: int | None = None,
+    ) -> Iterator[list[FilmMention]]:
+        """Лениво детектирует упоминания, распределяя посты по пулу процессов.
+
+        Воркеры получают детектор один раз: при `fork` он наследуется из
+        родительского процесса, иначе передаётся через инициализатор пула
+        (см. `parallel.pool_context`). В задачи уходят только тексты (и
+        сущности, если они переданы), обратно — компактные спаны.
+
+        Стратегия `cdist` параллелится внутри rapidfuzz, поэтому пул процессов
+        не используется: посты оцениваются блоками по `chunk_size`.
+        """
+
+        workers = workers if workers is not None else self.resolver.config.detection_workers
+        chunk_size = chunk_size or self.resolver.config.detection_chunk_size
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        posts = zip(texts, entities if entities is not None else repeat(None))
+        if self._strategy == "cdist":
+            for chunk in iter_batched(posts, chunk_size):
+                chunk_texts, chunk_entities = zip(*chunk)
+                for spans in self._detect_spans_batch(chunk_texts, chunk_entities):
+                    yield self._to_mentions(spans)
+            return
+        if workers == 1:
+            for text, post_entities in posts:
+                yield self.detect(text, entities=post_entities)
+            return
+
+        global _WORKER_DETECTOR
+        context = pool_context(self.resolver.config.detection_start_method, preload=[__name__])
+        if context.get_start_method() == "fork":
+            _WORKER_DETECTOR = self
+            pool = context.Pool(workers)
+        else:
+            pool = context.Pool(workers, initializer=_init_worker, initargs=(self,))
+        try:
+            for spans in pool.imap(_detect_spans_in_worker, posts, chunksize=chunk_size):
+                yield self._to_mentions(spans)
+        finally:
+            pool.terminate()
+            pool.join()
+            _WORKER_DETECTOR = None
 
     def any_match(self, text: str) -> bool:
         """Быстрая проверка наличия упоминания фильма."""
 
         return bool(self.detect(text))
+
+
+_WORKER_DETECTOR: FilmMentionDetector | None = None
+
+
+def _init_worker(detector: FilmMentionDetector) -> None:
+    global _WORKER_DETECTOR
+    _WORKER_DETECTOR = detector
+
+
+def _detect_spans_in_worker(post: tuple[str, Sequence[Entity] | None]) -> list[_MentionSpan]:
+    assert _WORKER_DETECTOR is not None, "Пул запущен без детектора"
+    text, entities = post
+    return _WORKER_DETECTOR._detect_spans(text, entities=entities)
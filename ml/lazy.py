@@ -0,0 +1,37 @@
+"""Ленивая загрузка атрибутов модулей (PEP 562).
+
+torch, spaCy, UMAP/numba, HDBSCAN и sklearn импортируются секундами и
+занимают сотни мегабайт. Процессам, которым нужны только алиасы или конфиг,
+они не нужны, поэтому пакет и тяжёлые модули отдают такие имена через
+модульный `__getattr__` и импортируют их при первом обращении.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from typing import Any, Callable, Mapping
+
+
+def lazy_getattr(module_name: str, attributes: Mapping[str, str]) -> Callable[[str], Any]:
+    """Возвращает `__getattr__` для модуля `module_name`.
+
+    `attributes` отображает имя в `"модуль"` или `"модуль:атрибут"`;
+    относительные пути разрешаются от пакета модуля. Загруженное значение
+    кэшируется в пространстве имён модуля, и повторные обращения идут мимо
+    `__getattr__`.
+    """
+
+    namespace = sys.modules[module_name].__dict__
+
+    def __getattr__(name: str) -> Any:
+        target = attributes.get(name)
+        if target is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        path, _, attribute = target.partition(":")
+        module = importlib.import_module(path, package=namespace.get("__package__"))
+        value = getattr(module, attribute) if attribute else module
+        namespace[name] = value
+        return value
+
+    return __getattr__
@@ -0,0 +1,393 @@
+"""Метрики и профилирование стадий конвейера.
+
+`PipelineMetrics` собирает по каждой стадии число вызовов и элементов,
+время (стеновое и процессорное), пик RSS и, по желанию, профиль cProfile или
+пик выделений tracemalloc; рядом копятся именованные счётчики (окна на пост,
+размытые сравнения, попадания в кэши). Выгрузка — JSON или текстовый формат
+Prometheus. Выключенный сбор — общий объект `NULL_METRICS`, у которого
+`stage` возвращает один и тот же пустой контекст, а `increment` ничего не
+делает, поэтому накладные расходы сводятся к вызову метода.
+"""
+
+from __future__ import annotations
+
+import bisect
+import io
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, Sequence
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if TYPE_CHECKING:
+    import cProfile
+
+_CAPTURE_MODES = (None, "cprofile", "tracemalloc")
+_STATUS_PATH = Path("/proc/self/status")
+_CLEAR_REFS_PATH = Path("/proc/self/clear_refs")
+
+
+@dataclass(slots=True, frozen=True)
+class StageSample:
+    """Один проход стадии — то, что получают наблюдатели."""
+
+    stage: str
+    items: int
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_bytes: int
+    traced_peak_bytes: int | None = None
+
+
+@dataclass(slots=True)
+class StageMetrics:
+    """Накопленные показатели стадии за все вызовы."""
+
+    calls: int = 0
+    items: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    traced_peak_bytes: int = 0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.wall_seconds if self.wall_seconds else 0.0
+
+    def add(self, sample: StageSample) -> None:
+        self.calls += 1
+        self.items += sample.items
+        self.wall_seconds += sample.wall_seconds
+        self.cpu_seconds += sample.cpu_seconds
+        self.peak_rss_bytes = max(self.peak_rss_bytes, sample.peak_rss_bytes)
+        if sample.traced_peak_bytes is not None:
+            self.traced_peak_bytes = max(self.traced_peak_bytes, sample.traced_peak_bytes)
+
+
+StageObserver = Callable[[StageSample], None]
+
+
+def _read_hwm() -> int | None:
+    """VmHWM из /proc в байтах или None вне Linux."""
+
+    try:
+        with _STATUS_PATH.open("rb") as fp:
+            for line in fp:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _reset_hwm() -> bool:
+    """Сбрасывает VmHWM процесса до текущего RSS (Linux 4.0+)."""
+
+    try:
+        with _CLEAR_REFS_PATH.open("w") as fp:
+            fp.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_bytes() -> int:
+    """Пик RSS процесса; после `_reset_hwm` — пик с момента сброса."""
+
+    hwm = _read_hwm()
+    if hwm is not None:
+        return hwm
+    if resource is None:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss — килобайты в Linux и байты в macOS.
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: object) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullMetrics:
+    """Выключенный сбор метрик: все операции — пустые."""
+
+    __slots__ = ()
+    enabled = False
+
+    def stage(self, name: str, items: int = 0) -> _NullStage:
+        return _NULL_STAGE
+
+    def increment(self, name: str, value: int = 1) -> None:
+        return None
+
+    def record(self, sample: StageSample) -> None:
+        return None
+
+    def __reduce__(self) -> str:
+        return "NULL_METRICS"
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _null_metrics() -> NullMetrics:
+    return NULL_METRICS
+
+
+class PipelineMetrics:
+    """Сборщик метрик стадий и счётчиков.
+
+    `capture="cprofile"` профилирует каждую стадию отдельным `cProfile.Profile`
+    (см. `profile_stats`, `dump_profiles`), `capture="tracemalloc"` записывает
+    пик выделений Python за проход стадии. Захват включается только для
+    внешней стадии, если стадии вложены: профилировщик в процессе один.
+
+    Пик RSS — VmHWM, сбрасываемый в начале стадии, где это позволяет ядро;
+    иначе это пик процесса с момента запуска. При передаче в процессы-воркеры
+    (пулы NER и детекции) сборщик заменяется на `NULL_METRICS`: счётчики
+    воркеров не суммируются, замеряется только стадия в целом.
+    """
+
+    enabled = True
+
+    def __init__(
+        self, *, capture: str | None = None, observers: Sequence[StageObserver] = ()
+    ) -> None:
+        if capture not in _CAPTURE_MODES:
+            raise ValueError(f"Неизвестный режим захвата: {capture}")
+        self.capture = capture
+        self.observers: list[StageObserver] = list(observers)
+        self.stages: dict[str, StageMetrics] = {}
+        self.counters: dict[str, int] = {}
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+        self._capturing = False
+
+    def __reduce__(self) -> tuple[Callable[[], NullMetrics], tuple[()]]:
+        return _null_metrics, ()
+
+    def add_observer(self, observer: StageObserver) -> None:
+        self.observers.append(observer)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[None]:
+        """Замеряет блок как один вызов стадии `name` над `items` элементами."""
+
+        capture = None
+        with self._lock:
+            if self.capture is not None and not self._capturing:
+                self._capturing = True
+                capture = self.capture
+        profile = None
+        if capture == "cprofile":
+            import cProfile
+
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+        elif capture == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _reset_hwm()
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+            traced = tracemalloc.get_traced_memory()[1] if capture == "tracemalloc" else None
+            sample = StageSample(
+                stage=name,
+                items=items,
+                wall_seconds=wall,
+                cpu_seconds=cpu,
+                peak_rss_bytes=peak_rss_bytes(),
+                traced_peak_bytes=traced,
+            )
+            with self._lock:
+                if capture is not None:
+                    self._capturing = False
+            self.record(sample)
+
+    def record(self, sample: StageSample) -> None:
+        """Добавляет проход стадии, замеренный вне `stage` (в воркере пула или потоке)."""
+
+        with self._lock:
+            self.stages.setdefault(sample.stage, StageMetrics()).add(sample)
+        for observer in self.observers:
+            observer(sample)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+            self._profiles.clear()
+
+    def profile_stats(self, name: str, *, limit: int = 30, sort: str = "cumulative") -> str:
+        """Текстовый отчёт cProfile по стадии."""
+
+        profile = self._profiles.get(name)
+        if profile is None:
+            raise KeyError(f"Нет профиля стадии {name!r} (capture={self.capture!r})")
+        import pstats
+
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def dump_profiles(self, directory: Path) -> list[Path]:
+        """Сохраняет профили стадий как `.prof` (для snakeviz, pstats)."""
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name, profile in self._profiles.items():
+            path = directory / f"{name.replace('/', '.')}.prof"
+            profile.dump_stats(os.fspath(path))
+            paths.append(path)
+        return paths
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            stages = {
+                name: {**asdict(stage), "items_per_second": stage.items_per_second}
+                for name, stage in self.stages.items()
+            }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def to_json(self, *, indent: int | None = 2) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self, *, prefix: str = "ml") -> str:
+        """Текстовый формат экспозиции Prometheus."""
+
+        snapshot = self.snapshot()
+        stages: dict[str, dict[str, float]] = snapshot["stages"]
+        metrics = (
+            ("stage_calls_total", "counter", "calls", "Вызовы стадии"),
+            ("stage_items_total", "counter", "items", "Обработанные элементы"),
+            ("stage_wall_seconds_total", "counter", "wall_seconds", "Стеновое время стадии"),
+            ("stage_cpu_seconds_total", "counter", "cpu_seconds", "Процессорное время стадии"),
+            ("stage_peak_rss_bytes", "gauge", "peak_rss_bytes", "Пик RSS за проход стадии"),
+            ("stage_traced_peak_bytes", "gauge", "traced_peak_bytes", "Пик выделений tracemalloc"),
+        )
+        lines: list[str] = []
+        for suffix, kind, key, help_text in metrics:
+            if key == "traced_peak_bytes" and self.capture != "tracemalloc":
+                continue
+            name = f"{prefix}_{suffix}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [
+                f'{name}{{stage="{escape_label(stage)}"}} {values[key]}' for stage, values in stages.items()
+            ]
+        name = f"{prefix}_events_total"
+        lines += [f"# HELP {name} Счётчики событий стадий", f"# TYPE {name} counter"]
+        lines += [
+            f'{name}{{event="{escape_label(event)}"}} {value}'
+            for event, value in snapshot["counters"].items()
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(label: str) -> str:
+    """Значение метки в формате экспозиции Prometheus."""
+
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Верхние границы корзин гистограммы задержек, секунды.
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0,
+)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами, как у Prometheus.
+
+    Квантили оцениваются линейной интерполяцией внутри корзины, поэтому их
+    точность ограничена шириной корзины; значения больше последней границы
+    попадают в `+Inf` и оцениваются последней границей.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self) -> dict[str, float]:
+        """Число наблюдений, среднее и квантили в миллисекундах."""
+
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            **{f"p{int(q * 100)}_ms": self.quantile(q) * 1000 for q in (0.5, 0.95, 0.99)},
+        }
+
+    def to_prometheus(self, name: str, labels: str = "") -> list[str]:
+        """Строки `_bucket`/`_sum`/`_count` для метрики `name` с метками `labels`."""
+
+        with self._lock:
+            counts = list(self.counts)
+            total, total_sum = self.count, self.sum
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines += [f"{name}_sum{suffix} {total_sum}", f"{name}_count{suffix} {total}"]
+        return lines
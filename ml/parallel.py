@@ -0,0 +1,26 @@
+"""Выбор способа запуска пулов процессов для CPU-bound стадий."""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+from multiprocessing.context import BaseContext
+from typing import Sequence
+
+
+def pool_context(start_method: str | None = None, *, preload: Sequence[str] = ()) -> BaseContext:
+    """Контекст multiprocessing для пулов конвейера.
+
+    По умолчанию используется `forkserver` (или `spawn`, где его нет): `fork`
+    процесса, в котором уже работали потоки numba/OpenMP (UMAP) или torch,
+    может зависнуть. Сервер сам форкается до появления этих потоков, а модули
+    из `preload` импортируются в нём один раз и наследуются воркерами.
+    `fork` остаётся доступным явно — тогда воркеры наследуют состояние
+    родителя без сериализации.
+    """
+
+    if start_method is None:
+        start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+    context = mp.get_context(start_method)
+    if start_method == "forkserver" and preload:
+        context.set_forkserver_preload(list(preload))
+    return context
@@ -2,16 +2,26 @@
 
 from __future__ import annotations
 
+import json
+import tempfile
+from collections import deque
 from dataclasses import dataclass
-from typing import Sequence
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
 
 import numpy as np
 
+from .alias_index import AliasCandidateIndex
 from .aliases import FilmAliasResolver
 from .config import PipelineConfig
+from .dedup import DuplicateGroups, MinHashDeduplicator, relocate_spans
+from .embedding_store import EmbeddingStore
 from .embeddings import EmbeddingGenerator
 from .entity_extraction import Entity, EntityExtractor
 from .film_detection import FilmMention, FilmMentionDetector
+from .metrics import NULL_METRICS, NullMetrics, PipelineMetrics
+from .preprocessing import iter_batched
+from .scheduler import StageScheduler
 from .topic_detection import TopicClusterer, TopicClusteringResult
 
 
@@ -20,13 +30,31 @@ class PostAnalysis:
     text: str
     entities: list[Entity]
     film_mentions: list[FilmMention]
-    embedding: np.ndarray
+    # Собственный вектор; None, если эмбеддинг — строка `row` хранилища `store`.
+    embedding: np.ndarray | None = None
+    store: EmbeddingStore | None = None
+    row: int = -1
+
+    @property
+    def vector(self) -> np.ndarray:
+        """Эмбеддинг поста: собственный или восстановленный из `store` (float32)."""
+
+        if self.embedding is not None:
+            return self.embedding
+        if self.store is None:
+            raise ValueError("У поста нет эмбеддинга")
+        return self.store.vector(self.row)
 
 
 @dataclass(slots=True)
 class AnalysisResult:
     posts: list[PostAnalysis]
     clustering: TopicClusteringResult | None
+    # Группы почти-дубликатов, если включён `PipelineConfig.dedup`.
+    duplicates: DuplicateGroups | None = None
+    # Квантованные эмбеддинги постов, если включён `PipelineConfig.store`:
+    # посты и `clustering.embeddings` ссылаются на него, а не держат float-копии.
+    embeddings: EmbeddingStore | None = None
 
     def find_posts_by_topic(self, label: int) -> list[PostAnalysis]:
         if not self.clustering:
@@ -35,21 +63,163 @@ class AnalysisResult:
         return [self.posts[idx] for idx in indices]
 
 
+class AnalysisStream:
+    """Потоковый анализ корпуса, который не помещается в память.
+
+    Итерация выдаёт `PostAnalysis` по мере обработки чанков. Эмбеддинги
+    дописываются в файл `embeddings_path` (сырые float32), тексты — в соседний
+    `.texts.jsonl`. После исчерпания итератора доступны `embeddings` (memmap) и,
+    если запрошено, `clustering`, посчитанный один раз по всему корпусу.
+    Поток одноразовый: вход может быть генератором, а файлы перезаписываются,
+    поэтому повторная итерация — ошибка, а не пересчёт.
+    """
+
+    def __init__(
+        self,
+        pipeline: AnalysisPipeline,
+        texts: Iterable[str],
+        *,
+        chunk_size: int,
+        embeddings_path: Path | None,
+        cluster: bool,
+    ) -> None:
+        self._pipeline = pipeline
+        self._texts = texts
+        self._chunk_size = chunk_size
+        self._cluster = cluster
+        self._tmpdir: tempfile.TemporaryDirectory[str] | None = None
+        if embeddings_path is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="ml-stream-")
+            embeddings_path = Path(self._tmpdir.name) / "embeddings.f32"
+        self.embeddings_path = Path(embeddings_path)
+        self.texts_path = self.embeddings_path.with_suffix(".texts.jsonl")
+        self.count = 0
+        self.embeddings: np.memmap | None = None
+        self.store: EmbeddingStore | None = None
+        self.clustering: TopicClusteringResult | None = None
+        self._started = False
+
+    def __iter__(self) -> Iterator[PostAnalysis]:
+        if self._started:
+            raise RuntimeError("AnalysisStream можно пройти только один раз; вызовите analyze_stream заново")
+        self._started = True
+        return self._iterate()
+
+    def _iterate(self) -> Iterator[PostAnalysis]:
+        dimension = 0
+        with self.embeddings_path.open("wb") as embeddings_fp, self.texts_path.open(
+            "w", encoding="utf-8"
+        ) as texts_fp:
+            for posts, embeddings in self._pipeline._iter_chunks(self._texts, self._chunk_size):
+                np.ascontiguousarray(embeddings, dtype=np.float32).tofile(embeddings_fp)
+                for post in posts:
+                    texts_fp.write(json.dumps(post.text, ensure_ascii=False) + "\n")
+                dimension = embeddings.shape[1]
+                self.count += len(posts)
+                yield from posts
+
+        if self.count:
+            self.embeddings = np.memmap(
+                self.embeddings_path, dtype=np.float32, mode="r", shape=(self.count, dimension)
+            )
+        if self._cluster and self.count > 1 and self.embeddings is not None:
+            with self.texts_path.open("r", encoding="utf-8") as fp:
+                texts = [json.loads(line) for line in fp]
+            with self._pipeline.metrics.stage("topics/cluster", self.count):
+                self.clustering = self._pipeline.topic_clusterer.cluster(texts, self.embeddings)
+        if self._pipeline.config.store.enabled and self.embeddings is not None:
+            self.store = self._pipeline._build_store(self.embeddings)
+
+    def close(self) -> None:
+        """Освобождает memmap и удаляет временные файлы, если путь не задан."""
+
+        self.embeddings = None
+        self.store = None
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def __enter__(self) -> AnalysisStream:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
 class AnalysisPipeline:
     """Оркеструет извлечение сущностей, фильмов, эмбеддинги и тематики."""
 
-    def __init__(self, config: PipelineConfig | None = None) -> None:
+    def __init__(
+        self,
+        config: PipelineConfig | None = None,
+        *,
+        alias_resolver: FilmAliasResolver | None = None,
+        alias_index: AliasCandidateIndex | None = None,
+        topic_clusterer: TopicClusterer | None = None,
+        metrics: PipelineMetrics | NullMetrics | None = None,
+    ) -> None:
         self.config = config or PipelineConfig()
-        self.alias_resolver = FilmAliasResolver(self.config.aliases)
+        self.alias_resolver = alias_resolver or FilmAliasResolver(self.config.aliases)
         self.entity_extractor = EntityExtractor(self.config.entities)
         self.embedder = EmbeddingGenerator(self.config.embedding)
-        self.topic_clusterer = TopicClusterer(self.config.topics)
-        self.film_detector = FilmMentionDetector(self.alias_resolver)
+        self.topic_clusterer = topic_clusterer or TopicClusterer(self.config.topics)
+        self.film_detector = FilmMentionDetector(self.alias_resolver, index=alias_index)
+        if metrics is None and self.config.metrics.enabled:
+            metrics = PipelineMetrics(capture=self.config.metrics.capture)
+        self.metrics = metrics or NULL_METRICS
+        self.film_detector.metrics = self.metrics
+        self.embedder.metrics = self.metrics
+        self.deduplicator = MinHashDeduplicator(self.config.dedup) if self.config.dedup.enabled else None
 
-    def analyze(self, texts: Sequence[str], *, cluster: bool = True) -> AnalysisResult:
-        entities_per_post = self.entity_extractor.extract_batch(texts)
-        film_mentions_per_post = [self.film_detector.detect(text) for text in texts]
-        embeddings = self.embedder.embed(texts)
+    def _group_duplicates(self, texts: Sequence[str]) -> DuplicateGroups:
+        assert self.deduplicator is not None
+        with self.metrics.stage("dedup/group", len(texts)):
+            groups = self.deduplicator.group(texts)
+        self.metrics.increment("dedup_posts", len(texts))
+        self.metrics.increment("dedup_duplicates", groups.duplicates)
+        return groups
+
+    @staticmethod
+    def _fan_out(
+        texts: Sequence[str], groups: DuplicateGroups, posts: list[PostAnalysis], embeddings: np.ndarray
+    ) -> tuple[list[PostAnalysis], np.ndarray]:
+        """Раздаёт результаты представителей (`posts`, `embeddings`) всем членам групп.
+
+        Точным копиям достаются те же сущности и упоминания; у почти-дубликатов
+        спаны переносятся в их текст через `relocate_spans`, а эмбеддинг берётся
+        у представителя.
+        """
+
+        rows = np.empty(len(texts), dtype=np.int64)
+        rows[groups.unique] = np.arange(len(groups.unique))
+        rows = rows[groups.representatives]
+        expanded = embeddings[rows]
+        result: list[PostAnalysis] = []
+        for idx, text in enumerate(texts):
+            source = posts[rows[idx]]
+            if groups.exact[idx]:
+                entities, mentions = list(source.entities), list(source.film_mentions)
+            else:
+                entities = relocate_spans(source.entities, source.text, text)
+                mentions = relocate_spans(source.film_mentions, source.text, text)
+            result.append(
+                PostAnalysis(text=text, entities=entities, film_mentions=mentions, embedding=expanded[idx])
+            )
+        return result, expanded
+
+    def _analyze_deduplicated(self, texts: Sequence[str]) -> tuple[list[PostAnalysis], np.ndarray]:
+        groups = self._group_duplicates(texts)
+        posts, embeddings = self._analyze_chunk([texts[idx] for idx in groups.unique])
+        return self._fan_out(texts, groups, posts, embeddings)
+
+    def _analyze_chunk(self, texts: Sequence[str]) -> tuple[list[PostAnalysis], np.ndarray]:
+        metrics = self.metrics
+        with metrics.stage("entities/extract_batch", len(texts)):
+            entities_per_post = self.entity_extractor.extract_batch(texts)
+        with metrics.stage("films/detect", len(texts)):
+            film_mentions_per_post = self.film_detector.detect_batch(texts, entities=entities_per_post)
+        with metrics.stage("embeddings/embed", len(texts)):
+            embeddings = self.embedder.embed(texts)
         posts = [
             PostAnalysis(
                 text=text,
@@ -61,7 +231,99 @@ class AnalysisPipeline:
                 zip(texts, entities_per_post, film_mentions_per_post)
             )
         ]
-        clustering = (
-            self.topic_clusterer.cluster(texts, embeddings) if cluster and len(texts) > 1 else None
+        return posts, embeddings
+
+    def _iter_scheduled_deduplicated(
+        self, scheduler: StageScheduler, texts: Iterable[str], chunk_size: int
+    ) -> Iterator[tuple[list[PostAnalysis], np.ndarray]]:
+        """Планировщик над представителями групп дубликатов каждого чанка входа.
+
+        Планировщик нарезает поток представителей на свои чанки, поэтому его
+        результаты копятся в буфере и раздаются группам чанка входа, как только
+        готовы все представители этого чанка.
+        """
+
+        grouped: deque[tuple[list[str], DuplicateGroups]] = deque()
+
+        def representatives() -> Iterator[str]:
+            for chunk in iter_batched(texts, chunk_size):
+                groups = self._group_duplicates(chunk)
+                grouped.append((chunk, groups))
+                for idx in groups.unique:
+                    yield chunk[idx]
+
+        posts: list[PostAnalysis] = []
+        embeddings: list[np.ndarray] = []
+        for chunk_posts, chunk_embeddings in scheduler.iter_chunks(representatives(), chunk_size=chunk_size):
+            posts.extend(chunk_posts)
+            embeddings.append(chunk_embeddings)
+            while grouped and len(posts) >= len(grouped[0][1].unique):
+                chunk, groups = grouped.popleft()
+                count = len(groups.unique)
+                stacked = np.vstack(embeddings)
+                yield self._fan_out(chunk, groups, posts[:count], stacked[:count])
+                posts, embeddings = posts[count:], [stacked[count:]]
+
+    def _iter_chunks(
+        self, texts: Iterable[str], chunk_size: int
+    ) -> Iterator[tuple[list[PostAnalysis], np.ndarray]]:
+        # В потоке дубликаты ищутся внутри чанка, группы между чанками не сводятся.
+        if self.config.scheduler.enabled:
+            scheduler = StageScheduler(self, self.config.scheduler)
+            # Стадии планировщика замеряются в задачах и сводятся в self.metrics.
+            if self.deduplicator is None:
+                yield from scheduler.iter_chunks(texts, chunk_size=chunk_size)
+            else:
+                yield from self._iter_scheduled_deduplicated(scheduler, texts, chunk_size)
+            return
+        analyze_chunk = self._analyze_chunk if self.deduplicator is None else self._analyze_deduplicated
+        for chunk in iter_batched(texts, chunk_size):
+            yield analyze_chunk(chunk)
+
+    def _build_store(self, embeddings: np.ndarray) -> EmbeddingStore:
+        config = self.config.store
+        with self.metrics.stage("embeddings/quantize", len(embeddings)):
+            return EmbeddingStore.build(embeddings, dtype=config.dtype, path=config.path)
+
+    def analyze(self, texts: Sequence[str], *, cluster: bool = True) -> AnalysisResult:
+        groups = self._group_duplicates(texts) if self.deduplicator is not None and texts else None
+        unique = texts if groups is None else [texts[idx] for idx in groups.unique]
+        if self.config.scheduler.enabled and unique:
+            scheduler = StageScheduler(self, self.config.scheduler)
+            chunks = list(scheduler.iter_chunks(unique))
+            posts = [post for chunk_posts, _ in chunks for post in chunk_posts]
+            embeddings = np.vstack([chunk_embeddings for _, chunk_embeddings in chunks])
+        else:
+            posts, embeddings = self._analyze_chunk(unique)
+        if groups is not None:
+            posts, embeddings = self._fan_out(texts, groups, posts, embeddings)
+        clustering = None
+        if cluster and len(texts) > 1:
+            with self.metrics.stage("topics/cluster", len(texts)):
+                clustering = self.topic_clusterer.cluster(texts, embeddings)
+        store = None
+        if self.config.store.enabled and texts:
+            store = self._build_store(embeddings)
+            for row, post in enumerate(posts):
+                post.embedding, post.store, post.row = None, store, row
+            if clustering is not None:
+                clustering.embeddings = store
+        return AnalysisResult(posts=posts, clustering=clustering, duplicates=groups, embeddings=store)
+
+    def analyze_stream(
+        self,
+        texts: Iterable[str],
+        *,
+        chunk_size: int = 256,
+        embeddings_path: Path | None = None,
+        cluster: bool = False,
+    ) -> AnalysisStream:
+        """Анализирует поток текстов чанками по `chunk_size` постов."""
+
+        return AnalysisStream(
+            self,
+            texts,
+            chunk_size=chunk_size,
+            embeddings_path=embeddings_path,
+            cluster=cluster,
         )
-        return AnalysisResult(posts=posts, clustering=clustering)
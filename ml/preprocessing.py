@@ -3,11 +3,18 @@
 from __future__ import annotations
 
 import re
+import sys
 import unicodedata
-from typing import Iterable
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
 
 _NON_ALPHANUMERIC_RE = re.compile(r"[^\w\s]", flags=re.UNICODE)
 _MULTISPACE_RE = re.compile(r"\s{2,}")
+# Размер LRU-кэша `normalize_token`: словарь постов редко превышает это число слов.
+_TOKEN_CACHE_SIZE = 1 << 16
+
+T = TypeVar("T")
 
 
 def strip_accents(text: str) -> str:
@@ -39,16 +46,28 @@ def normalize_text(text: str, *, keep_case: bool = False) -> str:
     return cleaned.strip()
 
 
+@lru_cache(maxsize=_TOKEN_CACHE_SIZE)
+def normalize_token(token: str) -> str:
+    """`normalize_text` для отдельных слов с ограниченным LRU-кэшем.
+
+    Слова в постах и алиасах повторяются постоянно, поэтому результат
+    запоминается и интернируется: одинаковые токены разделяют одну строку.
+    """
+
+    return sys.intern(normalize_text(token))
+
+
+def iter_batched(iterable: Iterable[T], batch_size: int) -> Iterator[list[T]]:
+    """Лениво выдаёт батчи фиксированного размера, не читая источник целиком."""
+
+    if batch_size < 1:
+        raise ValueError("batch_size должен быть положительным")
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
 def batched(iterable: Iterable[str], batch_size: int) -> list[list[str]]:
     """Разбивает последовательность строк на батчи фиксированного размера."""
 
-    batch: list[str] = []
-    result: list[list[str]] = []
-    for item in iterable:
-        batch.append(item)
-        if len(batch) == batch_size:
-            result.append(batch)
-            batch = []
-    if batch:
-        result.append(batch)
-    return result
+    return list(iter_batched(iterable, batch_size))
@@ -0,0 +1,176 @@
+"""Реестр снимков моделей и индексов для быстрого старта процессов.
+
+Холодный запуск тратит десятки секунд на загрузку SentenceTransformer и
+spaCy по имени, разбор и нормализацию JSON алиасов и переобучение тем.
+`ArtifactRegistry.snapshot` один раз сохраняет всё это в локальный каталог,
+а `load_pipeline` собирает конвейер из снимков: модели грузятся с диска,
+индекс алиасов — из pickle и `.npy` через mmap, модель тем — без обучения.
+
+Структура каталога::
+
+    manifest.json
+    embeddings/      # SentenceTransformer.save
+    spacy/           # Language.to_disk
+    aliases/         # FilmAliasResolver.save_index + AliasCandidateIndex.save
+    topics.pkl       # TopicClusterer.save
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable
+
+from .alias_index import AliasCandidateIndex
+from .aliases import FilmAliasResolver
+from .config import FilmAliasConfig, PipelineConfig
+from .topic_detection import TopicClusterer
+
+if TYPE_CHECKING:
+    from .pipeline import AnalysisPipeline
+
+COMPONENTS = ("embeddings", "entities", "aliases", "topics")
+
+
+def _aliases_fingerprint(config: FilmAliasConfig) -> dict[str, Any]:
+    """Признаки, при изменении которых снимок индекса алиасов устаревает."""
+
+    stat = Path(config.aliases_path).stat()
+    return {
+        "aliases_path": str(Path(config.aliases_path).resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "match_threshold": config.match_threshold,
+        "locale_priority": list(config.locale_priority),
+        "format": [FilmAliasResolver.INDEX_FORMAT, AliasCandidateIndex.FORMAT],
+    }
+
+
+def _topics_fingerprint(config: PipelineConfig, dimension: int | None) -> dict[str, Any]:
+    """Признаки, при изменении которых обученная модель тем неприменима."""
+
+    return {
+        "model_name": config.embedding.model_name,
+        "normalize_embeddings": config.embedding.normalize_embeddings,
+        "dimension": dimension,
+        "config_digest": hashlib.sha1(repr(config.topics).encode("utf-8")).hexdigest(),
+    }
+
+
+class ArtifactRegistry:
+    """Локальный каталог снимков артефактов ML-конвейера."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    def manifest(self) -> dict[str, dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return {}
+        return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _write_manifest(self, manifest: dict[str, dict[str, Any]]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+    def snapshot(
+        self, pipeline: AnalysisPipeline, *, components: Iterable[str] = COMPONENTS
+    ) -> dict[str, dict[str, Any]]:
+        """Сохраняет компоненты конвейера; модели при необходимости загружаются."""
+
+        components = set(components)
+        unknown = components - set(COMPONENTS)
+        if unknown:
+            raise ValueError(f"Неизвестные компоненты: {sorted(unknown)}")
+
+        manifest = self.manifest()
+        config = pipeline.config
+        self.root.mkdir(parents=True, exist_ok=True)
+        # У ONNX-движка свой каталог из export_onnx, снимок torch-модели не нужен.
+        if "embeddings" in components and config.embedding.backend == "torch":
+            pipeline.embedder.model.save(str(self.root / "embeddings"))
+            manifest["embeddings"] = {"model_name": config.embedding.model_name}
+        if "entities" in components:
+            pipeline.entity_extractor.nlp.to_disk(self.root / "spacy")
+            manifest["entities"] = {"spacy_model": config.entities.spacy_model}
+        if "aliases" in components:
+            pipeline.alias_resolver.save_index(self.root / "aliases" / "resolver.pkl")
+            if pipeline.film_detector.index is not None:
+                pipeline.film_detector.index.save(self.root / "aliases" / "index")
+            manifest["aliases"] = _aliases_fingerprint(config.aliases)
+        if "topics" in components:
+            clusterer = pipeline.topic_clusterer
+            if clusterer.is_fitted:
+                clusterer.save(self.root / "topics.pkl")
+                manifest["topics"] = _topics_fingerprint(config, clusterer.dimension)
+            else:
+                # Старый снимок обучен на другом корпусе или конфиге — не оставляем его.
+                manifest.pop("topics", None)
+                (self.root / "topics.pkl").unlink(missing_ok=True)
+        self._write_manifest(manifest)
+        return manifest
+
+    def resolve_config(self, config: PipelineConfig | None = None) -> PipelineConfig:
+        """Копия конфига, в которой модели указывают на локальные снимки."""
+
+        config = config or PipelineConfig()
+        manifest = self.manifest()
+        embedding = config.embedding
+        entry = manifest.get("embeddings")
+        if entry and entry["model_name"] == embedding.model_name:
+            embedding = replace(embedding, model_path=self.root / "embeddings")
+        entities = config.entities
+        entry = manifest.get("entities")
+        if entry and entry["spacy_model"] == entities.spacy_model:
+            entities = replace(entities, model_path=self.root / "spacy")
+        return replace(config, embedding=embedding, entities=entities)
+
+    def load_alias_resolver(self, config: FilmAliasConfig) -> FilmAliasResolver | None:
+        """Резолвер из снимка или None, если каталог алиасов с тех пор изменился."""
+
+        entry = self.manifest().get("aliases")
+        path = self.root / "aliases" / "resolver.pkl"
+        if not entry or not path.exists() or entry != _aliases_fingerprint(config):
+            return None
+        resolver = FilmAliasResolver(config)
+        resolver.load_index(path)
+        return resolver
+
+    def load_alias_index(self, *, mmap: bool = True) -> AliasCandidateIndex | None:
+        directory = self.root / "aliases" / "index"
+        if not (directory / "meta.pkl").exists():
+            return None
+        return AliasCandidateIndex.load(directory, mmap=mmap)
+
+    def load_topic_clusterer(self, config: PipelineConfig) -> TopicClusterer | None:
+        """Модель тем из снимка или None, если она обучена для другой модели эмбеддингов или конфига."""
+
+        entry = self.manifest().get("topics")
+        path = self.root / "topics.pkl"
+        if not entry or not path.exists() or entry != _topics_fingerprint(config, entry.get("dimension")):
+            return None
+        clusterer = TopicClusterer.load(path)
+        if clusterer.dimension != entry["dimension"]:
+            return None
+        return clusterer
+
+    def load_pipeline(self, config: PipelineConfig | None = None) -> AnalysisPipeline:
+        """Собирает конвейер из снимков; отсутствующие части строятся как обычно."""
+
+        from .pipeline import AnalysisPipeline
+
+        config = self.resolve_config(config)
+        resolver = self.load_alias_resolver(config.aliases)
+        return AnalysisPipeline(
+            config,
+            alias_resolver=resolver,
+            alias_index=self.load_alias_index() if resolver is not None else None,
+            topic_clusterer=self.load_topic_clusterer(config),
+        )
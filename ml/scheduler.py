@@ -0,0 +1,183 @@
+"""Параллельное выполнение стадий конвейера.
+
+NER и детекция фильмов — CPU-bound код на Python, поэтому они уходят в пул
+процессов. Кодирование SentenceTransformer отпускает GIL и выполняется в
+отдельном потоке. Стадии одного чанка идут одновременно, а число чанков
+в работе ограничено `max_pending_chunks`, что даёт ограниченную очередь
+между чтением входа и сборкой результата. Если детекция отбирает окна по
+сущностям NER (`candidate_mode="cues"` с подсказкой `"entities"`), NER и
+детекция чанка выполняются в одном воркере друг за другом.
+
+Стадии замеряются внутри задач (время выполнения без ожидания в очереди,
+пик RSS выполнявшего процесса), а замеры сводит родитель через
+`PipelineMetrics.record` под теми же именами, что и в последовательном режиме.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Sequence, TypeVar
+
+import numpy as np
+
+from .config import SchedulerConfig
+from .entity_extraction import Entity, EntityExtractor
+from .film_detection import FilmMentionDetector, _MentionSpan
+from .metrics import StageSample, peak_rss_bytes
+from .parallel import pool_context
+from .preprocessing import iter_batched
+
+if TYPE_CHECKING:
+    from .pipeline import AnalysisPipeline, PostAnalysis
+
+T = TypeVar("T")
+
+_WORKER_STAGES: tuple[EntityExtractor, FilmMentionDetector] | None = None
+
+
+def _init_worker(extractor: EntityExtractor, detector: FilmMentionDetector) -> None:
+    global _WORKER_STAGES
+    _WORKER_STAGES = (extractor, detector)
+
+
+def _timed(
+    stage: str, items: int, call: Callable[[], T], *, clock: Callable[[], float] = time.process_time
+) -> tuple[T, StageSample]:
+    """Результат `call` и замер прохода стадии там, где он выполнялся.
+
+    Время считается внутри задачи, без ожидания в очереди пула; родитель
+    добавляет замер в `PipelineMetrics.record`. Пик RSS — пик процесса,
+    выполнявшего задачу.
+    """
+
+    cpu_started = clock()
+    started = time.perf_counter()
+    result = call()
+    sample = StageSample(
+        stage=stage,
+        items=items,
+        wall_seconds=time.perf_counter() - started,
+        cpu_seconds=clock() - cpu_started,
+        peak_rss_bytes=peak_rss_bytes(),
+    )
+    return result, sample
+
+
+def _extract_in_worker(texts: Sequence[str]) -> tuple[list[list[Entity]], StageSample]:
+    assert _WORKER_STAGES is not None, "Пул запущен без стадий конвейера"
+    # Воркер пула — демон-процесс: собственные процессы spaCy ему запускать нельзя.
+    extractor = _WORKER_STAGES[0]
+    return _timed("entities/extract_batch", len(texts), lambda: extractor.extract_batch(texts, n_process=1))
+
+
+def _detect_in_worker(
+    texts: Sequence[str], entities: Sequence[Sequence[Entity]] | None = None
+) -> tuple[list[list[_MentionSpan]], StageSample]:
+    assert _WORKER_STAGES is not None, "Пул запущен без стадий конвейера"
+    detector = _WORKER_STAGES[1]
+    return _timed("films/detect", len(texts), lambda: detector._detect_spans_batch(texts, entities))
+
+
+def _extract_and_detect_in_worker(
+    texts: Sequence[str],
+) -> tuple[tuple[list[list[Entity]], StageSample], tuple[list[list[_MentionSpan]], StageSample]]:
+    """NER и детекция подряд: отбор кандидатов по подсказке `"entities"` ждёт сущности."""
+
+    extracted = _extract_in_worker(texts)
+    return extracted, _detect_in_worker(texts, extracted[0])
+
+
+class StageScheduler:
+    """Запускает стадии NER, детекции фильмов и эмбеддингов параллельно."""
+
+    def __init__(self, pipeline: AnalysisPipeline, config: SchedulerConfig | None = None) -> None:
+        self.pipeline = pipeline
+        self.config = config or SchedulerConfig()
+
+    def _process_pool(self, workers: int) -> ProcessPoolExecutor:
+        extractor = self.pipeline.entity_extractor
+        detector = self.pipeline.film_detector
+        context = pool_context(self.config.start_method, preload=[__name__])
+        if context.get_start_method() == "fork":
+            # Модели и индекс алиасов наследуются воркерами без сериализации.
+            global _WORKER_STAGES
+            _WORKER_STAGES = (extractor, detector)
+            return ProcessPoolExecutor(workers, mp_context=context)
+        return ProcessPoolExecutor(
+            workers, mp_context=context, initializer=_init_worker, initargs=(extractor, detector)
+        )
+
+    def iter_chunks(
+        self, texts: Iterable[str], *, chunk_size: int | None = None
+    ) -> Iterator[tuple[list[PostAnalysis], np.ndarray]]:
+        """Выдаёт `(posts, embeddings)` по чанкам в порядке входа."""
+
+        from .pipeline import PostAnalysis
+
+        chunk_size = chunk_size or self.config.chunk_size
+        workers = self.config.processes or max((os.cpu_count() or 2) - 1, 1)
+        process_pool = self._process_pool(workers)
+        encoder = ThreadPoolExecutor(1, thread_name_prefix="ml-encoder")
+        # (чанк, задачи NER и детекции, задача эмбеддингов); задачи возвращают (результат, замер).
+        pending: deque[tuple[list[str], tuple[Future, ...], Future[tuple[np.ndarray, StageSample]]]] = deque()
+        detector = self.pipeline.film_detector
+        embedder = self.pipeline.embedder
+        metrics = self.pipeline.metrics
+        # Детекции нужны сущности чанка — тогда NER и детекция идут одной задачей, иначе параллельно.
+        sequential = detector._current_view().candidates.uses_entities
+
+        def submit(chunk: list[str]) -> tuple[Future, ...]:
+            if sequential:
+                return (process_pool.submit(_extract_and_detect_in_worker, chunk),)
+            return (
+                process_pool.submit(_extract_in_worker, chunk),
+                process_pool.submit(_detect_in_worker, chunk),
+            )
+
+        def encode(chunk: list[str]) -> tuple[np.ndarray, StageSample]:
+            # Поток кодировщика делит процесс с родителем: CPU — время этого потока.
+            return _timed(
+                "embeddings/embed", len(chunk), lambda: embedder.embed(chunk), clock=time.thread_time
+            )
+
+        def collect() -> tuple[list[PostAnalysis], np.ndarray]:
+            chunk, stage_futures, embeddings_future = pending.popleft()
+            if sequential:
+                extracted, detected = stage_futures[0].result()
+            else:
+                extracted, detected = (future.result() for future in stage_futures)
+            (entities_per_post, extract_sample), (spans_per_post, detect_sample) = extracted, detected
+            embeddings, embed_sample = embeddings_future.result()
+            for sample in (extract_sample, detect_sample, embed_sample):
+                metrics.record(sample)
+            posts = [
+                PostAnalysis(
+                    text=text,
+                    entities=entities,
+                    film_mentions=detector._to_mentions(spans),
+                    embedding=embeddings[idx],
+                )
+                for idx, (text, entities, spans) in enumerate(
+                    zip(chunk, entities_per_post, spans_per_post)
+                )
+            ]
+            return posts, embeddings
+
+        try:
+            for chunk in iter_batched(texts, chunk_size):
+                pending.append((chunk, submit(chunk), encoder.submit(encode, chunk)))
+                if len(pending) >= self.config.max_pending_chunks:
+                    yield collect()
+            while pending:
+                yield collect()
+        finally:
+            for _, stage_futures, embeddings_future in pending:
+                for future in (*stage_futures, embeddings_future):
+                    future.cancel()
+            encoder.shutdown(wait=True)
+            process_pool.shutdown(wait=True, cancel_futures=True)
+            global _WORKER_STAGES
+            _WORKER_STAGES = None
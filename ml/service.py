@@ -0,0 +1,540 @@
+"""Долгоживущий сервис резолва алиасов и эмбеддингов запросов.
+
+Поиск на сайте не может поднимать Python-процесс на каждый запрос: модели
+загружались бы заново. Сервис держит `FilmAliasResolver` и
+`EmbeddingGenerator` прогретыми и отвечает по HTTP/1.1 (TCP или Unix-сокет)::
+
+    python -m ml.service --aliases data/film-aliases.json --port 8765
+    curl 'http://127.0.0.1:8765/resolve?q=ковбоя+бибопа&limit=3'
+    curl -d '{"text": "фильмы про космос"}' http://127.0.0.1:8765/embed
+
+Конкурентные запросы одного метода собираются в микропачки: пока пачка
+обрабатывается в потоке модели, следующие заявки копятся в очереди, а под
+нагрузкой первая заявка ещё ждёт попутчиков не дольше `max_wait_ms`. Очередь ограничена `max_pending` —
+сверх неё сервис сразу отвечает 503 с `Retry-After`, а не растит задержку.
+`GET /health` отдаёт состояние и квантили задержек, `GET /metrics` — те же
+гистограммы в формате Prometheus.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Generic, Sequence, TypeVar
+from urllib.parse import parse_qs, urlsplit
+
+from .aliases import FilmAliasMatch, FilmAliasResolver
+from .config import EmbeddingConfig, FilmAliasConfig, ServiceConfig
+from .embeddings import EmbeddingGenerator
+from .metrics import LatencyHistogram, escape_label
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    414: "URI Too Long",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Overloaded(RuntimeError):
+    """Очередь метода заполнена — запрос отклонён без ожидания."""
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_line(reader: asyncio.StreamReader, status: int) -> bytes:
+    """`readline`, в котором строка длиннее лимита потока превращается в `_HttpError(status)`."""
+
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise _HttpError(status, "Слишком длинная строка запроса или заголовка") from None
+
+
+class MicroBatcher(Generic[T, R]):
+    """Собирает одиночные заявки в пачки для `handler(items) -> results`.
+
+    `handler` выполняется в отдельном потоке, по одной пачке за раз (модели
+    не рассчитаны на параллельные вызовы), и должен вернуть результаты в
+    порядке заявок. Исключение в `handler` получают все заявки пачки.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list[T]], Sequence[R]],
+        *,
+        max_batch_size: int,
+        max_wait: float,
+        max_pending: int,
+        name: str,
+    ) -> None:
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self._handler = handler
+        self._queue: asyncio.Queue[tuple[T, asyncio.Future[R]]] = asyncio.Queue(maxsize=max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ml-{name}")
+        self._worker: asyncio.Task[None] | None = None
+        self._last_batch_size = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(Overloaded(f"{self.name}: сервис останавливается"))
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, item: T) -> R:
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: в очереди {self._queue.maxsize} запросов") from None
+        return await future
+
+    async def run_in_thread(self, function: Callable[[], R]) -> R:
+        """Выполняет `function` в потоке модели (прогрев, служебные вызовы)."""
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function)
+
+    async def _collect(self) -> list[tuple[T, asyncio.Future[R]]]:
+        batch = [await self._queue.get()]
+        # Ждать попутчиков имеет смысл только под нагрузкой: одиночный запрос
+        # при пустой очереди уходит в модель сразу, без задержки на окно.
+        wait = self.max_wait if self._last_batch_size > 1 else 0.0
+        deadline = time.monotonic() + wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Клиент мог отключиться, пока заявка ждала в очереди.
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            self._last_batch_size = len(items)
+            try:
+                results = await loop.run_in_executor(self._executor, self._handler, items)
+            except Exception as exc:  # noqa: BLE001 — ошибку получает каждый клиент пачки
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+def _match_to_json(match: FilmAliasMatch) -> dict[str, object]:
+    film = match.film
+    return {
+        "filmId": film.id,
+        "title": film.title,
+        "originalTitle": film.original_title,
+        "year": film.year,
+        "alias": match.matched_alias,
+        "score": round(match.score, 2),
+    }
+
+
+class InferenceService:
+    """HTTP-обработчик поверх прогретых резолвера и кодировщика.
+
+    Методы: `GET|POST /resolve` (`q`/`query`, `limit`), `POST /embed`
+    (`text`), `GET /health`, `GET /metrics`. Без `embedder` метод `/embed`
+    отвечает 404.
+    """
+
+    def __init__(
+        self,
+        resolver: FilmAliasResolver,
+        embedder: EmbeddingGenerator | None = None,
+        config: ServiceConfig | None = None,
+    ) -> None:
+        self.config = config or ServiceConfig()
+        self.resolver = resolver
+        self.embedder = embedder
+        self.started = time.time()
+        self.latency: dict[str, LatencyHistogram] = {
+            name: LatencyHistogram() for name in ("resolve", "embed", "health", "metrics")
+        }
+        self.statuses: dict[int, int] = {}
+        self._batchers: dict[str, MicroBatcher] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    def _batcher(self, name: str, handler: Callable[[list], Sequence]) -> MicroBatcher:
+        return MicroBatcher(
+            handler,
+            max_batch_size=self.config.max_batch_size,
+            max_wait=self.config.max_wait_ms / 1000,
+            max_pending=self.config.max_pending,
+            name=name,
+        )
+
+    def _resolve_batch(self, items: list[tuple[str, int]]) -> list[list[dict[str, object]]]:
+        # Одна пачка — один вызов resolve_many с наибольшим limit; топ меньших
+        # limit — его префикс, так как порядок кандидатов не зависит от limit.
+        limit = max(limit for _, limit in items)
+        matches = self.resolver.resolve_many([query for query, _ in items], limit=limit)
+        return [
+            [_match_to_json(match) for match in found[:wanted]]
+            for found, (_, wanted) in zip(matches, items)
+        ]
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        assert self.embedder is not None
+        return self.embedder.embed(texts).tolist()
+
+    async def start(self) -> None:
+        """Прогревает модели и открывает сокет."""
+
+        self._batchers["resolve"] = self._batcher("resolve", self._resolve_batch)
+        if self.embedder is not None:
+            self._batchers["embed"] = self._batcher("embed", self._embed_batch)
+        for batcher in self._batchers.values():
+            batcher.start()
+        # Прогрев в потоках моделей: ленивые импорты, загрузка весов, индекс алиасов.
+        await self._batchers["resolve"].run_in_thread(lambda: self.resolver.resolve_many(["прогрев"]))
+        if self.embedder is not None:
+            await self._batchers["embed"].run_in_thread(lambda: self.embedder.embed(["прогрев"]))
+
+        if self.config.unix_socket is not None:
+            path = Path(self.config.unix_socket)
+            path.unlink(missing_ok=True)
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=str(path))
+            logger.info("ml.service слушает unix:%s", path)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, self.config.host, self.config.port
+            )
+            logger.info("ml.service слушает http://%s:%s", self.config.host, self.port)
+
+    @property
+    def port(self) -> int | None:
+        if self._server is None or not self._server.sockets:
+            return None
+        address = self._server.sockets[0].getsockname()
+        return address[1] if isinstance(address, tuple) else None
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for batcher in self._batchers.values():
+            await batcher.close()
+        self._batchers.clear()
+        if self.config.unix_socket is not None:
+            Path(self.config.unix_socket).unlink(missing_ok=True)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except NotImplementedError:  # Windows
+                pass
+        try:
+            await stop.wait()
+        finally:
+            await self.close()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                request_line = await _read_line(reader, 414)
+                if not request_line:
+                    break
+                keep_alive = await self._handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except _HttpError as exc:
+            # Поток уже не выровнен по границе запроса, поэтому соединение закрывается.
+            self._respond(writer, exc.status, {"error": str(exc)}, keep_alive=False)
+            with contextlib.suppress(ConnectionError):
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(
+        self, request_line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        started = time.perf_counter()
+        headers: dict[str, str] = {}
+        while True:
+            line = await _read_line(reader, 431)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            self._respond(writer, 400, {"error": "Некорректная строка запроса"}, keep_alive=False)
+            return False
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._respond(writer, 400, {"error": "Некорректный Content-Length"}, keep_alive=False)
+            return False
+        if length > self.config.max_body_bytes:
+            self._respond(writer, 413, {"error": "Слишком большое тело запроса"}, keep_alive=False)
+            return False
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        route = url.path.rstrip("/") or "/"
+        extra_headers: dict[str, str] = {}
+        try:
+            status, payload = 200, await self._dispatch(method, route, url.query, body)
+        except _HttpError as exc:
+            status, payload = exc.status, {"error": str(exc)}
+        except Overloaded as exc:
+            status, payload = 503, {"error": str(exc)}
+            extra_headers["Retry-After"] = "1"
+        except Exception:  # noqa: BLE001 — сервис не должен падать из-за одного запроса
+            logger.exception("Ошибка обработки %s %s", method, target)
+            status, payload = 500, {"error": "Внутренняя ошибка"}
+        self._respond(writer, status, payload, keep_alive=keep_alive, headers=extra_headers)
+        histogram = self.latency.get(route.lstrip("/"))
+        if histogram is not None:
+            histogram.observe(time.perf_counter() - started)
+        return keep_alive
+
+    async def _dispatch(self, method: str, route: str, query: str, body: bytes) -> object:
+        if route == "/health":
+            return self.health()
+        if route == "/metrics":
+            return self.prometheus()
+        if route not in ("/resolve", "/embed"):
+            raise _HttpError(404, f"Нет метода {route}")
+        if method == "GET":
+            params = {key: values[-1] for key, values in parse_qs(query).items()}
+        elif method == "POST":
+            try:
+                params = json.loads(body or b"{}")
+            except ValueError:
+                raise _HttpError(400, "Тело запроса — не JSON") from None
+            if not isinstance(params, dict):
+                raise _HttpError(400, "Ожидался JSON-объект")
+        else:
+            raise _HttpError(405, f"Метод {method} не поддерживается")
+
+        if route == "/resolve":
+            text = params.get("q", params.get("query"))
+            if not isinstance(text, str):
+                raise _HttpError(400, "Нужен параметр q (строка)")
+            try:
+                limit = int(params.get("limit", self.config.resolve_limit))
+            except (TypeError, ValueError):
+                raise _HttpError(400, "limit должен быть целым числом") from None
+            limit = min(max(limit, 1), 50)
+            return {"matches": await self._batchers["resolve"].submit((text, limit))}
+
+        batcher = self._batchers.get("embed")
+        if batcher is None:
+            raise _HttpError(404, "Эмбеддинги отключены")
+        text = params.get("text")
+        if not isinstance(text, str):
+            raise _HttpError(400, "Нужен параметр text (строка)")
+        return {"embedding": await batcher.submit(text), "model": self.embedder.cache_name}
+
+    def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: object,
+        *,
+        keep_alive: bool,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        lines = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            *(f"{name}: {value}" for name, value in (headers or {}).items()),
+        ]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+    def health(self) -> dict[str, object]:
+        return {
+            "status": "ok",
+            "uptimeSeconds": round(time.time() - self.started, 1),
+            "films": sum(film is not None for film in self.resolver.catalogue.films),
+            "catalogueVersion": self.resolver.catalogue.version,
+            "embeddings": self.embedder is not None,
+            "queues": {
+                name: {
+                    "pending": batcher.pending,
+                    "batches": batcher.batches,
+                    "meanBatchSize": batcher.items / batcher.batches if batcher.batches else 0.0,
+                    "rejected": batcher.rejected,
+                }
+                for name, batcher in self._batchers.items()
+            },
+            "latency": {
+                name: histogram.summary()
+                for name, histogram in self.latency.items()
+                if histogram.count
+            },
+        }
+
+    def prometheus(self, *, prefix: str = "ml_service") -> str:
+        lines = [
+            f"# HELP {prefix}_request_seconds Задержка ответа по методам",
+            f"# TYPE {prefix}_request_seconds histogram",
+        ]
+        for name, histogram in self.latency.items():
+            lines += histogram.to_prometheus(f"{prefix}_request_seconds", f'method="{escape_label(name)}"')
+        name = f"{prefix}_responses_total"
+        lines += [f"# HELP {name} Ответы по кодам", f"# TYPE {name} counter"]
+        lines += [f'{name}{{status="{status}"}} {count}' for status, count in self.statuses.items()]
+        for suffix, attribute, help_text in (
+            ("batches_total", "batches", "Пачки, переданные модели"),
+            ("batched_items_total", "items", "Запросы в пачках"),
+            ("rejected_total", "rejected", "Запросы, отклонённые из-за переполнения очереди"),
+            ("pending", "pending", "Запросы в очереди"),
+        ):
+            name = f"{prefix}_{suffix}"
+            kind = "gauge" if suffix == "pending" else "counter"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [
+                f'{name}{{method="{method}"}} {getattr(batcher, attribute)}'
+                for method, batcher in self._batchers.items()
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def build_service(
+    config: ServiceConfig,
+    *,
+    aliases: FilmAliasConfig | None = None,
+    embedding: EmbeddingConfig | None = None,
+    registry: Path | None = None,
+) -> InferenceService:
+    """Собирает сервис; со снимками `ArtifactRegistry` модели грузятся из них."""
+
+    aliases = aliases or FilmAliasConfig()
+    embedding = embedding or EmbeddingConfig()
+    resolver = None
+    if registry is not None:
+        from .config import PipelineConfig
+        from .registry import ArtifactRegistry
+
+        artifacts = ArtifactRegistry(registry)
+        resolver = artifacts.load_alias_resolver(aliases)
+        embedding = artifacts.resolve_config(PipelineConfig(embedding=embedding)).embedding
+    if resolver is None:
+        resolver = FilmAliasResolver(aliases)
+        resolver.load()
+    embedder = EmbeddingGenerator(embedding) if config.embeddings else None
+    return InferenceService(resolver, embedder, config)
+
+
+def main(argv: list[str] | None = None) -> None:
+    defaults = ServiceConfig()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--aliases", type=Path, help="Каталог алиасов (по умолчанию — FilmAliasConfig)")
+    parser.add_argument("--registry", type=Path, help="Каталог снимков ArtifactRegistry")
+    parser.add_argument("--host", default=defaults.host)
+    parser.add_argument("--port", type=int, default=defaults.port)
+    parser.add_argument("--socket", type=Path, help="Unix-сокет вместо TCP")
+    parser.add_argument("--max-batch-size", type=int, default=defaults.max_batch_size)
+    parser.add_argument("--max-wait-ms", type=float, default=defaults.max_wait_ms)
+    parser.add_argument("--max-pending", type=int, default=defaults.max_pending)
+    parser.add_argument("--no-embeddings", action="store_true", help="Только резолв алиасов")
+    parser.add_argument("--embedding-backend", choices=("torch", "onnx"), default=EmbeddingConfig().backend)
+    parser.add_argument("--onnx-path", type=Path)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = ServiceConfig(
+        host=args.host,
+        port=args.port,
+        unix_socket=args.socket,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending,
+        embeddings=not args.no_embeddings,
+    )
+    aliases = FilmAliasConfig(aliases_path=args.aliases) if args.aliases else FilmAliasConfig()
+    embedding = EmbeddingConfig(backend=args.embedding_backend, onnx_path=args.onnx_path)
+    service = build_service(config, aliases=aliases, embedding=embedding, registry=args.registry)
+    asyncio.run(service.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
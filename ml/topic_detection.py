@@ -2,24 +2,129 @@
 
 from __future__ import annotations
 
+import pickle
 from dataclasses import dataclass
-from typing import Dict, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Sequence
 
 import numpy as np
-import umap
-from hdbscan import HDBSCAN
-from sklearn.feature_extraction.text import TfidfVectorizer
 
 from .config import TopicClusteringConfig
+from .lazy import lazy_getattr
 from .preprocessing import normalize_text
 
+if TYPE_CHECKING:
+    import umap
+    from hdbscan import HDBSCAN
+    from sklearn.base import TransformerMixin
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from .embedding_store import EmbeddingStore
+
+# UMAP (numba), HDBSCAN и sklearn импортируются только при обучении и отнесении.
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "umap": "umap",
+        "HDBSCAN": "hdbscan:HDBSCAN",
+        "approximate_predict": "hdbscan:approximate_predict",
+        "TfidfVectorizer": "sklearn.feature_extraction.text:TfidfVectorizer",
+    },
+)
+
+
+def _membership_matrix(inverse: np.ndarray, n_classes: int):
+    """Разреженная матрица «класс × документ» из единиц."""
+
+    from scipy.sparse import csr_matrix
+
+    documents = np.arange(len(inverse))
+    return csr_matrix(
+        (np.ones(len(inverse)), (inverse, documents)), shape=(n_classes, len(inverse))
+    )
+
+
+def _class_tfidf(class_counts):
+    """c-TF-IDF: частоты терминов класса (L1) × log(1 + A / частота термина).
+
+    `A` — среднее число терминов на класс; кластер рассматривается как
+    один документ, поэтому вес отражает специфичность термина для темы.
+    """
+
+    from sklearn.preprocessing import normalize
+
+    class_counts = class_counts.astype(np.float64)
+    term_frequency = np.asarray(class_counts.sum(axis=0)).ravel()
+    average = class_counts.sum() / class_counts.shape[0]
+    idf = np.log1p(average / np.maximum(term_frequency, 1.0))
+    return normalize(class_counts, norm="l1", axis=1).multiply(idf).tocsr()
+
+
+def _top_terms(values: np.ndarray, indices: np.ndarray, k: int) -> np.ndarray:
+    """Индексы `k` терминов с наибольшим положительным весом.
+
+    Порядок — по убыванию веса, при равных весах — по убыванию индекса
+    признака; порядок детерминирован и не зависит от алгоритма сортировки.
+    Прежний `argsort()[::-1]` (неустойчивая сортировка) расставлял равные веса
+    произвольно, поэтому ключевые слова с одинаковым весом могут идти в другом
+    порядке, а на границе `k` — смениться. `partition` отбирает порог, а
+    сортируются только термины не ниже него.
+    """
+
+    positive = values > 0
+    values, indices = values[positive], indices[positive]
+    if len(values) > k:
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        keep = values >= threshold
+        values, indices = values[keep], indices[keep]
+    order = np.lexsort((-indices, -values))[:k]
+    return indices[order]
+
+
+# Предел ячеек матрицы сходств (float32) в одном шаге `_knn_interpolate`, ~64 МБ.
+_SIMILARITY_MAX_CELLS = 1 << 24
+
+
+def _knn_interpolate(
+    reference: np.ndarray, reference_reduced: np.ndarray, points: np.ndarray, n_neighbors: int
+) -> np.ndarray:
+    """Координаты точек как взвешенное среднее координат ближайших опорных точек.
+
+    Соседи ищутся по косинусу, веса — нечёткие членства UMAP
+    (`smooth_knn_dist`), как в начальном приближении `UMAP.transform`.
+    """
+
+    from umap.umap_ import smooth_knn_dist
+
+    def unit(matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    n_neighbors = min(n_neighbors, len(reference))
+    reference = unit(reference)
+    reduced = np.empty((len(points), reference_reduced.shape[1]), dtype=np.float32)
+    step = max(1, _SIMILARITY_MAX_CELLS // len(reference))
+    for start in range(0, len(points), step):
+        similarities = unit(points[start : start + step]) @ reference.T
+        neighbors = np.argpartition(-similarities, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        nearest = np.take_along_axis(similarities, neighbors, axis=1)
+        order = np.argsort(-nearest, axis=1)
+        neighbors = np.take_along_axis(neighbors, order, axis=1)
+        distances = np.maximum(1.0 - np.take_along_axis(nearest, order, axis=1), 0.0)
+        sigmas, rhos = smooth_knn_dist(distances, float(n_neighbors))
+        weights = np.exp(-np.maximum(distances - rhos[:, None], 0.0) / sigmas[:, None])
+        weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+        reduced[start : start + step] = np.einsum("ij,ijk->ik", weights, reference_reduced[neighbors])
+    return reduced
+
 
 @dataclass(slots=True)
 class TopicClusteringResult:
     labels: np.ndarray
     topics: Dict[int, list[str]]
     cluster_sizes: Dict[int, int]
-    embeddings: np.ndarray
+    # После `AnalysisPipeline.analyze` с `PipelineConfig.store` — квантованное хранилище.
+    embeddings: np.ndarray | EmbeddingStore
     reduced_embeddings: np.ndarray
 
     @property
@@ -28,31 +133,87 @@ class TopicClusteringResult:
         return float(noise / len(self.labels)) if len(self.labels) else 0.0
 
 
+@dataclass(slots=True)
+class TopicAssignment:
+    """Результат отнесения новых постов к уже обученным темам."""
+
+    labels: np.ndarray
+    probabilities: np.ndarray
+    reduced_embeddings: np.ndarray
+    noise_ratio: float
+    drift: float
+    needs_refit: bool
+
+
 class TopicClusterer:
-    """Строит кластеры на основе эмбеддингов и извлекает ключевые термины."""
+    """Строит кластеры на основе эмбеддингов и извлекает ключевые термины.
+
+    `fit` (или `cluster`) обучает UMAP, HDBSCAN и TF-IDF на корпусе, после чего
+    `assign` относит новые посты к найденным темам без переобучения. Метки
+    стабильны, пока модель не переобучена; обученное состояние сохраняется
+    через `save`/`load`.
+    """
 
     def __init__(self, config: TopicClusteringConfig | None = None) -> None:
         self.config = config or TopicClusteringConfig()
-        self._vectorizer = TfidfVectorizer(
-            max_features=5000,
-            ngram_range=(1, 2),
-            min_df=2,
-        )
+        self._vectorizer: TfidfVectorizer | None = None
+        self._pre_reducer: TransformerMixin | None = None
+        self._reducer: umap.UMAP | None = None
+        self._clusterer: HDBSCAN | None = None
+        self._topics: dict[int, list[str]] = {}
+        self._cluster_sizes: dict[int, int] = {}
+        self._fit_centroid: np.ndarray | None = None
+        self._fit_noise_ratio = 0.0
+        # Накопленная статистика по постам, отнесённым через assign после fit.
+        self._assigned_count = 0
+        self._assigned_noise = 0
+        self._assigned_sum: np.ndarray | None = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._reducer is not None and self._clusterer is not None
+
+    @property
+    def dimension(self) -> int | None:
+        """Размерность эмбеддингов, на которых обучена модель; None до обучения."""
+
+        return None if self._fit_centroid is None else len(self._fit_centroid)
+
+    @property
+    def topics(self) -> dict[int, list[str]]:
+        return self._topics
 
     def cluster(
         self,
         texts: Sequence[str],
         embeddings: np.ndarray,
     ) -> TopicClusteringResult:
+        return self.fit(texts, embeddings)
+
+    def fit(self, texts: Sequence[str], embeddings: np.ndarray) -> TopicClusteringResult:
+        """Обучает модель тем на корпусе и запоминает её для `assign`."""
+
+        from hdbscan import HDBSCAN
+
         reduced = self._reduce(embeddings)
         clusterer = HDBSCAN(
             min_cluster_size=self.config.min_cluster_size,
             min_samples=self.config.min_samples,
             metric="euclidean",
             cluster_selection_epsilon=0.0,
+            prediction_data=True,
         )
         labels = clusterer.fit_predict(reduced)
         topics, sizes = self._extract_topics(texts, labels)
+
+        self._clusterer = clusterer
+        self._topics = topics
+        self._cluster_sizes = sizes
+        self._fit_centroid = np.asarray(embeddings, dtype=np.float64).mean(axis=0)
+        self._fit_noise_ratio = float(np.mean(labels == -1)) if len(labels) else 0.0
+        self._assigned_count = 0
+        self._assigned_noise = 0
+        self._assigned_sum = None
         return TopicClusteringResult(
             labels=labels,
             topics=topics,
@@ -61,36 +222,247 @@ class TopicClusterer:
             reduced_embeddings=reduced,
         )
 
+    def assign(self, texts: Sequence[str], embeddings: np.ndarray) -> TopicAssignment:
+        """Относит новые посты к обученным темам через `approximate_predict`.
+
+        Флаг `needs_refit` выставляется, когда среди всех постов, отнесённых
+        с момента обучения, доля шума или сдвиг их центроида превышают пороги
+        `refit_noise_ratio`/`refit_centroid_drift`.
+        """
+
+        if not self.is_fitted:
+            raise RuntimeError("Модель тем не обучена: вызовите fit() или load()")
+        if len(texts) != len(embeddings):
+            raise ValueError("Число текстов и эмбеддингов не совпадает")
+        if np.ndim(embeddings) != 2 or np.shape(embeddings)[1] != self.dimension:
+            raise ValueError(
+                f"Модель тем обучена на эмбеддингах размерности {self.dimension}, "
+                f"получено {np.shape(embeddings)}"
+            )
+
+        from hdbscan import approximate_predict
+
+        reduced = self._transform(embeddings)
+        labels, probabilities = approximate_predict(self._clusterer, reduced)
+
+        batch = np.asarray(embeddings, dtype=np.float64)
+        self._assigned_count += len(labels)
+        self._assigned_noise += int(np.sum(labels == -1))
+        batch_sum = batch.sum(axis=0)
+        self._assigned_sum = (
+            batch_sum if self._assigned_sum is None else self._assigned_sum + batch_sum
+        )
+
+        noise_ratio = self._assigned_noise / self._assigned_count if self._assigned_count else 0.0
+        drift = self._centroid_drift()
+        needs_refit = (
+            noise_ratio > max(self.config.refit_noise_ratio, self._fit_noise_ratio)
+            or drift > self.config.refit_centroid_drift
+        )
+        return TopicAssignment(
+            labels=labels,
+            probabilities=probabilities,
+            reduced_embeddings=reduced,
+            noise_ratio=float(noise_ratio),
+            drift=drift,
+            needs_refit=bool(needs_refit),
+        )
+
+    def _centroid_drift(self) -> float:
+        if self._fit_centroid is None or self._assigned_sum is None or not self._assigned_count:
+            return 0.0
+        assigned = self._assigned_sum / self._assigned_count
+        norm = float(np.linalg.norm(assigned) * np.linalg.norm(self._fit_centroid))
+        if norm == 0.0:
+            return 0.0
+        return float(1.0 - np.dot(assigned, self._fit_centroid) / norm)
+
+    def save(self, path: Path) -> None:
+        """Сохраняет обученные UMAP, HDBSCAN, TF-IDF и темы в один файл."""
+
+        if not self.is_fitted:
+            raise RuntimeError("Нечего сохранять: модель тем не обучена")
+        state = {
+            "config": self.config,
+            "vectorizer": self._vectorizer,
+            "pre_reducer": self._pre_reducer,
+            "reducer": self._reducer,
+            "clusterer": self._clusterer,
+            "topics": self._topics,
+            "cluster_sizes": self._cluster_sizes,
+            "fit_centroid": self._fit_centroid,
+            "fit_noise_ratio": self._fit_noise_ratio,
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as fp:
+            pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path) -> TopicClusterer:
+        with Path(path).open("rb") as fp:
+            state = pickle.load(fp)
+        clusterer = cls(state["config"])
+        clusterer._vectorizer = state["vectorizer"]
+        clusterer._pre_reducer = state.get("pre_reducer")
+        clusterer._reducer = state["reducer"]
+        clusterer._clusterer = state["clusterer"]
+        clusterer._topics = state["topics"]
+        clusterer._cluster_sizes = state["cluster_sizes"]
+        clusterer._fit_centroid = state["fit_centroid"]
+        clusterer._fit_noise_ratio = state["fit_noise_ratio"]
+        return clusterer
+
     def _reduce(self, embeddings: np.ndarray) -> np.ndarray:
+        """Обучает понижение размерности и возвращает координаты всех постов.
+
+        При `reduction_sample_size` UMAP обучается на стратифицированной
+        выборке, а остальные посты проецируются чанками (`reduction_transform`),
+        что ограничивает время и пик памяти на больших корпусах.
+        """
+
+        import umap
+
+        config = self.config
+        embeddings = self._fit_pre_reduction(embeddings)
         reducer = umap.UMAP(
-            n_components=self.config.n_components,
-            n_neighbors=self.config.n_neighbors,
-            random_state=self.config.random_state,
+            n_components=config.n_components,
+            n_neighbors=config.n_neighbors,
+            random_state=config.random_state,
             metric="cosine",
+            low_memory=config.low_memory,
+            n_jobs=config.n_jobs,
         )
-        return reducer.fit_transform(embeddings)
+        sample_size = config.reduction_sample_size
+        if sample_size is None or len(embeddings) <= sample_size:
+            reduced = reducer.fit_transform(embeddings)
+            self._reducer = reducer
+            return reduced
+
+        if config.reduction_transform not in ("knn", "umap"):
+            raise ValueError(f"Неизвестный способ проекции вне выборки: {config.reduction_transform}")
+        sample = self._stratified_sample(embeddings, sample_size)
+        reduced = np.empty((len(embeddings), config.n_components), dtype=np.float32)
+        reduced[sample] = reducer.fit_transform(embeddings[sample])
+        self._reducer = reducer
+        rest = np.setdiff1d(np.arange(len(embeddings)), sample, assume_unique=True)
+        for start in range(0, len(rest), config.reduction_chunk_size):
+            rows = rest[start : start + config.reduction_chunk_size]
+            if config.reduction_transform == "umap":
+                reduced[rows] = reducer.transform(embeddings[rows])
+            else:
+                reduced[rows] = _knn_interpolate(
+                    embeddings[sample], reduced[sample], embeddings[rows], config.n_neighbors
+                )
+        return reduced
+
+    def _fit_pre_reduction(self, embeddings: np.ndarray) -> np.ndarray:
+        method = self.config.pre_reduction
+        self._pre_reducer = None
+        if method is None or self.config.pre_reduction_components >= embeddings.shape[1]:
+            return embeddings
+        if method == "pca":
+            from sklearn.decomposition import PCA
+
+            pre_reducer = PCA(
+                n_components=self.config.pre_reduction_components,
+                random_state=self.config.random_state,
+            )
+        elif method == "random_projection":
+            from sklearn.random_projection import GaussianRandomProjection
+
+            pre_reducer = GaussianRandomProjection(
+                n_components=self.config.pre_reduction_components,
+                random_state=self.config.random_state,
+            )
+        else:
+            raise ValueError(f"Неизвестный способ предварительного понижения: {method}")
+        reduced = pre_reducer.fit_transform(embeddings).astype(np.float32)
+        self._pre_reducer = pre_reducer
+        return reduced
+
+    def _transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """Проекция новых постов обученными `_pre_reducer` и UMAP, чанками."""
+
+        if self._pre_reducer is not None:
+            embeddings = self._pre_reducer.transform(embeddings).astype(np.float32)
+        chunk_size = self.config.reduction_chunk_size
+        if len(embeddings) <= chunk_size:
+            return self._reducer.transform(embeddings)
+        return np.vstack(
+            [
+                self._reducer.transform(embeddings[start : start + chunk_size])
+                for start in range(0, len(embeddings), chunk_size)
+            ]
+        )
+
+    def _stratified_sample(self, embeddings: np.ndarray, sample_size: int) -> np.ndarray:
+        """Индексы выборки, пропорциональной стратам MiniBatchKMeans (по возрастанию).
+
+        Мелкие темы получают хотя бы одну точку, поэтому не теряются при
+        обучении UMAP на выборке.
+        """
+
+        from sklearn.cluster import MiniBatchKMeans
+
+        config = self.config
+        rng = np.random.default_rng(config.random_state)
+        strata = MiniBatchKMeans(
+            n_clusters=min(config.reduction_strata, sample_size),
+            random_state=config.random_state,
+            n_init=3,
+        ).fit_predict(embeddings)
+        sizes = np.bincount(strata)
+        quotas = np.maximum(np.floor(sizes * sample_size / len(embeddings)).astype(int), sizes > 0)
+        order = np.argsort(strata, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        chosen = [
+            rng.choice(order[bounds[stratum] : bounds[stratum + 1]], quota, replace=False)
+            for stratum, quota in enumerate(quotas)
+            if quota
+        ]
+        return np.sort(np.concatenate(chosen))
 
     def _extract_topics(self, texts: Sequence[str], labels: np.ndarray) -> tuple[dict[int, list[str]], dict[int, int]]:
+        """Ключевые слова всех кластеров за одно умножение на матрицу принадлежности."""
+
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+        weighting = self.config.keyword_weighting
+        if weighting not in ("tfidf", "ctfidf"):
+            raise ValueError(f"Неизвестный способ взвешивания ключевых слов: {weighting}")
         normalized_texts = [normalize_text(text, keep_case=True) for text in texts]
+        self._vectorizer = TfidfVectorizer(
+            max_features=5000,
+            ngram_range=(1, 2),
+            min_df=2,
+        )
         tfidf = self._vectorizer.fit_transform(normalized_texts)
-        feature_names = np.array(self._vectorizer.get_feature_names_out())
+        feature_names = self._vectorizer.get_feature_names_out()
+
+        labels = np.asarray(labels)
+        # Шум (-1) — отдельный класс: он не попадает в темы, но участвует в IDF классов.
+        classes, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        membership = _membership_matrix(inverse, len(classes))
+        if weighting == "tfidf":
+            weights = (membership @ tfidf).multiply(1.0 / counts[:, None]).tocsr()
+        else:
+            term_counts = CountVectorizer(
+                vocabulary=self._vectorizer.vocabulary_, ngram_range=(1, 2)
+            ).transform(normalized_texts)
+            weights = _class_tfidf(membership @ term_counts)
+
         topics: dict[int, list[str]] = {}
         sizes: dict[int, int] = {}
-
-        for label in sorted(set(labels)):
+        for row, label in enumerate(classes.tolist()):
             if label == -1:
                 continue
-            cluster_indices = np.where(labels == label)[0]
-            if cluster_indices.size == 0:
-                continue
-            cluster_matrix = tfidf[cluster_indices]
-            mean_tfidf = np.asarray(cluster_matrix.mean(axis=0)).ravel()
-            if not np.any(mean_tfidf):
+            start, stop = weights.indptr[row], weights.indptr[row + 1]
+            top = _top_terms(weights.data[start:stop], weights.indices[start:stop], self.config.top_terms)
+            if not len(top):
                 continue
-            top_indices = mean_tfidf.argsort()[::-1][: self.config.top_terms]
-            keywords = [feature_names[idx] for idx in top_indices if mean_tfidf[idx] > 0]
-            topics[label] = keywords
-            sizes[label] = int(cluster_indices.size)
+            topics[label] = [str(feature_names[idx]) for idx in top]
+            sizes[label] = int(counts[row])
 
         return topics, sizes
 
@@ -0,0 +1,509 @@
+"""Приближённый поиск ближайших эмбеддингов постов (IVF на NumPy).
+
+Векторы разбиваются сферическим k-means на `n_lists` списков и хранятся
+отсортированными по спискам, поэтому запрос сводится к нескольким матричным
+умножениям по непрерывным срезам: выбираются `n_probe` ближайших центроидов,
+и точно перебираются только их списки. Метрика — скалярное произведение
+(косинус для нормализованных эмбеддингов).
+
+Добавленные векторы сначала попадают в буфер с точным поиском и вливаются в
+списки, когда буфер превышает `merge_ratio` индекса. Пока векторов меньше
+`exact_threshold`, индекс не обучается и ищет полным перебором. Буфер
+растёт удвоением ёмкости, поэтому добавление по одному вектору стоит
+амортизированно O(1) копирований строки, а не копию всего буфера.
+"""
+
+from __future__ import annotations
+
+import pickle
+import threading
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .config import VectorIndexConfig
+
+if TYPE_CHECKING:
+    from .embeddings import EmbeddingCache
+    from .pipeline import AnalysisResult
+
+# Предел числа ячеек матрицы оценок (float32) при точном переборе и обучении, ~64 МБ.
+_SCORE_MAX_CELLS = 1 << 24
+# Начальная ёмкость буфера добавленных векторов, строк; дальше ёмкость удваивается.
+_PENDING_MIN_CAPACITY = 256
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Столбцы `k` лучших оценок каждой строки по убыванию."""
+
+    if k < scores.shape[1]:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, columns, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(columns, order, axis=1)
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    step = max(1, _SCORE_MAX_CELLS // max(len(centroids), 1))
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), step):
+        labels[start : start + step] = (vectors[start : start + step] @ centroids.T).argmax(axis=1)
+    return labels
+
+
+def _train_centroids(
+    vectors: np.ndarray, n_lists: int, config: VectorIndexConfig
+) -> np.ndarray:
+    """Сферический k-means на случайной выборке."""
+
+    rng = np.random.default_rng(config.random_state)
+    sample_size = min(len(vectors), max(config.train_size, n_lists))
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    sample = np.ascontiguousarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(config.kmeans_iterations):
+        labels = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+@dataclass(slots=True, frozen=True)
+class _IvfState:
+    """Неизменяемый снимок индекса; `add` подменяет его целиком."""
+
+    dimension: int
+    centroids: np.ndarray | None = None
+    # Векторы списков подряд: список `l` — строки `offsets[l]:offsets[l + 1]`.
+    vectors: np.ndarray = field(default_factory=lambda: np.empty((0, 0), dtype=np.float32))
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    # Буфер недавно добавленных векторов, который перебирается точно.
+    pending_vectors: np.ndarray = field(default_factory=lambda: np.empty((0, 0), dtype=np.float32))
+    pending_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    trained_size: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.ids) + len(self.pending_ids)
+
+    @property
+    def n_lists(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+
+class VectorIndex:
+    """IVF-индекс эмбеддингов с добавлением, top-k и пакетными запросами.
+
+    Идентификаторы — int64: позиции постов в `AnalysisResult`, строки кэша
+    или собственные ключи вызывающего кода. Пустые позиции результата
+    (если векторов меньше `k`) заполняются id `-1` и оценкой `-inf`.
+    """
+
+    # Версия формата `save`; снимки другой версии не загружаются.
+    FORMAT = 1
+
+    def __init__(self, dimension: int, config: VectorIndexConfig | None = None) -> None:
+        self.config = config or VectorIndexConfig()
+        self._state = _IvfState(
+            dimension=dimension,
+            vectors=np.empty((0, dimension), dtype=np.float32),
+            pending_vectors=np.empty((0, dimension), dtype=np.float32),
+        )
+        self._write_lock = threading.Lock()
+        # Предвыделенный буфер `(vectors, ids)`: снимок видит только свой префикс `[:len(pending_ids)]`,
+        # а запись идёт за ним, поэтому читатели обходятся без блокировки.
+        self._pending_buffer: tuple[np.ndarray, np.ndarray] | None = None
+        self._next_id = 0
+        self._id_order: tuple[_IvfState, np.ndarray, np.ndarray] | None = None
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        ids: np.ndarray | None = None,
+        config: VectorIndexConfig | None = None,
+    ) -> VectorIndex:
+        vectors = np.asarray(vectors)
+        index = cls(vectors.shape[1], config)
+        index.add(vectors, ids)
+        return index
+
+    @classmethod
+    def from_result(
+        cls, result: AnalysisResult, config: VectorIndexConfig | None = None
+    ) -> VectorIndex:
+        """Индекс эмбеддингов постов; id — позиция поста в `result.posts`."""
+
+        if not result.posts:
+            raise ValueError("В результате анализа нет постов")
+        if result.embeddings is not None:
+            return cls.build(result.embeddings.vectors(), config=config)
+        return cls.build(np.vstack([post.vector for post in result.posts]), config=config)
+
+    @classmethod
+    def from_cache(
+        cls,
+        cache: EmbeddingCache,
+        model_name: str,
+        *,
+        normalized: bool = True,
+        config: VectorIndexConfig | None = None,
+    ) -> tuple[VectorIndex, list[str]]:
+        """Индекс всех векторов модели из `EmbeddingCache`.
+
+        Возвращает индекс и список дайджестов текстов: id вектора — позиция
+        его дайджеста в этом списке.
+        """
+
+        index: VectorIndex | None = None
+        digests: list[str] = []
+        for chunk_digests, vectors in cache.iter_vectors(model_name, normalized):
+            if index is None:
+                index = cls(vectors.shape[1], config)
+            index.add(vectors, np.arange(len(digests), len(digests) + len(vectors)))
+            digests.extend(chunk_digests)
+        if index is None:
+            raise ValueError(f"В кэше нет векторов модели {model_name}")
+        return index, digests
+
+    @property
+    def dimension(self) -> int:
+        return self._state.dimension
+
+    @property
+    def n_lists(self) -> int:
+        return self._state.n_lists
+
+    def __len__(self) -> int:
+        return self._state.size
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray | None = None) -> np.ndarray:
+        """Добавляет векторы и возвращает их id (по умолчанию — следующие по порядку).
+
+        Повторяющиеся id и id, уже занятые в индексе, отклоняются с ValueError.
+        Возрастающие id (больше всех имеющихся) проверяются только внутри
+        вызова; остальные сверяются со всем индексом за O(N).
+        """
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Ожидались векторы формы (n, {self.dimension}), получено {vectors.shape}")
+        with self._write_lock:
+            state = self._state
+            if ids is None:
+                ids = np.arange(self._next_id, self._next_id + len(vectors), dtype=np.int64)
+            else:
+                ids = np.asarray(ids, dtype=np.int64)
+                if ids.shape != (len(vectors),):
+                    raise ValueError("Число id не совпадает с числом векторов")
+                self._check_new_ids(state, ids)
+            pending_vectors, pending_ids = self._append_pending(state, vectors, ids)
+            state = self._maintain(replace(state, pending_vectors=pending_vectors, pending_ids=pending_ids))
+            if not len(state.pending_ids):
+                # Буфер влит в списки; старые снимки ещё читают его, поэтому он не переиспользуется.
+                self._pending_buffer = None
+            self._next_id = max(self._next_id, int(ids.max(initial=-1)) + 1)
+            self._state = state
+        return ids
+
+    def _check_new_ids(self, state: _IvfState, ids: np.ndarray) -> None:
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("Повторяющиеся id в одном вызове add")
+        if len(ids) and int(ids.min()) < self._next_id:
+            taken = np.isin(ids, state.ids) | np.isin(ids, state.pending_ids)
+            if taken.any():
+                raise ValueError(f"Id уже есть в индексе: {ids[taken][:5].tolist()}")
+
+    def _append_pending(
+        self, state: _IvfState, vectors: np.ndarray, ids: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Дописывает строки в буфер и возвращает представления его заполненной части."""
+
+        used = len(state.pending_ids)
+        total = used + len(ids)
+        buffer = self._pending_buffer
+        if buffer is None or len(buffer[1]) < total:
+            capacity = max(total, _PENDING_MIN_CAPACITY, 2 * len(buffer[1]) if buffer is not None else 0)
+            buffer = (
+                np.empty((capacity, state.dimension), dtype=np.float32),
+                np.empty(capacity, dtype=np.int64),
+            )
+            buffer[0][:used] = state.pending_vectors
+            buffer[1][:used] = state.pending_ids
+            self._pending_buffer = buffer
+        buffer[0][used:total] = vectors
+        buffer[1][used:total] = ids
+        return buffer[0][:total], buffer[1][:total]
+
+    def _maintain(self, state: _IvfState) -> _IvfState:
+        """Обучает, переобучает или вливает буфер в списки по порогам конфига."""
+
+        config = self.config
+        if state.size < config.exact_threshold:
+            return state
+        if state.centroids is None or state.size > state.trained_size * config.retrain_growth:
+            return self._rebuild(state)
+        if len(state.pending_ids) > config.merge_ratio * len(state.ids):
+            return self._merge(state)
+        return state
+
+    def _rebuild(self, state: _IvfState) -> _IvfState:
+        vectors = _append(state.vectors, state.pending_vectors)
+        ids = _append(state.ids, state.pending_ids)
+        n_lists = self.config.n_lists or max(1, int(2 * np.sqrt(len(ids))))
+        centroids = _train_centroids(vectors, min(n_lists, len(ids)), self.config)
+        return self._layout(state, centroids, vectors, ids, _nearest_centroids(vectors, centroids), len(ids))
+
+    def _merge(self, state: _IvfState) -> _IvfState:
+        counts = np.diff(state.offsets)
+        labels = np.concatenate(
+            [
+                np.repeat(np.arange(state.n_lists, dtype=np.int32), counts),
+                _nearest_centroids(state.pending_vectors, state.centroids),
+            ]
+        )
+        vectors = _append(state.vectors, state.pending_vectors)
+        ids = _append(state.ids, state.pending_ids)
+        return self._layout(state, state.centroids, vectors, ids, labels, state.trained_size)
+
+    @staticmethod
+    def _layout(
+        state: _IvfState,
+        centroids: np.ndarray,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        labels: np.ndarray,
+        trained_size: int,
+    ) -> _IvfState:
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+        return replace(
+            state,
+            centroids=centroids,
+            vectors=np.ascontiguousarray(vectors[order]),
+            ids=ids[order],
+            offsets=offsets,
+            pending_vectors=np.empty((0, state.dimension), dtype=np.float32),
+            pending_ids=np.empty(0, dtype=np.int64),
+            trained_size=trained_size,
+        )
+
+    def search(
+        self, query: np.ndarray, k: int = 10, *, n_probe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """`(ids, scores)` `k` ближайших векторов к одному запросу."""
+
+        ids, scores = self.search_batch(np.asarray(query)[None, :], k, n_probe=n_probe)
+        return ids[0], scores[0]
+
+    def search_batch(
+        self, queries: np.ndarray, k: int = 10, *, n_probe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """`(ids, scores)` формы `(len(queries), k)`, строки по убыванию оценки.
+
+        Запросы группируются по просматриваемым спискам: каждый список
+        умножается один раз на все запросы, которым он нужен.
+        """
+
+        state = self._state
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != state.dimension:
+            raise ValueError(f"Ожидались запросы формы (m, {state.dimension}), получено {queries.shape}")
+        parts: list[tuple[np.ndarray, np.ndarray]] = []
+        if state.centroids is not None and len(state.ids):
+            parts.append(self._search_lists(state, queries, k, n_probe or self.config.n_probe))
+        if len(state.pending_ids):
+            parts.append(self._search_exact(state.pending_vectors, state.pending_ids, queries, k))
+        if not parts:
+            return (
+                np.full((len(queries), k), -1, dtype=np.int64),
+                np.full((len(queries), k), -np.inf, dtype=np.float32),
+            )
+        scores = np.hstack([part_scores for _, part_scores in parts])
+        ids = np.hstack([part_ids for part_ids, _ in parts])
+        best = _top_k(scores, k)
+        return _pad(np.take_along_axis(ids, best, axis=1), np.take_along_axis(scores, best, axis=1), k)
+
+    def search_exact(self, queries: np.ndarray, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """Точный top-k полным перебором — эталон для оценки полноты."""
+
+        state = self._state
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if not state.size:
+            empty = np.empty((len(queries), 0))
+            return _pad(empty.astype(np.int64), empty.astype(np.float32), k)
+        ids, scores = self._search_exact(
+            np.concatenate([state.vectors, state.pending_vectors]),
+            np.concatenate([state.ids, state.pending_ids]),
+            queries,
+            k,
+        )
+        return _pad(ids, scores, k)
+
+    def related(
+        self, ids: np.ndarray, k: int = 10, *, n_probe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Похожие посты для уже проиндексированных id, без самих этих постов."""
+
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        found, scores = self.search_batch(self.vectors_for(ids), k + 1, n_probe=n_probe)
+        keep = found != ids[:, None]
+        # Если сам пост не попал в выдачу, отбрасывается последний результат.
+        keep[keep.all(axis=1), -1] = False
+        return found[keep].reshape(len(ids), k), scores[keep].reshape(len(ids), k)
+
+    def vectors_for(self, ids: np.ndarray) -> np.ndarray:
+        """Векторы по id; KeyError, если какого-то id нет в индексе."""
+
+        state = self._state
+        cached = self._id_order
+        if cached is None or cached[0] is not state:
+            all_ids = np.concatenate([state.ids, state.pending_ids])
+            order = np.argsort(all_ids, kind="stable")
+            cached = (state, all_ids[order], order)
+            self._id_order = cached
+        _, sorted_ids, order = cached
+        ids = np.asarray(ids, dtype=np.int64)
+        slots = np.minimum(np.searchsorted(sorted_ids, ids), max(len(sorted_ids) - 1, 0))
+        if not len(sorted_ids) or (sorted_ids[slots] != ids).any():
+            missing = ids if not len(sorted_ids) else ids[sorted_ids[slots] != ids]
+            raise KeyError(f"Нет в индексе: {missing[:5].tolist()}")
+        rows = order[slots]
+        indexed = len(state.ids)
+        in_lists = rows < indexed
+        vectors = np.empty((len(ids), state.dimension), dtype=np.float32)
+        vectors[in_lists] = state.vectors[rows[in_lists]]
+        vectors[~in_lists] = state.pending_vectors[rows[~in_lists] - indexed]
+        return vectors
+
+    @staticmethod
+    def _search_lists(
+        state: _IvfState, queries: np.ndarray, k: int, n_probe: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        n_probe = min(n_probe, state.n_lists)
+        probe = _top_k(queries @ state.centroids.T, n_probe)
+        if len(queries) == 1:
+            # Одиночный запрос: оценки списков склеиваются и отбираются за один проход.
+            bounds = [(state.offsets[lst], state.offsets[lst + 1]) for lst in probe[0]]
+            scores = np.concatenate([state.vectors[lo:hi] @ queries[0] for lo, hi in bounds])
+            ids = np.concatenate([state.ids[lo:hi] for lo, hi in bounds])
+            if not len(ids):
+                return np.full((1, 1), -1, dtype=np.int64), np.full((1, 1), -np.inf, dtype=np.float32)
+            best = _top_k(scores[None, :], min(k, len(ids)))
+            return ids[best], scores[best]
+        scores = np.full((len(queries), n_probe * k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), n_probe * k), -1, dtype=np.int64)
+
+        flat = probe.ravel()
+        pairs = np.argsort(flat, kind="stable")
+        lists = flat[pairs]
+        bounds = np.flatnonzero(np.diff(lists)) + 1
+        for group in np.split(pairs, bounds):
+            lst = flat[group[0]]
+            lo, hi = state.offsets[lst], state.offsets[lst + 1]
+            if lo == hi:
+                continue
+            rows = group // n_probe
+            slots = (group % n_probe)[:, None] * k
+            list_scores = queries[rows] @ state.vectors[lo:hi].T
+            best = _top_k(list_scores, min(k, hi - lo))
+            columns = slots + np.arange(best.shape[1])
+            scores[rows[:, None], columns] = np.take_along_axis(list_scores, best, axis=1)
+            ids[rows[:, None], columns] = state.ids[lo + best]
+        return ids, scores
+
+    @staticmethod
+    def _search_exact(
+        vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(ids))
+        found = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        step = max(1, _SCORE_MAX_CELLS // max(len(ids), 1))
+        for start in range(0, len(queries), step):
+            chunk = queries[start : start + step] @ vectors.T
+            best = _top_k(chunk, k)
+            found[start : start + step] = ids[best]
+            scores[start : start + step] = np.take_along_axis(chunk, best, axis=1)
+        return found, scores
+
+    def save(self, directory: Path) -> None:
+        """Сохраняет индекс: массивы — в `.npy` (для mmap), параметры — в pickle."""
+
+        state = self._state
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "vectors.npy", state.vectors)
+        np.save(directory / "ids.npy", state.ids)
+        np.save(directory / "offsets.npy", state.offsets)
+        np.save(directory / "pending_vectors.npy", state.pending_vectors)
+        np.save(directory / "pending_ids.npy", state.pending_ids)
+        if state.centroids is not None:
+            np.save(directory / "centroids.npy", state.centroids)
+        meta = {
+            "format": self.FORMAT,
+            "dimension": state.dimension,
+            "trained_size": state.trained_size,
+            "trained": state.centroids is not None,
+            "config": self.config,
+        }
+        with (directory / "meta.pkl").open("wb") as fp:
+            pickle.dump(meta, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(
+        cls, directory: Path, *, mmap: bool = True, config: VectorIndexConfig | None = None
+    ) -> VectorIndex:
+        """Загружает индекс; `config` заменяет сохранённый (например, другой `n_probe`)."""
+
+        directory = Path(directory)
+        with (directory / "meta.pkl").open("rb") as fp:
+            meta = pickle.load(fp)
+        if meta.get("format") != cls.FORMAT:
+            raise ValueError(f"Снимок векторного индекса в устаревшем формате: {directory}")
+        mmap_mode = "r" if mmap else None
+        index = cls(meta["dimension"], config or meta["config"])
+        index._state = _IvfState(
+            dimension=meta["dimension"],
+            centroids=np.load(directory / "centroids.npy") if meta["trained"] else None,
+            vectors=np.load(directory / "vectors.npy", mmap_mode=mmap_mode),
+            ids=np.load(directory / "ids.npy", mmap_mode=mmap_mode),
+            offsets=np.load(directory / "offsets.npy"),
+            pending_vectors=np.load(directory / "pending_vectors.npy"),
+            pending_ids=np.load(directory / "pending_ids.npy"),
+            trained_size=meta["trained_size"],
+        )
+        state = index._state
+        index._next_id = int(max(state.ids.max(initial=-1), state.pending_ids.max(initial=-1))) + 1
+        return index
+
+
+def _append(head: np.ndarray, tail: np.ndarray) -> np.ndarray:
+    """Конкатенация без лишней копии, если одна из частей пуста."""
+
+    if not len(head):
+        return tail
+    if not len(tail):
+        return head
+    return np.concatenate([head, tail])
+
+
+def _pad(ids: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    missing = k - ids.shape[1]
+    if missing <= 0:
+        return ids, scores
+    return (
+        np.pad(ids, ((0, 0), (0, missing)), constant_values=-1),
+        np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf),
+    )
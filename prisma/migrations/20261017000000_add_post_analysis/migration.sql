@@ -0,0 +1,17 @@
+-- CreateTable
+CREATE TABLE "PostAnalysis" (
+    "postId" INTEGER NOT NULL PRIMARY KEY,
+    "model" TEXT NOT NULL,
+    "dimension" INTEGER NOT NULL,
+    "embedding" BLOB NOT NULL,
+    "topic" INTEGER,
+    "topicKeywords" JSONB,
+    "updatedAt" DATETIME NOT NULL,
+    CONSTRAINT "PostAnalysis_postId_fkey" FOREIGN KEY ("postId") REFERENCES "Post" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX "PostAnalysis_topic_idx" ON "PostAnalysis"("topic");
+
+-- CreateIndex
+CREATE INDEX "Post_sourceId_idx" ON "Post"("sourceId");